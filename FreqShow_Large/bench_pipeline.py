@@ -0,0 +1,218 @@
+# FreqShow pipeline benchmark.
+# Times the path from radio samples to pixels (FreqShowModel.get_data, the
+# instant and waterfall render_spectrogram and the full SpectrogramBase.render
+# with its overlay) with a fake radio and SDL's dummy video driver, for each
+# combination of screen size, window, zoom and fft_ave depth.
+#
+# Usage: python bench_pipeline.py [--frames N] [--sizes WxH,...]
+#                                 [--windows NAME,...] [--zooms MHZ,...]
+#                                 [--aves N,...] [--baseline FILE] [--save]
+#                                 [--tolerance FRACTION]
+#
+# Results are compared with the baseline file (bench_baseline.json by default)
+# if it exists, and the exit status is 1 if any stage got slower than the
+# tolerance allows.  Pass --save to store the results as the new baseline.
+# Baselines only make sense on the machine they were recorded on, record one
+# on the Pi before changing the hot path.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import argparse
+import json
+import os
+import sys
+import time
+import types
+
+if 'SDL_VIDEODRIVER' not in os.environ:
+	os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import numpy as np
+import pygame
+
+import dsp
+import freqshow
+
+
+# Most precise clock available.
+clock = getattr(time, 'perf_counter', time.time)
+
+STAGES = ['data', 'instant', 'waterfall', 'render']
+
+
+class FakeRtlSdr(object):
+	"""Stand in for rtlsdr.RtlSdr returning the same block of a few tones in
+	noise on every read, so runs are repeatable and reads cost nothing.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		self.sample_rate = 2.4e6
+		self.center_freq = 100e6
+		self.gain = 0
+		rand = np.random.RandomState(1)
+		n = freqshow.SDR_SAMPLE_SIZE
+		t = np.arange(n)/0.230e6
+		self.samples = 0.01*(rand.randn(n) + 1j*rand.randn(n))
+		for freq, amp in ((-40e3, 0.05), (2e3, 0.5), (25e3, 0.1)):
+			self.samples += amp*np.exp(2j*np.pi*freq*t)
+
+	def set_freq_correction(self, ppm):
+		pass
+
+	def set_center_freq(self, freq):
+		self.center_freq = freq
+
+	def get_center_freq(self):
+		return self.center_freq
+
+	def set_sample_rate(self, rate):
+		self.sample_rate = rate
+
+	def get_sample_rate(self):
+		return self.sample_rate
+
+	def set_manual_gain_enabled(self, enabled):
+		pass
+
+	def set_gain(self, gain):
+		self.gain = gain
+
+	def get_gain(self):
+		return self.gain
+
+	def read_samples(self, count):
+		return self.samples[:count]
+
+	def close(self):
+		pass
+
+
+def install_fake_sdr():
+	"""Make the model create a FakeRtlSdr instead of opening a radio."""
+	module = types.ModuleType('rtlsdr')
+	module.RtlSdr = FakeRtlSdr
+	sys.modules['rtlsdr'] = module
+
+
+def bench(size, window, zoom, ave, frames):
+	"""Return a dict of the median milliseconds per frame of each stage."""
+	import controller
+	import model
+	fsmodel = model.FreqShowModel(size[0], size[1])
+	fsmodel.set_filter(window)
+	fsmodel.set_zoom_fac(zoom)
+	fsmodel.set_fft_ave(ave)
+	fscontroller = controller.FreqShowController(fsmodel)
+	instant = fscontroller.instant
+	waterfall = fscontroller.waterfall
+	screen = pygame.Surface(size, 0, 32)
+	spect = screen.subsurface(instant.spect_rect())
+	samples = fsmodel.sdr.read_samples(freqshow.SDR_SAMPLE_SIZE)
+	times = dict((stage, []) for stage in STAGES)
+	# One extra frame first to warm up caches.
+	for i in range(frames + 1):
+		start = clock()
+		freqs = fsmodel.get_data(samples)
+		data = clock()
+		instant.spectrum_ready(freqs)
+		instant.render_spectrogram(spect)
+		inst = clock()
+		waterfall.spectrum_ready(freqs)
+		waterfall.add_row()
+		waterfall.render_spectrogram(spect)
+		water = clock()
+		instant.render(screen)
+		end = clock()
+		if i == 0:
+			continue
+		times['data'].append(data - start)
+		times['instant'].append(inst - data)
+		times['waterfall'].append(water - inst)
+		times['render'].append(end - water)
+	return dict((stage, 1000.0*float(np.median(values)))
+		for stage, values in times.items())
+
+
+def main():
+	parser = argparse.ArgumentParser(description='FreqShow pipeline benchmark.')
+	parser.add_argument('--frames', type=int, default=20)
+	parser.add_argument('--sizes', default='320x240,800x480')
+	parser.add_argument('--windows', default=','.join(dsp.WINDOWS))
+	parser.add_argument('--zooms', default='0.01,0.05,0.2', help='spans in MHz')
+	parser.add_argument('--aves', default='2,3,8', help='fft_ave depths')
+	parser.add_argument('--baseline', default=os.path.join(
+		os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json'))
+	parser.add_argument('--save', action='store_true',
+		help='store the results as the new baseline')
+	parser.add_argument('--tolerance', type=float, default=0.25,
+		help='allowed slow down as a fraction of the baseline')
+	args = parser.parse_args()
+	install_fake_sdr()
+	# Don't record the benchmark's waterfall to disk or stream from the fake
+	# radio in the background.
+	freqshow.RECORD_PATH = None
+	freqshow.SDR_STREAMING = False
+	pygame.display.init()
+	pygame.font.init()
+	baseline = {}
+	if os.path.exists(args.baseline) and not args.save:
+		with open(args.baseline) as f:
+			baseline = json.load(f)
+	results = {}
+	regressions = []
+	print('{0:<9} {1:<15} {2:>6} {3:>3}'.format('size', 'window', 'zoom', 'ave') +
+		''.join('{0:>10}'.format(stage) for stage in STAGES) + '{0:>8}'.format('fps'))
+	for size in args.sizes.split(','):
+		for window in args.windows.split(','):
+			for zoom in args.zooms.split(','):
+				for ave in args.aves.split(','):
+					key = '{0} {1} {2} {3}'.format(size, window, zoom, ave)
+					ms = bench(tuple(int(v) for v in size.split('x')), window,
+						float(zoom), int(ave), args.frames)
+					results[key] = ms
+					marks = ''
+					for stage in STAGES:
+						base = baseline.get(key, {}).get(stage)
+						# Ignore differences below the timer noise.
+						if base is not None and ms[stage] > base*(1 + args.tolerance) \
+							and ms[stage] - base > 0.05:
+							regressions.append((key, stage, base, ms[stage]))
+							marks += ' ' + stage
+					print('{0:<9} {1:<15} {2:>6} {3:>3}'.format(size, window, zoom, ave) +
+						''.join('{0:>10.3f}'.format(ms[stage]) for stage in STAGES) +
+						'{0:>8.1f}'.format(1000.0/sum(ms.values())) +
+						(' SLOWER:' + marks if marks else ''))
+	if args.save:
+		with open(args.baseline, 'w') as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+		print('Saved baseline to {0}'.format(args.baseline))
+	elif baseline:
+		for key, stage, base, ms in regressions:
+			print('{0} {1}: {2:.3f} ms -> {3:.3f} ms'.format(key, stage, base, ms))
+		print('{0} of {1} stages slower than the baseline by more than {2:.0%}'.format(
+			len(regressions), len(results)*len(STAGES), args.tolerance))
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,104 @@
+# FreqShow shared memory ring benchmark.
+# Measures how fast spectrum frames can be published to a shared memory ring
+# (see shmring.py) and read back by reader processes.
+#
+# Usage: python bench_shm.py [--width N] [--slots N] [--readers N] [--seconds S]
+#                            [--rate FPS]
+#
+# By default the writer runs flat out, pass --rate to publish at a fixed frame
+# rate like the panadapter does and check readers keep up.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import shmring
+
+
+def reader(name, seconds, results):
+	# Forked from the writer, so the resource tracker is shared with it.
+	ring = shmring.RingReader(name, untrack=False)
+	out = np.zeros(ring.capacity, dtype=ring.dtype)
+	frames = 0
+	latest = 0
+	end = time.time() + seconds
+	while time.time() < end:
+		new = ring.poll()
+		frames += len(new)
+		if not new and ring.latest(out) is not None:
+			latest += 1
+	results.put((frames, ring.missed, ring.retries, latest))
+	ring.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description='FreqShow shared memory ring benchmark.')
+	parser.add_argument('--width', type=int, default=800, help='values per frame')
+	parser.add_argument('--slots', type=int, default=16)
+	parser.add_argument('--readers', type=int, default=2)
+	parser.add_argument('--seconds', type=float, default=3.0)
+	parser.add_argument('--rate', type=float, help='frames per second to write')
+	args = parser.parse_args()
+	name = 'freqshow_bench_{0}'.format(os.getpid())
+	ring = shmring.RingWriter(name, args.slots, args.width, np.float32)
+	results = multiprocessing.Queue()
+	readers = [multiprocessing.Process(target=reader,
+		args=(name, args.seconds + 0.5, results)) for i in range(args.readers)]
+	for process in readers:
+		process.start()
+	# Give the readers time to attach.
+	time.sleep(0.5)
+	data = np.random.uniform(-10, 50, args.width).astype(np.float32)
+	written = 0
+	start = time.time()
+	end = start + args.seconds
+	while True:
+		now = time.time()
+		if now >= end:
+			break
+		if args.rate:
+			delay = start + written/args.rate - now
+			if delay > 0:
+				time.sleep(delay)
+		ring.write(data, 70.4515, 0.05, -10.0, 50.0, now)
+		written += 1
+	elapsed = time.time() - start
+	frame_bytes = args.width*4
+	print('writer  {0:>9} frames {1:>10.0f} frames/s {2:>8.1f} MB/s {3:>6.2f} us/frame'.format(
+		written, written/elapsed, written*frame_bytes/elapsed/1e6,
+		1e6*elapsed/written))
+	for i in range(args.readers):
+		frames, missed, retries, latest = results.get()
+		print('reader  {0:>9} frames {1:>10.0f} frames/s {2:>8} missed {3:>6} retries'.format(
+			frames, frames/elapsed, missed, retries))
+	for process in readers:
+		process.join()
+	ring.close()
+
+
+if __name__ == '__main__':
+	main()
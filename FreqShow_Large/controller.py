@@ -32,13 +32,21 @@ class FreqShowController(object):
 	"""Class which controls the views shown in the application and mediates
 	changing between views.
 	"""
-	def __init__(self, model):
-		"""Initialize controller with specified FreqShow model."""
+	def __init__(self, model, radios=None):
+		"""Initialize controller with specified FreqShow model.  With several
+		radios, radios is the MultiRadioController of all of them.
+		"""
 		self.model = model
+		self.radios = radios
 		# Create instantaneous and waterfall spectrogram views once because they
 		# hold state and have a lot of data.
 		self.instant = InstantSpectrogram(model, self)
 		self.waterfall = WaterfallSpectrogram(model, self)
+		self.split = SplitSpectrogram(model, self)
+		self.tiles = TiledSpectrogram(model, self) if radios is not None else None
+		# Settings list view, rebuilt only after a setting it shows changes.
+		self._settings = None
+		self.model.listen(self._settings_changed)
 		# Start with instantaneous spectrogram.
 		self._current_view = None
 		self.change_to_instant()
@@ -67,18 +75,18 @@ class FreqShowController(object):
 			cancel=self._change_to_previous, **kwargs))
 
 	def filter_dialog(self,label_text, unit_text, **kwargs):
-                """Open a filter dialog which goes back to the previous view when
-                canceled.
-                """
-                self.change_view(FilterDialog(self.model, label_text, unit_text,
-                        cancel=self._change_to_previous, **kwargs))
+		"""Open a filter dialog which goes back to the previous view when
+		canceled.
+		"""
+		self.change_view(FilterDialog(self.model, label_text, unit_text,
+			cancel=self._change_to_previous, **kwargs))
 
-        def boolean_dialog(self,label_text, unit_text, **kwargs):
-                """Open a boolean dialog which goes back to the previous view when
-                canceled.
-                """
-                self.change_view(BooleanDialog(self.model, label_text, unit_text,
-                        cancel=self._change_to_previous, **kwargs))
+	def boolean_dialog(self,label_text, unit_text, **kwargs):
+		"""Open a boolean dialog which goes back to the previous view when
+		canceled.
+		"""
+		self.change_view(BooleanDialog(self.model, label_text, unit_text,
+			cancel=self._change_to_previous, **kwargs))
 
 
 
@@ -95,11 +103,17 @@ class FreqShowController(object):
 		self.change_view(self._main_view)
 
 	def toggle_main(self, *args):
-		"""Switch between instantaneous and waterfall spectrogram views."""
-		if self._current_view == self.waterfall:
-			self.change_to_instant()
-		else:
+		"""Cycle between instantaneous, waterfall and split spectrogram views,
+		and the tiles of all radios when there are several.
+		"""
+		if self._current_view == self.instant:
 			self.change_to_waterfall()
+		elif self._current_view == self.waterfall:
+			self.change_to_split()
+		elif self._current_view == self.split and self.tiles is not None:
+			self.change_to_tiles()
+		else:
+			self.change_to_instant()
 
 	def change_to_instant(self, *args):
 		"""Change to instantaneous spectrogram view."""
@@ -111,8 +125,52 @@ class FreqShowController(object):
 		self._main_view = self.waterfall
 		self.change_view(self.waterfall)
 
+	def change_to_split(self, *args):
+		"""Change to split instantaneous and waterfall spectrogram view."""
+		self._main_view = self.split
+		self.change_view(self.split)
+
+	def change_to_tiles(self, *args):
+		"""Change to the tiled spectrograms of all radios."""
+		self._main_view = self.tiles
+		self.change_view(self.tiles)
+
 	def change_to_settings(self, *args):
 		"""Change to settings list view."""
-		# Create a new settings list view object because the setting values might
-		# change and need to be rendered with different values.
-		self.change_view(SettingsList(self.model, self))
+		# The settings list view object is created again only when the setting
+		# values it renders have changed since it was last shown.
+		if self._settings is None:
+			self._settings = SettingsList(self.model, self)
+		self.change_view(self._settings)
+
+	def invalidate_settings(self):
+		"""Rebuild the settings list view the next time it is shown, for
+		values it shows which aren't model settings (like the perf HUD).
+		"""
+		self._settings = None
+
+	def _settings_changed(self, event):
+		# Model listener, any setting shown by the settings list changed.
+		if not self.model.is_auto_scale(event):
+			self._settings = None
+
+
+class MultiRadioController(object):
+	"""Controller of several radios (see multisdr.py), each with its own
+	FreqShowController and views, which shows the views of the selected one.
+	"""
+	def __init__(self, models):
+		"""Initialize controller with the FreqShow models of every radio."""
+		self.controllers = [FreqShowController(model, self) for model in models]
+		self.selected = self.controllers[0]
+
+	def current(self):
+		"""Return current view of the selected radio."""
+		return self.selected.current()
+
+	def select(self, index):
+		"""Show the instantaneous spectrogram of the radio with the provided
+		index.
+		"""
+		self.selected = self.controllers[index]
+		self.selected.change_to_instant()
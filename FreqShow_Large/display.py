@@ -0,0 +1,296 @@
+# FreqShow display backends.
+# Each backend owns the surface views are rendered to and knows how to get
+# a finished frame onto the screen.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import io
+import os
+import threading
+
+import numpy as np
+import pygame
+
+import mjpeg
+import perf
+
+
+# Masks of a 32 bit XRGB8888 surface.  Frames composed on a surface with this
+# layout can be copied to a 32 bit framebuffer without any conversion.
+XRGB8888_MASKS = (0xFF0000, 0x00FF00, 0x0000FF, 0)
+
+
+class PygameDisplay(object):
+	"""Display through a full screen pygame (SDL) window."""
+
+	def __init__(self, size=None):
+		"""Open the display at the provided (width, height) size, or the size
+		of the screen if not provided.  pygame.display must be initialized.
+		"""
+		if size is None:
+			info = pygame.display.Info()
+			size = (info.current_w, info.current_h)
+		self.size = size
+		self.screen = pygame.display.set_mode(size, pygame.FULLSCREEN)
+
+	def update(self):
+		"""Show the frame rendered to screen."""
+		timer = perf.timer()
+		pygame.display.update()
+		timer.lap('display')
+
+	def show(self, view):
+		"""Render the provided view and show it."""
+		view.render(self.screen)
+		self.update()
+
+
+class FramebufferDisplay(object):
+	"""Display written straight into a numpy.memmap of a Linux framebuffer
+	device (like /dev/fb1), bypassing SDL's video driver.
+
+	Frames are composed on an off-screen XRGB8888 surface.  On update the
+	frame is converted to the framebuffer's pixel format (RGB565 or XRGB8888)
+	with whole array operations, compared to the frame currently shown and
+	only the ranges of rows which changed are copied to the framebuffer.
+	"""
+
+	def __init__(self, path='/dev/fb1', size=None, bpp=None, stride=None):
+		"""Open the framebuffer device at path.  The (width, height) size,
+		bits per pixel (16 or 32) and stride (bytes per row) are read from
+		sysfs for real framebuffer devices, or can be provided explicitly (for
+		example when using a plain file in place of the device).
+		"""
+		sysfs = os.path.join('/sys/class/graphics', os.path.basename(path))
+		if size is None:
+			size = tuple(int(v) for v in
+				_read_sysfs(sysfs, 'virtual_size').split(','))
+		if bpp is None:
+			bpp = int(_read_sysfs(sysfs, 'bits_per_pixel'))
+		if bpp not in (16, 32):
+			raise ValueError('Unsupported framebuffer depth: {0} bpp'.format(bpp))
+		if stride is None:
+			try:
+				stride = int(_read_sysfs(sysfs, 'stride'))
+			except (IOError, OSError):
+				stride = size[0]*bpp//8
+		width, height = size
+		self.size = size
+		self.bpp = bpp
+		dtype = np.uint16 if bpp == 16 else np.uint32
+		self.fb = np.memmap(path, dtype=dtype, mode='r+',
+			shape=(height, stride//np.dtype(dtype).itemsize))[:, :width]
+		self.screen = pygame.Surface(size, 0, 32, XRGB8888_MASKS)
+		# Last frame written to the framebuffer, the next frame and a scratch
+		# buffer for the pixel format conversion.
+		self.shown = np.zeros((height, width), dtype=dtype)
+		self.frame = np.zeros((height, width), dtype=dtype)
+		self._scratch = np.zeros((height, width), dtype=np.uint32)
+		self._first = True
+		self.rows_written = 0
+
+	def convert(self):
+		"""Convert the screen surface into frame in the framebuffer format."""
+		pixels = pygame.surfarray.pixels2d(self.screen)
+		xrgb = pixels.T
+		if self.bpp == 32:
+			np.copyto(self.frame, xrgb, casting='unsafe')
+		else:
+			# Pack 8 bit R, G and B into 5, 6 and 5 bits.
+			scratch = self._scratch
+			np.right_shift(xrgb, 8, out=scratch)
+			np.bitwise_and(scratch, 0xF800, out=scratch)
+			np.copyto(self.frame, scratch, casting='unsafe')
+			np.right_shift(xrgb, 5, out=scratch)
+			np.bitwise_and(scratch, 0x07E0, out=scratch)
+			np.bitwise_or(self.frame, scratch, out=self.frame, casting='unsafe')
+			np.right_shift(xrgb, 3, out=scratch)
+			np.bitwise_and(scratch, 0x001F, out=scratch)
+			np.bitwise_or(self.frame, scratch, out=self.frame, casting='unsafe')
+		del xrgb, pixels
+
+	def dirty_rows(self):
+		"""Return a list of (start, stop) ranges of rows which differ between
+		the converted frame and the frame shown.
+		"""
+		if self._first:
+			return [(0, self.size[1])]
+		changed = np.flatnonzero((self.frame != self.shown).any(axis=1))
+		if not len(changed):
+			return []
+		# Split the changed row numbers into runs of consecutive rows.
+		breaks = np.flatnonzero(np.diff(changed) > 1)
+		starts = np.concatenate(([changed[0]], changed[breaks + 1]))
+		stops = np.concatenate((changed[breaks], [changed[-1]])) + 1
+		return list(zip(starts, stops))
+
+	def update(self):
+		"""Copy the rows of the frame rendered to screen which changed to the
+		framebuffer.
+		"""
+		timer = perf.timer()
+		self.convert()
+		for start, stop in self.dirty_rows():
+			self.fb[start:stop] = self.frame[start:stop]
+			self.shown[start:stop] = self.frame[start:stop]
+			self.rows_written += stop - start
+		self._first = False
+		timer.lap('display')
+
+	def show(self, view):
+		"""Render the provided view and show it."""
+		view.render(self.screen)
+		self.update()
+
+
+class Sdl2Display(object):
+	"""Display through an SDL2 renderer using pygame 2's pygame._sdl2 module.
+
+	Views which implement render_textures (the spectrograms) draw with the
+	renderer directly so they only upload the pixels which changed, like a
+	new waterfall row, instead of copying a full screen every frame.  Other
+	views are rendered to the screen surface which is uploaded as a single
+	texture.  A hardware accelerated renderer is used when available with a
+	software renderer as fallback, so this also works with SDL's dummy
+	video driver.
+	"""
+
+	def __init__(self, size=None, fullscreen=True):
+		"""Open a window of the provided (width, height) size, or the size
+		of the screen if not provided.  pygame.display must be initialized.
+		"""
+		from pygame._sdl2 import sdl2, video
+		self._video = video
+		if size is None:
+			info = pygame.display.Info()
+			size = (info.current_w, info.current_h)
+		self.size = size
+		self.window = video.Window('FreqShow', size=size, fullscreen=fullscreen)
+		try:
+			self.renderer = video.Renderer(self.window, accelerated=1)
+		except (pygame.error, sdl2.error):
+			self.renderer = video.Renderer(self.window, accelerated=0)
+		self.screen = pygame.Surface(size, 0, 32)
+		self._screen_texture = None
+
+	def texture(self, surface):
+		"""Return a new texture with the contents of the provided surface."""
+		return self._video.Texture.from_surface(self.renderer, surface)
+
+	def update(self):
+		"""Upload the frame rendered to screen and show it."""
+		timer = perf.timer()
+		if self._screen_texture is None:
+			self._screen_texture = self.texture(self.screen)
+		else:
+			self._screen_texture.update(self.screen)
+		self._screen_texture.draw()
+		self.renderer.present()
+		timer.lap('display')
+
+	def show(self, view):
+		"""Render the provided view and show it."""
+		render_textures = getattr(view, 'render_textures', None)
+		if render_textures is None:
+			view.render(self.screen)
+			self.update()
+			return
+		self.renderer.draw_color = (0, 0, 0, 255)
+		self.renderer.clear()
+		render_textures(self)
+		timer = perf.timer()
+		self.renderer.present()
+		timer.lap('display')
+
+
+class HeadlessDisplay(object):
+	"""Display for systems without a screen.  Frames are rendered off-screen
+	(with SDL's dummy video driver) and encoded by a worker thread to a PNG
+	file and/or a multipart MJPEG stream served over HTTP (see mjpeg.py).
+
+	update only copies the frame and hands it to the worker.  If the worker is
+	still busy with the previous frame that frame is replaced (and counted in
+	dropped), so encoding never holds up acquisition or rendering.
+	"""
+
+	def __init__(self, size, png_path=None, port=None, host='127.0.0.1'):
+		"""Render frames of the provided (width, height) size.  Each frame is
+		saved to png_path if provided, which may contain {0} to number the
+		files instead of replacing the same one, and streamed on the provided
+		HTTP port (bound to host) if provided.
+		"""
+		self.size = size
+		self.screen = pygame.Surface(size, 0, 32)
+		self.png_path = png_path
+		self.server = mjpeg.MjpegServer(port, host) if port is not None else None
+		self.encoded = 0
+		self.dropped = 0
+		self._frame = None
+		self._cond = threading.Condition()
+		self._thread = threading.Thread(target=self._run)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def update(self):
+		"""Queue the frame rendered to screen for encoding."""
+		timer = perf.timer()
+		frame = self.screen.copy()
+		with self._cond:
+			if self._frame is not None:
+				self.dropped += 1
+				perf.count('headless dropped')
+			self._frame = frame
+			self._cond.notify()
+		timer.lap('display')
+
+	def show(self, view):
+		"""Render the provided view and queue it for encoding."""
+		view.render(self.screen)
+		self.update()
+
+	def _run(self):
+		while True:
+			with self._cond:
+				while self._frame is None:
+					self._cond.wait()
+				frame = self._frame
+				self._frame = None
+			if self.png_path is not None:
+				self._save_png(frame)
+			if self.server is not None:
+				data = io.BytesIO()
+				pygame.image.save(frame, data, 'frame.jpg')
+				self.server.publish(data.getvalue())
+			self.encoded += 1
+
+	def _save_png(self, frame):
+		name = self.png_path.format(self.encoded)
+		# Write to a temporary file and rename it so readers never see a
+		# partially written image.
+		root, ext = os.path.splitext(name)
+		temp = root + '.tmp' + ext
+		pygame.image.save(frame, temp)
+		os.rename(temp, name)
+
+
+def _read_sysfs(path, name):
+	with open(os.path.join(path, name)) as f:
+		return f.read().strip()
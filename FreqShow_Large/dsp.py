@@ -0,0 +1,206 @@
+# FreqShow DSP core.
+# The spectrum math of the panadapter (windowing, FFT, shift/crop, dB
+# conversion, averaging and auto scaling) as plain functions of numpy arrays
+# and explicit parameters.  Only depends on numpy so it can be imported
+# quickly by tests, benchmarks, batch tools and worker processes without
+# pygame, the radio library or the application configuration.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import collections
+
+import numpy as np
+
+
+# Coefficients of the windows which are sums of cosines.
+COSINE_WINDOWS = {
+	'blackmanharris': [0.35875, 0.48829, 0.14128, 0.01168],
+	'nuttall':        [0.3635819, 0.4891775, 0.1365995, 0.0106411],
+}
+
+# Parameters of the spectrum computation which only change with the settings:
+# display width, sample rate (MHz), FFT bins, span shown (MHz), frequency step
+# between bins (MHz), LO offset and pan shift in bins, window (a read only
+# array of bins+2 values) and whether I and Q are swapped.
+SpectrumConfig = collections.namedtuple('SpectrumConfig', ['width',
+	'sample_rate', 'bins', 'span', 'step', 'shift', 'taper', 'swap_iq'])
+
+# Names of the supported window functions.
+WINDOWS = ['kaiser', 'boxcar', 'hann', 'hamming', 'blackman', 'blackmanharris',
+	'bartlett', 'barthann', 'nuttall']
+
+
+def window(name, size, beta=8.6):
+	"""Return the periodic window function of the provided name and size (the
+	same values as the scipy.signal window with sym=False, computed with numpy
+	alone so scipy isn't needed).  Unknown names get no window (all ones).
+	"""
+	# A periodic window is a symmetric window one sample longer, truncated.
+	n = size + 1
+	if name == 'kaiser':
+		w = np.kaiser(n, beta)
+	elif name == 'hann':
+		w = np.hanning(n)
+	elif name == 'hamming':
+		w = np.hamming(n)
+	elif name == 'blackman':
+		w = np.blackman(n)
+	elif name == 'bartlett':
+		w = np.bartlett(n)
+	elif name == 'barthann':
+		fac = np.linspace(0, 1, n)
+		w = 0.62 - 0.48*np.abs(fac - 0.5) + 0.38*np.cos(2*np.pi*(fac - 0.5))
+	elif name in COSINE_WINDOWS:
+		fac = np.linspace(-np.pi, np.pi, n)
+		w = np.zeros(n)
+		for k, a in enumerate(COSINE_WINDOWS[name]):
+			w += a*np.cos(k*fac)
+	else:
+		# boxcar.
+		w = np.ones(n)
+	return w[:size]
+
+def fft_size(width, sample_rate, span, max_size):
+	"""Return a tuple of (bins, span) with the number of FFT bins needed so
+	width bins cover span MHz of the sample_rate MHz bandwidth, and the span
+	actually shown.  Spans wider than the sample rate, or which would need at
+	least max_size bins (the number of samples available), show the whole
+	bandwidth in width bins.
+	"""
+	if span < sample_rate:
+		bins = int(width*(sample_rate/span))
+	else:
+		bins = width
+		span = sample_rate
+	if bins >= max_size:
+		bins = width
+		span = sample_rate
+	return bins, span
+
+def lo_shift(lo_offset, sample_rate, bins, swap_iq):
+	"""Return the number of bins (positive to the right) the center frequency
+	is moved from the middle of an FFT of the provided size by tuning the radio
+	lo_offset MHz away from it.
+	"""
+	# Frequency step in MHz between bins.
+	step = sample_rate/(bins + 2)
+	shift = int(lo_offset/step)
+	return shift if swap_iq else -shift
+
+def pan_shift(pan, sample_rate, bins):
+	"""Return the number of bins (positive to the right) the span shown is
+	moved by showing pan MHz above the frequency the radio was tuned for.
+	"""
+	return int(round(pan/(sample_rate/(bins + 2))))
+
+def spectrum_config(width, sample_rate, span, max_size, window_name, beta,
+	lo_offset, swap_iq, pan=0.0, taper=None):
+	"""Return the SpectrumConfig for spectrums width values wide of span MHz
+	of the sample_rate MHz bandwidth from blocks of max_size samples, with the
+	named window, the radio tuned lo_offset MHz away from the center, I and Q
+	swapped or not and the center shown pan MHz above the one tuned for.  The
+	taper of a previous config with the same window is reused if provided and
+	still the right size.
+	"""
+	bins, span = fft_size(width, sample_rate, span, max_size)
+	if taper is None or len(taper) != bins + 2:
+		taper = window(window_name, max_size, beta)[0:bins+2]
+		taper.flags.writeable = False
+	shift = lo_shift(lo_offset, sample_rate, bins, swap_iq) \
+		+ pan_shift(pan, sample_rate, bins)
+	return SpectrumConfig(width, sample_rate, bins, span,
+		sample_rate/(bins + 2), shift, taper, swap_iq)
+
+def magnitudes(samples, bins, taper=None, swap_iq=False):
+	"""Return the bins FFT magnitudes of the first bins+2 complex samples
+	multiplied by the taper (window) if provided, with the mean/DC values at
+	the ends dropped and shifted so the center frequency is in the middle.  The
+	order is reversed if I and Q are swapped.
+	"""
+	samples = samples[0:bins+2]
+	if taper is not None:
+		samples = samples*taper
+	freqs = np.absolute(np.fft.fft(samples))
+	# Ignore the mean/DC values at the ends.
+	freqs = freqs[1:-1]
+	if swap_iq:
+		freqs = freqs[::-1]
+	return np.fft.fftshift(freqs)
+
+def crop(freqs, width, shift=0):
+	"""Return width values from the middle of freqs, moved shift values to
+	the right if there is room to do so.
+	"""
+	if freqs.size <= width:
+		return freqs
+	# The excess values either side of the width.
+	extra = (freqs.size - width)//2
+	left = extra + shift if extra > abs(shift) else extra
+	return freqs[left:left+width]
+
+def to_db(freqs):
+	"""Convert magnitudes to decibels."""
+	return 20.0*np.log10(freqs)
+
+def power_spectrum(samples, width, bins, taper=None, swap_iq=False, shift=0):
+	"""Return width dB values of the spectrum of the samples, computed with a
+	bins FFT (see magnitudes) and cropped around the center (see crop).
+	"""
+	return to_db(crop(magnitudes(samples, bins, taper, swap_iq), width, shift))
+
+def averaged_power(samples, bins, taper=None, swap_iq=False):
+	"""Return the dB power spectrum of the samples averaged over consecutive
+	segments of bins samples (each multiplied by the taper if provided), with
+	the tuner frequency in the middle.  The order is reversed if I and Q are
+	swapped and the DC bin is replaced by the average of its neighbours.
+	"""
+	count = max(1, len(samples)//bins)
+	segments = samples[0:count*bins].reshape(count, bins)
+	if taper is not None:
+		segments = segments*taper
+	power = np.mean(np.abs(np.fft.fft(segments))**2, axis=0)
+	if swap_iq:
+		# Negate the frequencies, bin k becomes bin -k.
+		power = np.roll(power[::-1], 1)
+	power[0] = (power[1] + power[-1])/2.0
+	return 10.0*np.log10(np.fft.fftshift(power))
+
+def average(history, peak):
+	"""Return the peak (maximum) or the average of a 2D array of spectrums,
+	one per row.
+	"""
+	if peak:
+		return np.max(history, axis=0)
+	return np.average(history, axis=0)
+
+def auto_scale(freqs, min_db, max_db, min_auto=True, max_auto=True):
+	"""Return a tuple of (min dB, max dB) with the provided intensity range
+	widened to fit freqs when auto scaling each end.  A None end is replaced by
+	the spectrum's value.
+	"""
+	if min_auto:
+		lowest = np.min(freqs)
+		min_db = lowest if min_db is None else min(lowest, min_db)
+	if max_auto:
+		highest = np.max(freqs)
+		max_db = highest if max_db is None else max(highest, max_db)
+	return min_db, max_db
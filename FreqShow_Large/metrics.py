@@ -0,0 +1,233 @@
+# FreqShow metrics export.
+# Publishes counters and gauges of the model and main loop in the Prometheus
+# text format over a local HTTP endpoint and/or written to a file (like one
+# read by the node exporter's textfile collector), for panadapters which run
+# unattended.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import os
+import socket
+import sys
+import threading
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+
+import perf
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Quantiles reported for stage durations.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+		.replace('\n', '\\n')
+
+def _labels(labels):
+	if not labels:
+		return ''
+	return '{' + ','.join('{0}="{1}"'.format(k, _escape(v))
+		for k, v in labels) + '}'
+
+
+class Metrics(object):
+	"""Builder of a Prometheus text exposition."""
+
+	def __init__(self, timestamp=None):
+		"""Start an exposition.  Samples are stamped with the provided time in
+		seconds if given (for files, Prometheus stamps scraped samples itself).
+		"""
+		self.lines = []
+		self._types = set()
+		self._suffix = '' if timestamp is None \
+			else ' {0}'.format(int(timestamp*1000))
+
+	def add(self, name, kind, help, value, labels=()):
+		"""Add a sample of the named metric of the provided kind ('counter',
+		'gauge' or 'summary') with an optional sequence of (name, value)
+		label pairs.  Samples of None are left out.
+		"""
+		if value is None:
+			return
+		if name not in self._types:
+			self._types.add(name)
+			self.lines.append('# HELP {0} {1}'.format(name, help))
+			self.lines.append('# TYPE {0} {1}'.format(name, kind))
+		self.lines.append('{0}{1} {2}{3}'.format(name, _labels(labels),
+			repr(float(value)), self._suffix))
+
+	def add_summary(self, name, help, stats, total, count, labels=()):
+		"""Add a summary with the QUANTILES of the window of a
+		perf.RollingStats and the total and count of all values.
+		"""
+		labels = tuple(labels)
+		if name not in self._types:
+			self._types.add(name)
+			self.lines.append('# HELP {0} {1}'.format(name, help))
+			self.lines.append('# TYPE {0} summary'.format(name))
+		for q in QUANTILES:
+			self.lines.append('{0}{1} {2}{3}'.format(name,
+				_labels(labels + (('quantile', q),)),
+				repr(stats.percentile(100*q)), self._suffix))
+		self.lines.append('{0}_sum{1} {2}{3}'.format(name, _labels(labels),
+			repr(float(total)), self._suffix))
+		self.lines.append('{0}_count{1} {2}{3}'.format(name, _labels(labels),
+			count, self._suffix))
+
+	def text(self):
+		return '\n'.join(self.lines) + '\n'
+
+
+def collect(model, loop, timestamp=None):
+	"""Return the metrics of the provided model and scheduler as Prometheus
+	text.  Everything is read from state the main loop keeps anyway (stage
+	durations are aggregated by the scheduler on every run), so collecting
+	takes no locks the render loop waits on.
+	"""
+	m = Metrics(timestamp)
+	for task in list(loop.tasks):
+		stage = (('stage', task.name),)
+		m.add_summary('freqshow_stage_seconds',
+			'Wall time of each main loop stage.', task.durations,
+			task.total_time, task.runs, stage)
+		if loop.cpu_clock:
+			m.add('freqshow_stage_cpu_seconds_total', 'counter',
+				'CPU time of each main loop stage.', task.cpu_time, stage)
+		m.add('freqshow_stage_skipped_total', 'counter',
+			'Runs of each main loop stage skipped to keep up.', task.skipped,
+			stage)
+	# Finer grained timings when the performance HUD is on.
+	if perf.enabled:
+		for name in list(perf.order):
+			stats = perf.stages[name]
+			m.add('freqshow_perf_seconds', 'gauge',
+				'Mean recent duration of each timed step.', stats.mean(),
+				(('step', name),))
+	for name, value in sorted(perf.counters.items()):
+		m.add('freqshow_events_total', 'counter', 'Counted events.', value,
+			(('event', name),))
+	stats = model.get_read_stats()
+	for key in ('blocks', 'samples', 'short_reads', 'overruns', 'lost_samples',
+		'dropped_blocks', 'retunes', 'coalesced_retunes', 'stale_blocks'):
+		m.add('freqshow_sdr_{0}_total'.format(key), 'counter',
+			'Sample stream {0}.'.format(key.replace('_', ' ')), stats[key])
+	m.add('freqshow_sdr_read_latency_seconds', 'gauge',
+		'Time between the last two sample blocks.', stats['latency'])
+	m.add('freqshow_sdr_read_latency_max_seconds', 'gauge',
+		'Longest time between two sample blocks.', stats['max_latency'])
+	m.add('freqshow_fft_bins', 'gauge', 'FFT size of the last spectrum.',
+		model.fft_bins)
+	center_freq, span = model.get_display_range()
+	m.add('freqshow_center_frequency_hz', 'gauge', 'Displayed center frequency.',
+		center_freq*1e6)
+	m.add('freqshow_span_hz', 'gauge', 'Displayed frequency span.', span*1e6)
+	m.add('freqshow_sample_rate_hz', 'gauge', 'Radio sample rate.',
+		model.get_sample_rate()*1e6)
+	times = os.times()
+	m.add('freqshow_process_cpu_seconds_total', 'counter',
+		'User and system CPU time of the process.', times[0] + times[1])
+	return m.text()
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def handle_error(self, request, client_address):
+		# Scrapers disconnecting early are not worth a traceback.
+		if not isinstance(sys.exc_info()[1], socket.error):
+			HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+	def do_GET(self):
+		if self.path not in ('/', '/metrics'):
+			self.send_error(404)
+			return
+		body = self.server.exporter.text().encode('utf-8')
+		self.send_response(200)
+		self.send_header('Content-Type', CONTENT_TYPE)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		# Don't log every scrape to stderr.
+		pass
+
+
+class MetricsExporter(object):
+	"""Serves the metrics of a model and scheduler over HTTP at /metrics and/or
+	writes them to a file.
+
+	Metrics are only collected when scraped or written, from the aggregates
+	the main loop keeps, so exporting adds nothing to the per frame work.
+	"""
+
+	def __init__(self, model, loop, port=None, host='127.0.0.1', path=None):
+		"""Export the metrics of the provided model and scheduler on the
+		provided HTTP port (bound to host) if not None, and to the file at path
+		each time write is called if path is not None.
+		"""
+		self.model = model
+		self.loop = loop
+		self.path = path
+		self.port = None
+		self._server = None
+		if port is not None:
+			self._server = _Server((host, port), _Handler)
+			self._server.exporter = self
+			self.port = self._server.server_address[1]
+			thread = threading.Thread(target=self._server.serve_forever)
+			thread.daemon = True
+			thread.start()
+
+	def text(self, timestamp=None):
+		"""Return the current metrics as Prometheus text."""
+		return collect(self.model, self.loop, timestamp)
+
+	def write(self):
+		"""Replace the file with the current metrics.  The new metrics are
+		written to a temporary file renamed over it, so readers never see a
+		partial file.
+		"""
+		if self.path is None:
+			return
+		temp = self.path + '.tmp'
+		with open(temp, 'w') as f:
+			f.write(self.text())
+		os.rename(temp, self.path)
+
+	def close(self):
+		"""Stop serving."""
+		if self._server is not None:
+			self._server.shutdown()
+			self._server.server_close()
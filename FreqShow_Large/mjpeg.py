@@ -0,0 +1,142 @@
+# FreqShow MJPEG stream server.
+# Serves the latest rendered frame over HTTP as a multipart MJPEG stream (at /)
+# or a single JPEG image (at /frame.jpg) so a headless panadapter can be
+# watched from a browser.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import socket
+import sys
+import threading
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+
+
+BOUNDARY = 'freqshowframe'
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def handle_error(self, request, client_address):
+		# Clients disconnecting in the middle of a stream are expected.
+		if not isinstance(sys.exc_info()[1], socket.error):
+			HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+	def do_GET(self):
+		stream = self.server.stream
+		if self.path == '/frame.jpg':
+			frame, seq = stream.wait_frame(0)
+			if frame is None:
+				self.send_error(503, 'No frame rendered yet')
+				return
+			self.send_response(200)
+			self.send_header('Content-Type', 'image/jpeg')
+			self.send_header('Content-Length', str(len(frame)))
+			self.end_headers()
+			self.wfile.write(frame)
+			return
+		if self.path != '/':
+			self.send_error(404)
+			return
+		self.send_response(200)
+		self.send_header('Cache-Control', 'no-cache')
+		self.send_header('Content-Type',
+			'multipart/x-mixed-replace; boundary=' + BOUNDARY)
+		self.end_headers()
+		seq = 0
+		try:
+			while stream.running:
+				frame, seq = stream.wait_frame(seq)
+				if frame is None:
+					continue
+				self.wfile.write(('--{0}\r\nContent-Type: image/jpeg\r\n'
+					'Content-Length: {1}\r\n\r\n'.format(BOUNDARY,
+					len(frame))).encode('ascii'))
+				self.wfile.write(frame)
+				self.wfile.write(b'\r\n')
+		except (socket.error, IOError):
+			# Client went away.
+			pass
+
+	def log_message(self, format, *args):
+		# Don't log every request to stderr.
+		pass
+
+
+class MjpegServer(object):
+	"""HTTP server streaming JPEG frames to any number of clients.
+
+	The encoder publishes each new frame and every client thread sends the
+	newest frame as soon as it is available.  Slow clients simply skip frames,
+	they never hold up the publisher.
+	"""
+
+	def __init__(self, port, host='127.0.0.1'):
+		"""Start serving on the provided port and host address (only the local
+		machine by default, use '' or '0.0.0.0' to serve the network).
+		"""
+		self.frame = None
+		self.seq = 0
+		self.running = True
+		self._cond = threading.Condition()
+		self._server = _Server((host, port), _Handler)
+		self._server.stream = self
+		self.port = self._server.server_address[1]
+		self._thread = threading.Thread(target=self._server.serve_forever)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def publish(self, frame):
+		"""Send the provided JPEG data (bytes) to all clients."""
+		with self._cond:
+			self.frame = frame
+			self.seq += 1
+			self._cond.notify_all()
+
+	def wait_frame(self, seq, timeout=1.0):
+		"""Return a tuple of (frame, seq) with the newest frame once one newer
+		than seq is published, or (None, seq) after timeout seconds.
+		"""
+		with self._cond:
+			if self.seq <= seq:
+				self._cond.wait(timeout)
+			if self.seq <= seq or self.frame is None:
+				return None, seq
+			return self.frame, self.seq
+
+	def close(self):
+		"""Stop serving."""
+		self.running = False
+		with self._cond:
+			self._cond.notify_all()
+		self._server.shutdown()
+		self._server.server_close()
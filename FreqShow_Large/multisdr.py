@@ -0,0 +1,289 @@
+# FreqShow multiple radios.
+# Runs each RTL-SDR of a station with several radios in its own worker
+# process, which acquires and computes the spectra on its own CPU core and
+# returns them through shared memory.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import multiprocessing
+import signal
+import time
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+import numpy as np
+
+import freqshow
+import model
+import shmring
+
+
+# Settings of a DeviceModel applied to the model of its worker, in the order
+# they are applied when the worker starts.
+MIRRORED_SETTINGS = ('freq_correction', 'swap_iq', 'sample_rate', 'zoom_fac',
+	'lo_offset', 'filter', 'kaiser_beta', 'gain', 'center_freq', 'sweep_range')
+
+# Seconds to wait for a worker to open its radio.
+WORKER_TIMEOUT = 30.0
+
+# Seconds between the sample stream counters sent by a worker.
+STATS_INTERVAL = 1.0
+
+
+def run_worker(device, width, height, name, commands, status, ready,
+	setup=None):
+	"""Main function of a worker process.  Opens the radio with the provided
+	device index or serial number with a FreqShowModel of the provided
+	width and height, publishes its spectra to the '<name>_spectrum' ring
+	and applies the (setting, value) commands received until None is.  The
+	setup function, if provided, is called first (for example to install a
+	fake radio).
+	"""
+	# Leave Ctrl-C to the main process, which stops the workers as it exits.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	if setup is not None:
+		setup()
+	fsmodel = model.FreqShowModel(width, height, device)
+	publisher = shmring.SpectrumPublisher(fsmodel, name, freqshow.SHM_SLOTS)
+	status.put(fsmodel.get_read_stats())
+	ready.set()
+	period = 1.0/freqshow.ACQUIRE_RATE
+	next_stats = time.time() + STATS_INTERVAL
+	try:
+		while True:
+			if fsmodel.acquire():
+				fsmodel.update()
+			if time.time() >= next_stats:
+				next_stats += STATS_INTERVAL
+				try:
+					status.put_nowait(fsmodel.get_read_stats())
+				except queue.Full:
+					pass
+			# Wait for a command until the next block is due.
+			try:
+				command = commands.get(timeout=period)
+			except queue.Empty:
+				continue
+			if command is None:
+				break
+			apply_setting(fsmodel, *command)
+	finally:
+		publisher.close()
+		fsmodel.close()
+
+def apply_setting(fsmodel, name, value):
+	"""Change one of the MIRRORED_SETTINGS of the provided model."""
+	if name == 'sweep_range':
+		fsmodel.set_sweep(*(value or (None, None)))
+	else:
+		getattr(fsmodel, 'set_' + name)(value)
+
+
+class DeviceWorker(object):
+	"""Worker process of one radio (see run_worker) and the ring its spectra
+	are read from.
+	"""
+
+	def __init__(self, device, width, height, name, setup=None):
+		"""Start the worker of the radio with the provided device index or
+		serial number, publishing to the rings named name.  Waits until the
+		radio is open.
+		"""
+		self.device = device
+		self.commands = multiprocessing.Queue()
+		self.status = multiprocessing.Queue(maxsize=1)
+		ready = multiprocessing.Event()
+		try:
+			# Start the resource tracker before the worker so they share it
+			# (see shmring.RingReader).
+			from multiprocessing import resource_tracker
+			resource_tracker.ensure_running()
+		except ImportError:
+			pass
+		self.process = multiprocessing.Process(target=run_worker,
+			args=(device, width, height, name, self.commands, self.status,
+				ready, setup))
+		self.process.daemon = True
+		self.process.start()
+		if not ready.wait(WORKER_TIMEOUT):
+			self.process.terminate()
+			raise IOError('Radio {0} did not start'.format(device))
+		self._stats = self.status.get()
+		self.ring = shmring.RingReader(name + '_spectrum', untrack=False)
+
+	def send(self, name, value):
+		"""Change a setting of the worker's model."""
+		self.commands.put((name, value))
+
+	def stats(self):
+		"""Return the newest sample stream counters of the worker."""
+		try:
+			self._stats = self.status.get_nowait()
+		except queue.Empty:
+			pass
+		return self._stats
+
+	def close(self):
+		"""Stop the worker."""
+		if self.ring is None:
+			return
+		self.commands.put(None)
+		self.process.join(2.0)
+		if self.process.is_alive():
+			self.process.terminate()
+		self.ring.close()
+		self.ring = None
+
+
+class WorkerRadio(object):
+	"""Stand in for the rtlsdr.RtlSdr of a DeviceModel, which only keeps the
+	values set.  The radio itself is set by the worker's model.
+	"""
+
+	def __init__(self):
+		self.sample_rate = 2.4e6
+		self.center_freq = 100e6
+		self.gain = 0
+
+	def set_freq_correction(self, ppm):
+		pass
+
+	def set_center_freq(self, freq):
+		self.center_freq = freq
+
+	def get_center_freq(self):
+		return self.center_freq
+
+	def set_sample_rate(self, rate):
+		self.sample_rate = rate
+
+	def get_sample_rate(self):
+		return self.sample_rate
+
+	def set_manual_gain_enabled(self, enabled):
+		pass
+
+	def set_gain(self, gain):
+		self.gain = gain
+
+	def get_gain(self):
+		return self.gain
+
+
+class WorkerStream(object):
+	"""Stand in for the sdrstream.SampleStream of a DeviceModel, which counts
+	the tuning generations like the real stream.  The radio is tuned and
+	read by the worker.
+	"""
+
+	def __init__(self, radio, worker):
+		self.radio = radio
+		self.worker = worker
+		self.generation = 0
+		self.last_generation = 0
+
+	def tune(self, freq_hz):
+		self.radio.set_center_freq(freq_hz)
+		self.generation += 1
+		return self.generation
+
+	def sweep(self, freqs):
+		self.generation += 1
+
+	def start(self):
+		pass
+
+	def stop(self):
+		self.worker.close()
+
+	def stats(self):
+		return self.worker.stats()
+
+
+class DeviceModel(model.FreqShowModel):
+	"""FreqShowModel of a radio acquired and FFT'd by a worker process.
+
+	The settings live in this model and the views use it like any other
+	model, but every change of one of the MIRRORED_SETTINGS is sent to the
+	worker, whose own FreqShowModel of the radio then tunes, pans and sweeps
+	the same way.  acquire takes the newest spectrum the worker published to
+	its shared memory ring, skipping spectra of settings not applied yet, so
+	the main process only scales and draws.
+	"""
+
+	def __init__(self, width, height, device, name, setup=None):
+		"""Start the worker of the radio with the provided device index or
+		serial number, publishing its spectra to the '<name>_spectrum' ring
+		(see run_worker for setup).
+		"""
+		self.worker = DeviceWorker(device, width, height, name, setup)
+		self._spectrum = np.zeros(width, dtype=np.float32)
+		self._frame = -1
+		model.FreqShowModel.__init__(self, width, height, device)
+		self.listen(self._mirror, MIRRORED_SETTINGS)
+		# Bring the worker's model to the settings of this one.
+		for name in MIRRORED_SETTINGS:
+			self.worker.send(name, getattr(self, name))
+
+	def open_radio(self, device):
+		return WorkerRadio()
+
+	def open_stream(self, sdr):
+		return WorkerStream(sdr, self.worker)
+
+	def _mirror(self, event):
+		self.worker.send(event.name, event.new)
+
+	def acquire(self):
+		"""Take the newest spectrum published by the worker.  Returns False
+		if there is none since the last call or it is still of the settings
+		before a change.
+		"""
+		if self.worker.ring is None:
+			return False
+		result = self.worker.ring.latest(self._spectrum)
+		if result is None or result[0]['frame'] <= self._frame:
+			return False
+		meta, spectrum = result
+		self._frame = meta['frame']
+		# The span shown is the one the worker computes.
+		if self.sweep is None:
+			self.get_config()
+		# Spectra more than a pixel off (the radio may use a sample rate a
+		# little different from the one asked for) are from before a change.
+		center_freq, span = self.get_display_range()
+		pixel = span/self.width
+		if abs(meta['center_freq'] - center_freq) > pixel \
+			or abs(meta['span'] - span) > pixel:
+			return False
+		self.samples_generation = self.stream.generation
+		self.samples = spectrum
+		self.samples_seq += 1
+		return True
+
+	def get_data(self, samples=None):
+		"""Return the spectrum taken by acquire (the samples) in dB, scaled
+		like any other spectrum.
+		"""
+		return self.scale(samples.astype(np.float64))
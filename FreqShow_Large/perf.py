@@ -0,0 +1,173 @@
+# FreqShow performance instrumentation.
+# Per-stage timings of the spectrum pipeline and rendering kept in rolling
+# windows, frame rates and event counters, shown by the performance HUD (see
+# SpectrogramBase.render_hud).  Disabled by default, and when disabled timing
+# a stage costs one no-op method call.
+#
+# Usage:
+#   timer = perf.timer()
+#   ... first stage ...
+#   timer.lap('first')
+#   ... second stage ...
+#   timer.lap('second')
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import threading
+import time
+
+import numpy as np
+
+
+# Most precise clock available.
+clock = getattr(time, 'perf_counter', time.time)
+
+# True when stage timings are recorded.
+enabled = False
+# Rolling timings of each stage in seconds, by stage name, and the stage
+# names in the order they were first recorded.
+stages = {}
+order = []
+# Rolling frame rates by name.
+rates = {}
+# Event counts (like skipped frames or dropped samples) by name.  Counters are
+# kept whether or not timing is enabled.
+counters = {}
+_lock = threading.Lock()
+
+
+class RollingStats(object):
+	"""The last size values recorded (durations in seconds)."""
+
+	def __init__(self, size=256):
+		self.values = np.zeros(size)
+		self.count = 0
+
+	def add(self, value):
+		self.values[self.count % len(self.values)] = value
+		self.count += 1
+
+	def recent(self):
+		"""Return an array of the values in the window (unordered)."""
+		return self.values[:min(self.count, len(self.values))]
+
+	def mean(self):
+		values = self.recent()
+		return float(values.mean()) if len(values) else 0.0
+
+	def percentile(self, p):
+		values = self.recent()
+		return float(np.percentile(values, p)) if len(values) else 0.0
+
+	def histogram(self, bins=10):
+		"""Return a tuple of (counts, edges) of the values in the window, with
+		log spaced bins from 10 us to 1 s.
+		"""
+		return np.histogram(self.recent(), bins=np.logspace(-5, 0, bins + 1))
+
+
+class RollingRate(object):
+	"""Rate of the last size events, in events per second."""
+
+	def __init__(self, size=64):
+		self.times = RollingStats(size)
+
+	def tick(self, now):
+		self.times.add(now)
+
+	def rate(self):
+		times = self.times.recent()
+		if len(times) < 2:
+			return 0.0
+		span = times.max() - times.min()
+		return (len(times) - 1)/span if span > 0 else 0.0
+
+
+class _Timer(object):
+
+	def __init__(self):
+		self.last = clock()
+
+	def lap(self, stage):
+		"""Record the time since the previous lap (or the timer was created)
+		as the duration of the named stage.
+		"""
+		now = clock()
+		record(stage, now - self.last)
+		self.last = now
+
+
+class _NullTimer(object):
+
+	def lap(self, stage):
+		pass
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer():
+	"""Return a timer to record consecutive stages with, which does nothing
+	when timing is disabled.
+	"""
+	return _Timer() if enabled else _NULL_TIMER
+
+def record(stage, duration):
+	"""Record a duration in seconds for the named stage."""
+	stats = stages.get(stage)
+	if stats is None:
+		with _lock:
+			if stage not in stages:
+				order.append(stage)
+			stats = stages.setdefault(stage, RollingStats())
+	stats.add(duration)
+
+def tick(name):
+	"""Count one event (like a displayed frame) of the named rate."""
+	if not enabled:
+		return
+	rate = rates.get(name)
+	if rate is None:
+		with _lock:
+			rate = rates.setdefault(name, RollingRate())
+	rate.tick(clock())
+
+def count(name, amount=1):
+	"""Add to the named counter."""
+	with _lock:
+		counters[name] = counters.get(name, 0) + amount
+
+def set_enabled(value):
+	"""Turn timing on or off.  Turning it on starts from empty windows."""
+	global enabled
+	if value and not enabled:
+		with _lock:
+			stages.clear()
+			del order[:]
+			rates.clear()
+	enabled = bool(value)
+
+def summary():
+	"""Return a list of (stage, mean ms, 95th percentile ms) tuples in the
+	order the stages were first recorded.
+	"""
+	return [(name, 1000.0*stages[name].mean(), 1000.0*stages[name].percentile(95))
+		for name in list(order)]
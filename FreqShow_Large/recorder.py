@@ -0,0 +1,216 @@
+# FreqShow waterfall recorder.
+# Persists waterfall rows to a memory-mapped ring file on disk, with a small
+# sidecar index of timestamps, center frequency and span per segment, so the
+# waterfall history survives restarts and can be browsed by time.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import atexit
+import json
+import os
+import threading
+import time
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+import numpy as np
+
+
+class HistoryRecorder(object):
+	"""Ring of uint8 waterfall rows stored in a numpy.memmap file.
+
+	The recording directory holds three files:
+	  rows.dat   - capacity x width uint8 rows (the quantized waterfall levels).
+	  times.dat  - capacity float64 timestamps, one per row.
+	  index.json - width, capacity, total rows written and the list of
+	               segments.  A new segment starts whenever the center
+	               frequency, span or intensity scale changes and records
+	               [first row, time, center MHz, span MHz, min dB, max dB].
+	Rows are numbered from the first row ever written so a row's position in
+	the ring is its number modulo the capacity.  Rows are queued by add and
+	written in batches by a background thread so the render loop never waits
+	on the disk.  The index is only saved every index_interval seconds and on
+	close, rows written since are lost if the program doesn't exit cleanly.
+	"""
+
+	def __init__(self, path, width, capacity, decimate=1, batch=32,
+		index_interval=60.0):
+		"""Open (or create) a recording in the provided directory for rows of
+		the provided width, keeping at most capacity rows.  Every decimate
+		rows added are reduced (by their maximum) to one recorded row, up to
+		batch rows are written to disk at a time and the index is saved every
+		index_interval seconds.
+		"""
+		self.path = path
+		self.width = width
+		self.capacity = capacity
+		self.decimate = max(1, int(decimate))
+		self.batch = batch
+		self.index_interval = index_interval
+		self._index_saved = time.time()
+		self.dropped = 0
+		self._lock = threading.Lock()
+		self._queue = queue.Queue(maxsize=4*batch)
+		self._reduced = np.zeros(width, dtype=np.uint8)
+		self._reduced_count = 0
+		if not os.path.isdir(path):
+			os.makedirs(path)
+		self.total = 0
+		self.segments = []
+		mode = 'w+'
+		index = self._load_index()
+		if index is not None and index['width'] == width \
+			and index['capacity'] == capacity:
+			# Resume the existing recording.
+			self.total = index['rows']
+			self.segments = index['segments']
+			mode = 'r+'
+		self.rows = np.memmap(os.path.join(path, 'rows.dat'), dtype=np.uint8,
+			mode=mode, shape=(capacity, width))
+		self.times = np.memmap(os.path.join(path, 'times.dat'),
+			dtype=np.float64, mode=mode, shape=(capacity,))
+		self._running = True
+		self._thread = threading.Thread(target=self._run)
+		self._thread.daemon = True
+		self._thread.start()
+		atexit.register(self.close)
+
+	def _load_index(self):
+		try:
+			with open(os.path.join(self.path, 'index.json')) as f:
+				return json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+
+	def _save_index(self):
+		name = os.path.join(self.path, 'index.json')
+		with open(name + '.tmp', 'w') as f:
+			json.dump({'width': self.width, 'capacity': self.capacity,
+				'rows': self.total, 'segments': self.segments}, f)
+		os.rename(name + '.tmp', name)
+		self._index_saved = time.time()
+
+	def add(self, row, timestamp, center_freq, span, min_db, max_db):
+		"""Add a row of uint8 waterfall levels recorded at the provided time
+		with the tuning and intensity scale it was quantized with.  Never
+		blocks, rows are dropped (and counted) if the writer falls behind.
+		"""
+		np.maximum(self._reduced, row, out=self._reduced)
+		self._reduced_count += 1
+		if self._reduced_count < self.decimate:
+			return
+		try:
+			self._queue.put_nowait((self._reduced.copy(), timestamp,
+				(center_freq, span, min_db, max_db)))
+		except queue.Full:
+			self.dropped += 1
+		self._reduced.fill(0)
+		self._reduced_count = 0
+
+	def _run(self):
+		while self._running or not self._queue.empty():
+			try:
+				items = [self._queue.get(timeout=0.5)]
+			except queue.Empty:
+				continue
+			while len(items) < self.batch:
+				try:
+					items.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+			self._write(items)
+
+	def _write(self, items):
+		total = self.total
+		for row, timestamp, params in items:
+			if not self.segments or tuple(self.segments[-1][2:]) != params:
+				self.segments.append([total, timestamp] + list(params))
+			self.rows[total % self.capacity] = row
+			self.times[total % self.capacity] = timestamp
+			total += 1
+		self.rows.flush()
+		self.times.flush()
+		# Forget segments which have been completely overwritten.
+		first = max(0, total - self.capacity)
+		while len(self.segments) > 1 and self.segments[1][0] <= first:
+			self.segments.pop(0)
+		with self._lock:
+			self.total = total
+		if time.time() - self._index_saved >= self.index_interval:
+			self._save_index()
+
+	def close(self):
+		"""Write any queued rows, stop the writer thread and save the index."""
+		if not self._running:
+			return
+		self._running = False
+		self._thread.join()
+		self._save_index()
+
+	@property
+	def first_row(self):
+		"""Number of the oldest row still in the recording."""
+		return max(0, self.total - self.capacity)
+
+	def find(self, timestamp):
+		"""Return the number of the last row recorded at or before the provided
+		time (or the first row if the time is before the recording) using a
+		binary search of the row timestamps.  Returns None if nothing has been
+		recorded.
+		"""
+		with self._lock:
+			lo, hi = self.first_row, self.total
+		if lo == hi:
+			return None
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if self.times[mid % self.capacity] <= timestamp:
+				lo = mid + 1
+			else:
+				hi = mid
+		return max(self.first_row, lo - 1)
+
+	def read(self, last, count):
+		"""Return a tuple of (rows, timestamps) with up to count rows ending
+		with (and including) the provided row number, oldest first.
+		"""
+		with self._lock:
+			first = max(self.first_row, last - count + 1)
+			last = min(last, self.total - 1)
+		index = np.arange(first, last + 1) % self.capacity
+		return self.rows[index], self.times[index]
+
+	def segment(self, row):
+		"""Return the segment [first row, time, center MHz, span MHz, min dB,
+		max dB] the provided row number belongs to.
+		"""
+		segments = self.segments
+		lo, hi = 0, len(segments)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if segments[mid][0] <= row:
+				lo = mid + 1
+			else:
+				hi = mid
+		return segments[max(0, lo - 1)] if segments else None
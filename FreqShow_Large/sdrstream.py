@@ -0,0 +1,367 @@
+# FreqShow radio sample stream.
+# Reads blocks of samples from the RTL-SDR continuously in a background thread
+# and tracks the continuity of every block so lost samples, USB overruns,
+# short reads and read latency can be measured.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import collections
+import threading
+import time
+
+import perf
+
+
+class SampleStream(object):
+	"""Source of sample blocks for the model with continuity tracking.
+
+	When streaming, a background thread reads blocks of block_size samples
+	back to back (with the radio's asynchronous read if available) and keeps
+	only the newest one for the model to take with read.  Every block gets a
+	sequence number and is checked against the sample clock: samples which
+	should have arrived by the time a block is received, according to the
+	sample rate, but didn't were lost by the dongle or USB (an overrun).
+	Blocks normally arrive in bursts (the radio library buffers the USB
+	transfers) so a late block alone is not an overrun: it is one when it is
+	late and the samples received also fall more than a block behind the
+	sample clock.  The shortfall is counted in lost_samples.  When not
+	streaming, read does a blocking read of the radio and only read latency
+	and short reads are tracked.
+
+	Retunes requested with tune don't touch the radio from the caller's
+	thread.  The latest target is applied by the thread reading the radio
+	between two blocks, so retunes requested while one is pending are
+	coalesced into one.  Each tune starts a new tuning generation and blocks
+	are tagged with the generation they were received at.  The settle blocks
+	received right after a retune is applied may still hold samples from
+	before it and are discarded, as is any block of an older generation not
+	taken yet.  An error reading the radio stops the background thread and is
+	raised by the next read or read_hops.
+
+	While sweeping (see sweep) the thread reading the radio hops through a
+	list of frequencies by itself: as soon as the first settled block of a
+	hop is received it is queued for read_hops and the next hop is tuned, so
+	the radio retunes while the previous hop's spectrum is computed.
+	"""
+
+	# A block arriving this many block durations after the previous one
+	# counts as an overrun.
+	overrun_factor = 2.0
+
+	def __init__(self, sdr, block_size, streaming=True,
+		clock=getattr(time, 'monotonic', time.time), settle=1):
+		"""Read blocks of block_size samples from the provided radio,
+		discarding settle blocks after each retune.  Blocks are timed with
+		clock (a monotonic clock when available, so the wall clock being set
+		isn't mistaken for an overrun).
+		"""
+		self.sdr = sdr
+		self.block_size = block_size
+		self.streaming = streaming
+		self.clock = clock
+		self.settle = settle
+		self._lock = threading.Lock()
+		self._block = None
+		self._block_seq = 0
+		self._taken_seq = 0
+		self.generation = 0			# Tunings requested.
+		self.applied = 0			# Generation of the tuning the radio is at.
+		self.last_generation = 0	# Generation of the block last read.
+		self._target = None			# Frequency of a pending retune.
+		self._settle = 0			# Blocks left to discard after a retune.
+		self._hops = None			# Frequencies swept through, if sweeping.
+		self._hop = None			# (generation, index) of the last hop tuned.
+		self._hop_blocks = collections.deque()
+		self.reset()
+		self._thread = None
+		self._running = False
+		self.error = None			# Exception which stopped the thread.
+
+	def reset(self):
+		"""Clear the counters, for example after changing the sample rate."""
+		with self._lock:
+			self.seq = 0			# Blocks received.
+			self.received = 0		# Samples received.
+			self.short_reads = 0	# Blocks with fewer samples than requested.
+			self.overruns = 0		# Gaps in the stream longer than overrun_factor blocks.
+			self.lost_samples = 0	# Estimated samples lost in those gaps.
+			self.dropped = 0		# Blocks replaced before the model took them
+									# (expected when blocks arrive faster
+									# than ACQUIRE_RATE).
+			self.retunes = 0		# Retunes applied to the radio.
+			self.coalesced = 0		# Retunes replaced by a later one before
+									# they were applied.
+			self.stale = 0			# Blocks discarded after a retune.
+			self.latency = 0.0		# Time between the last two blocks.
+			self.max_latency = 0.0
+			self.start_time = None
+			self._last_time = None
+			self._rate = None
+			self._expected = 0	# Samples received or lost since start_time.
+
+	def start(self):
+		"""Start streaming in a background thread (if streaming)."""
+		if not self.streaming or self._running:
+			return
+		self._running = True
+		self._thread = threading.Thread(target=self._run)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def stop(self):
+		"""Stop streaming."""
+		if not self._running:
+			return
+		self._running = False
+		try:
+			self.sdr.cancel_read_async()
+		except (AttributeError, IOError):
+			pass
+		self._thread.join(1.0)
+
+	def tune(self, freq_hz):
+		"""Retune the radio to the provided frequency (in Hz) between blocks.
+		Returns the tuning generation blocks received at that frequency are
+		tagged with.
+		"""
+		with self._lock:
+			return self._request(freq_hz)
+
+	def _request(self, freq_hz):
+		# Make freq_hz the pending retune.  Lock must be held.
+		if self._target is not None:
+			self.coalesced += 1
+			perf.count('sdr coalesced retunes')
+		self._target = freq_hz
+		self.generation += 1
+		return self.generation
+
+	def sweep(self, freqs):
+		"""Hop through the provided list of frequencies (in Hz) over and over,
+		or stop sweeping if None.  The blocks of each hop are returned by
+		read_hops instead of read.
+		"""
+		with self._lock:
+			self._hops = list(freqs) if freqs else None
+			self._hop = None
+			self._hop_blocks = collections.deque(maxlen=2*len(freqs) if freqs else None)
+		if freqs:
+			self._next_hop(0)
+
+	def _next_hop(self, index):
+		# Request the retune to the hop with the provided index.
+		with self._lock:
+			if self._hops is None:
+				return
+			index %= len(self._hops)
+			self._hop = (self._request(self._hops[index]), index)
+
+	def read_hops(self):
+		"""Return a list of (hop index, samples) of the hops received since
+		the last call, oldest first.  When not streaming one hop is read
+		(blocking) and the next hop is tuned before returning.
+		"""
+		if self.error is not None:
+			raise self.error
+		if not self.streaming or not self._running:
+			self._retune()
+		if not self.streaming:
+			samples = self.read()
+			with self._lock:
+				hop = self._hop
+			if hop is None or self.last_generation != hop[0]:
+				return []
+			self._next_hop(hop[1] + 1)
+			# Retune right away so the tuner settles while the spectrum of
+			# this hop is computed.
+			self._retune()
+			return [(hop[1], samples)]
+		with self._lock:
+			blocks = list(self._hop_blocks)
+			self._hop_blocks.clear()
+		return blocks
+
+	def _retune(self):
+		# Apply the pending retune, if any.  Called by the thread reading the
+		# radio between blocks.
+		with self._lock:
+			target, generation = self._target, self.generation
+			self._target = None
+		if target is None:
+			return
+		try:
+			self.sdr.set_center_freq(float(target))
+		except IOError:
+			# Error setting value, ignore it for now but in the future consider
+			# adding an error message dialog.
+			pass
+		with self._lock:
+			self.applied = generation
+			self._settle = self.settle
+			self.retunes += 1
+
+	def _run(self):
+		try:
+			self._stream()
+		except Exception as e:
+			# Keep the error (like the radio being unplugged) for read to raise.
+			if self._running:
+				self.error = e
+
+	def _stream(self):
+		self._retune()
+		read_async = getattr(self.sdr, 'read_samples_async', None)
+		if read_async is not None:
+			try:
+				read_async(self._received, self.block_size)
+				return
+			except (IOError, NotImplementedError):
+				if not self._running:
+					return
+		# Blocking reads back to back.
+		while self._running:
+			self._received(self.sdr.read_samples(self.block_size), None)
+
+	def _received(self, samples, context):
+		now = self.clock()
+		rate = self.sdr.get_sample_rate()
+		next_hop = None
+		with self._lock:
+			if rate != self._rate:
+				# Restart the sample clock after a sample rate change.
+				self._rate = rate
+				self.start_time = now
+				self._last_time = None
+				self._expected = 0
+			self._track(samples, now)
+			hop = self._hop
+			if not self._settled():
+				pass
+			elif self._hops is None:
+				if self._block_seq > self._taken_seq:
+					self.dropped += 1
+					perf.count('sdr dropped blocks')
+				self._block = (samples, self.applied)
+				self._block_seq += 1
+			elif hop is not None and hop[0] == self.applied:
+				# First settled block of a hop.
+				self._hop_blocks.append((hop[1], samples))
+				self._hop = None
+				next_hop = hop[1] + 1
+		if next_hop is not None:
+			self._next_hop(next_hop)
+		if self._target is not None and self._running:
+			# Between two blocks, the right time to retune.
+			self._retune()
+
+	def _settled(self):
+		# Return False (and count the block as stale) if the block just
+		# received has to be discarded after a retune.  Lock must be held.
+		if self._settle <= 0:
+			return True
+		self._settle -= 1
+		self.stale += 1
+		perf.count('sdr stale blocks')
+		return False
+
+	def _track(self, samples, now, latency=None):
+		# Latency is the time since the previous block unless provided.
+		self.seq += 1
+		self.received += len(samples)
+		if len(samples) < self.block_size:
+			self.short_reads += 1
+			perf.count('sdr short reads')
+		if latency is None and self._last_time is not None:
+			latency = now - self._last_time
+		if latency is not None:
+			self.latency = latency
+			self.max_latency = max(self.max_latency, latency)
+			if perf.enabled:
+				perf.record('sdr latency', latency)
+		if self.streaming and self._rate and self._last_time is not None:
+			duration = float(self.block_size)/self._rate
+			# Samples the radio should have delivered by now, less the block
+			# which may still be in flight.
+			behind = int((now - self.start_time)*self._rate) \
+				- self._expected - self.block_size
+			if latency > self.overrun_factor*duration and behind > 0:
+				self.overruns += 1
+				self.lost_samples += behind
+				self._expected += behind
+				perf.count('sdr overruns')
+				perf.count('sdr lost samples', behind)
+		self._expected += len(samples)
+		self._last_time = now
+
+	def read(self):
+		"""Return the newest block of samples not returned before, or None if
+		no new block has been received at the current tuning (when streaming).
+		Blocks until a block is read when not streaming.  The tuning generation
+		of the block returned is kept in last_generation.  Raises the error
+		which stopped the background thread, if any.
+		"""
+		if self.error is not None:
+			raise self.error
+		if not self.streaming or not self._running:
+			self._retune()
+		if not self.streaming:
+			while True:
+				start = self.clock()
+				samples = self.sdr.read_samples(self.block_size)
+				now = self.clock()
+				with self._lock:
+					self._rate = self.sdr.get_sample_rate()
+					# Latency of a blocking read is the time spent in the read.
+					self._track(samples, now, now - start)
+					if self._settled():
+						self.last_generation = self.applied
+						return samples
+		with self._lock:
+			if self._block_seq <= self._taken_seq:
+				return None
+			self._taken_seq = self._block_seq
+			samples, generation = self._block
+			if generation != self.applied:
+				# Received before the last retune.
+				self.stale += 1
+				perf.count('sdr stale blocks')
+				return None
+			self.last_generation = generation
+			return samples
+
+	def stats(self):
+		"""Return a dict of the stream counters."""
+		with self._lock:
+			return {
+				'blocks': self.seq,
+				'samples': self.received,
+				'short_reads': self.short_reads,
+				'overruns': self.overruns,
+				'lost_samples': self.lost_samples,
+				'dropped_blocks': self.dropped,
+				'retunes': self.retunes,
+				'coalesced_retunes': self.coalesced,
+				'stale_blocks': self.stale,
+				'latency': self.latency,
+				'max_latency': self.max_latency,
+				'sample_rate': self._rate,
+			}
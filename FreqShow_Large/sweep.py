@@ -0,0 +1,120 @@
+# FreqShow wideband sweep.
+# Hops the tuner across a frequency range wider than its bandwidth and
+# stitches the spectrum of each hop into one spectrum, like rtl_power but live.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import math
+
+import numpy as np
+
+import dsp
+
+
+class SweepPlan(object):
+	"""Hops covering a frequency range and the spectrum stitched from them.
+
+	The range is split into hops spaced by the usable fraction of the sample
+	rate.  Each hop's spectrum is the average of the FFTs of bins samples
+	segments of its block of samples (see dsp.averaged_power), trimmed to
+	the hop's share of the range so the edges of the bandwidth, attenuated by
+	the tuner's filters and overlapping the neighbouring hops, aren't used.
+	The trimmed spectrum is reduced (by its maximum) or interpolated to the
+	display values it covers and written into row, which always holds the
+	newest spectrum of every hop.
+	"""
+
+	def __init__(self, start, stop, sample_rate, width, bins, usable=0.75,
+		taper=None, swap_iq=False):
+		"""Plan a sweep from start to stop MHz shown in width values, with
+		hops of sample_rate MHz of which the usable fraction is kept, and
+		FFTs of bins samples multiplied by the taper if provided.
+		"""
+		self.start = float(start)
+		self.stop = float(stop)
+		self.bins = bins
+		self.taper = taper
+		self.swap_iq = swap_iq
+		self.step = sample_rate*usable
+		count = max(1, int(math.ceil((self.stop - self.start)/self.step)))
+		# Hop center frequencies in MHz, centered on the range.
+		self.freqs = (self.start + self.stop)/2.0 \
+			+ (np.arange(count) - (count - 1)/2.0)*self.step
+		self.row = np.zeros(width)
+		self.seen = np.zeros(count, dtype=bool)
+		self.sweeps = 0
+		# Display values (by the frequency at their center) each hop covers
+		# and how they are computed from the hop's FFT bins.
+		pixel = (self.stop - self.start)/width
+		centers = self.start + (np.arange(width) + 0.5)*pixel
+		hop_of = np.clip(np.floor((centers - self.freqs[0])/self.step + 0.5),
+			0, count - 1).astype(int)
+		bin_width = float(sample_rate)/bins
+		self.maps = []
+		for i, freq in enumerate(self.freqs):
+			pixels = np.flatnonzero(hop_of == i)
+			if not len(pixels):
+				self.maps.append(None)
+				continue
+			first, last = pixels[0], pixels[-1] + 1
+			if pixel >= bin_width:
+				# Several bins per value, keep the highest.
+				edges = self.start + np.arange(first, last + 1)*pixel
+				index = np.clip(np.floor((edges - freq)/bin_width + bins//2),
+					0, bins - 1).astype(int)
+				self.maps.append((first, last, index, None))
+			else:
+				# Fewer bins than values, interpolate.
+				bin_freqs = freq + (np.arange(bins) - bins//2)*bin_width
+				self.maps.append((first, last, centers[first:last], bin_freqs))
+
+	def hops(self):
+		"""Return the list of hop center frequencies in Hz."""
+		return [float(f*1000000.0) for f in self.freqs]
+
+	def center(self):
+		"""Return the center frequency of the range in MHz."""
+		return (self.start + self.stop)/2.0
+
+	def span(self):
+		"""Return the width of the range in MHz."""
+		return self.stop - self.start
+
+	def add(self, index, samples):
+		"""Stitch the spectrum of the block of samples received at the hop
+		with the provided index into row.  Returns True if this completed a
+		sweep of the whole range.
+		"""
+		power = dsp.averaged_power(samples, self.bins, self.taper, self.swap_iq)
+		hop_map = self.maps[index]
+		if hop_map is not None:
+			first, last, index_or_freqs, bin_freqs = hop_map
+			if bin_freqs is None:
+				edges = index_or_freqs
+				self.row[first:last] = np.maximum.reduceat(power[:edges[-1]+1],
+					edges[:-1])[:last-first]
+			else:
+				self.row[first:last] = np.interp(index_or_freqs, bin_freqs, power)
+		self.seen[index] = True
+		if index == len(self.freqs) - 1 and self.seen.all():
+			self.sweeps += 1
+			return True
+		return False
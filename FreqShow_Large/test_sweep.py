@@ -0,0 +1,142 @@
+# FreqShow sweep tests.
+# Feeds synthetic IQ samples of known tones to every hop of a sweep.SweepPlan
+# and checks each tone lands on the display value of its frequency, when
+# several FFT bins are reduced to a value and when the values are interpolated
+# from fewer bins, with and without swapped I and Q.
+#
+# Usage: python -m unittest test_sweep   (or pytest)
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import unittest
+
+import numpy as np
+
+import dsp
+import sweep
+
+
+# Sample rate of every hop in MHz, display width and samples per hop block.
+SAMPLE_RATE = 2.4
+WIDTH = 320
+SAMPLES = 16*1024
+NOISE = 1e-3
+
+# How far (in display values) a tone's peak may be from where it belongs.
+PIXEL_TOLERANCE = 1
+
+
+def synthetic_samples(plan, index, tones):
+	"""Return a block of the IQ samples the radio would deliver tuned to the
+	hop with the provided index, with the tones (in MHz) inside its bandwidth.
+	With swap_iq the radio sees an inverted spectrum (a tone above the hop
+	center arrives below it).
+	"""
+	center = plan.freqs[index]
+	t = np.arange(SAMPLES)/(SAMPLE_RATE*1e6)
+	rand = np.random.RandomState(index)
+	samples = NOISE*(rand.randn(SAMPLES) + 1j*rand.randn(SAMPLES))
+	for freq in tones:
+		offset = freq - center
+		if abs(offset) >= SAMPLE_RATE/2.0:
+			continue
+		if plan.swap_iq:
+			offset = -offset
+		samples += np.exp(2j*np.pi*offset*1e6*t)
+	return samples
+
+
+def expected_pixel(plan, freq):
+	"""Return the display value the provided frequency in MHz belongs to."""
+	return int((freq - plan.start)/plan.span()*WIDTH)
+
+
+def run_sweep(plan, tones):
+	"""Feed one sweep of every hop to the plan, checking only the last hop
+	completes it, and return the stitched row.
+	"""
+	for index in range(len(plan.freqs)):
+		complete = plan.add(index, synthetic_samples(plan, index, tones))
+		assert complete == (index == len(plan.freqs) - 1)
+	return plan.row
+
+
+class SweepPlanTest(unittest.TestCase):
+
+	def check_tones(self, plan, tones):
+		row = run_sweep(plan, tones)
+		self.assertEqual(plan.sweeps, 1)
+		for freq in tones:
+			expected = expected_pixel(plan, freq)
+			lo = max(0, expected - 4*PIXEL_TOLERANCE)
+			pixel = lo + np.argmax(row[lo:expected + 4*PIXEL_TOLERANCE + 1])
+			self.assertLessEqual(abs(pixel - expected), PIXEL_TOLERANCE,
+				'tone at {0} MHz on value {1}, expected {2}'.format(freq,
+				pixel, expected))
+			# Well above the noise floor of the row.
+			self.assertGreater(row[pixel], np.median(row) + 30)
+
+	def test_hops(self):
+		plan = sweep.SweepPlan(100.0, 110.0, SAMPLE_RATE, WIDTH, 1024)
+		self.assertEqual(len(plan.freqs), 6)
+		self.assertAlmostEqual(plan.center(), 105.0)
+		self.assertAlmostEqual(plan.span(), 10.0)
+		# The hops cover the whole range with the usable part of each.
+		self.assertLessEqual(plan.freqs[0] - plan.step/2.0, plan.start)
+		self.assertGreaterEqual(plan.freqs[-1] + plan.step/2.0, plan.stop)
+		self.assertEqual(plan.hops()[0], plan.freqs[0]*1000000.0)
+
+	def test_reduced_tones(self):
+		# Several bins per display value, tones in different hops and one
+		# near the edge between two hops.
+		taper = dsp.window('nuttall', 1024, 8.6)
+		plan = sweep.SweepPlan(100.0, 110.0, SAMPLE_RATE, WIDTH, 1024,
+			taper=taper)
+		edge = (plan.freqs[2] + plan.freqs[3])/2.0 - 0.05
+		self.check_tones(plan, [100.4, 103.3, edge, 109.6])
+
+	def test_reduced_tones_swap_iq(self):
+		taper = dsp.window('nuttall', 1024, 8.6)
+		plan = sweep.SweepPlan(100.0, 110.0, SAMPLE_RATE, WIDTH, 1024,
+			taper=taper, swap_iq=True)
+		self.check_tones(plan, [100.4, 103.3, 109.6])
+
+	def test_interpolated_tones(self):
+		# A range narrower than a hop with fewer bins than display values,
+		# tones on bin centers so the interpolated peak is exact.
+		plan = sweep.SweepPlan(100.0, 100.2, SAMPLE_RATE, WIDTH, 256)
+		self.assertEqual(len(plan.freqs), 1)
+		bin_width = SAMPLE_RATE/256
+		self.assertLess(plan.span()/WIDTH, bin_width)
+		center = plan.freqs[0]
+		self.check_tones(plan, [center - 5*bin_width, center + 7*bin_width])
+
+	def test_interpolated_tones_swap_iq(self):
+		plan = sweep.SweepPlan(100.0, 100.2, SAMPLE_RATE, WIDTH, 256,
+			swap_iq=True)
+		bin_width = SAMPLE_RATE/256
+		center = plan.freqs[0]
+		self.check_tones(plan, [center - 5*bin_width, center + 7*bin_width])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,327 @@
+# FreqShow WebSocket spectrum server.
+# Publishes every spectrum computed by the model to WebSocket clients as
+# compact binary messages so browsers and tools can draw the waterfall
+# themselves without adding load to the display.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import base64
+import hashlib
+import socket
+import struct
+import threading
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+import numpy as np
+
+
+# Each binary message is a header followed by width uint8 levels, 0 is the
+# min dB and 255 the max dB of the header.  The header fields are: magic
+# b'FQS1', width (uint16), sequence number (uint32), center frequency and span
+# (MHz, float64) and min and max intensity (dB, float32), all little endian.
+HEADER = struct.Struct('<4sHIddff')
+MAGIC = b'FQS1'
+
+# WebSocket opcodes and handshake GUID (RFC 6455).
+OP_BINARY = 0x2
+OP_CLOSE  = 0x8
+OP_PING   = 0x9
+OP_PONG   = 0xA
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# Largest payload read from a frame, control frames are limited to 125 bytes
+# by the RFC.  Larger frames close the connection with CLOSE_TOO_BIG.
+MAX_PAYLOAD         = 65536
+MAX_CONTROL_PAYLOAD = 125
+CLOSE_TOO_BIG       = 1009
+
+
+class FrameTooBig(Exception):
+	"""Raised by read_frame for a frame larger than allowed."""
+	pass
+
+
+def accept_key(key):
+	"""Return the Sec-WebSocket-Accept value for a Sec-WebSocket-Key."""
+	digest = hashlib.sha1((key + GUID).encode('ascii')).digest()
+	return base64.b64encode(digest).decode('ascii')
+
+def encode_frame(opcode, payload, mask=None):
+	"""Return a single final WebSocket frame with the provided opcode and
+	payload bytes.  Clients must provide a 4 byte mask, servers send unmasked
+	frames.
+	"""
+	length = len(payload)
+	mask_bit = 0x80 if mask is not None else 0
+	if length < 126:
+		header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+	elif length < 65536:
+		header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+	else:
+		header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+	if mask is None:
+		return header + payload
+	return header + mask + _unmask(payload, mask)
+
+def read_frame(sock, max_payload=MAX_PAYLOAD):
+	"""Read a WebSocket frame from the socket and return a tuple of (opcode,
+	payload bytes).  Raises EOFError if the connection is closed and
+	FrameTooBig, before reading the payload, if it is longer than max_payload
+	(or MAX_CONTROL_PAYLOAD for control frames).
+	"""
+	first, second = struct.unpack('!BB', _recv_exactly(sock, 2))
+	opcode = first & 0x0F
+	length = second & 0x7F
+	if length == 126:
+		length = struct.unpack('!H', _recv_exactly(sock, 2))[0]
+	elif length == 127:
+		length = struct.unpack('!Q', _recv_exactly(sock, 8))[0]
+	if length > (MAX_CONTROL_PAYLOAD if opcode & 0x8 else max_payload):
+		raise FrameTooBig('Frame of {0} bytes'.format(length))
+	mask = _recv_exactly(sock, 4) if second & 0x80 else None
+	payload = _recv_exactly(sock, length)
+	if mask is not None:
+		payload = _unmask(payload, mask)
+	return opcode, payload
+
+def encode_spectrum(seq, center_freq, span, min_db, max_db, levels):
+	"""Return the binary message for a row of uint8 levels."""
+	return HEADER.pack(MAGIC, len(levels), seq & 0xFFFFFFFF, center_freq, span,
+		min_db, max_db) + levels.tobytes()
+
+def decode_spectrum(message):
+	"""Return a tuple of (header dict, uint8 levels) decoded from a binary
+	spectrum message.
+	"""
+	magic, width, seq, center_freq, span, min_db, max_db = \
+		HEADER.unpack_from(message)
+	if magic != MAGIC:
+		raise ValueError('Not a FreqShow spectrum message')
+	levels = np.frombuffer(message, dtype=np.uint8, count=width,
+		offset=HEADER.size)
+	return dict(seq=seq, center_freq=center_freq, span=span, min_db=min_db,
+		max_db=max_db), levels
+
+def _recv_exactly(sock, count):
+	data = b''
+	while len(data) < count:
+		chunk = sock.recv(count - len(data))
+		if not chunk:
+			raise EOFError('Connection closed')
+		data += chunk
+	return data
+
+def _unmask(payload, mask):
+	data = np.frombuffer(payload, dtype=np.uint8)
+	key = np.resize(np.frombuffer(mask, dtype=np.uint8), len(data))
+	return np.bitwise_xor(data, key).tobytes()
+
+
+class _Client(object):
+	"""Connected client with its own queue of messages.  When the queue is
+	full the oldest message is dropped so a slow client only loses frames.
+	"""
+
+	def __init__(self, server, sock, queue_size):
+		self.server = server
+		self.sock = sock
+		self.queue = queue.Queue(maxsize=queue_size)
+		self.dropped = 0
+		self.closed = False
+
+	def start(self):
+		for target in (self._write, self._read):
+			thread = threading.Thread(target=target)
+			thread.daemon = True
+			thread.start()
+
+	def send(self, message):
+		while True:
+			try:
+				self.queue.put_nowait(message)
+				return
+			except queue.Full:
+				try:
+					self.queue.get_nowait()
+					self.dropped += 1
+				except queue.Empty:
+					pass
+
+	def close(self):
+		if self.closed:
+			return
+		self.closed = True
+		self.server._remove(self)
+		# Wake up the writer so it can exit.
+		self.send(None)
+		try:
+			self.sock.close()
+		except socket.error:
+			pass
+
+	def _write(self):
+		try:
+			while not self.closed:
+				message = self.queue.get()
+				if message is None:
+					break
+				self.sock.sendall(message)
+		except socket.error:
+			pass
+		self.close()
+
+	def _read(self):
+		# Only control frames are expected from clients.
+		try:
+			while not self.closed:
+				opcode, payload = read_frame(self.sock)
+				if opcode == OP_CLOSE:
+					self.send(encode_frame(OP_CLOSE, payload[:2]))
+					self.send(None)
+					break
+				elif opcode == OP_PING:
+					self.send(encode_frame(OP_PONG, payload))
+		except FrameTooBig:
+			self.send(encode_frame(OP_CLOSE, struct.pack('!H', CLOSE_TOO_BIG)))
+			self.send(None)
+		except (socket.error, EOFError):
+			self.close()
+
+
+class SpectrumServer(object):
+	"""WebSocket server publishing each spectrum of the model as a binary
+	message (see HEADER).
+
+	Spectrums are quantized to uint8 with the model's current min and max
+	intensity, once per frame and only when clients are connected.  Each
+	client has its own small queue which drops the oldest frames when the
+	client falls behind, so clients never hold up the DSP.
+	"""
+
+	def __init__(self, model, port, host='127.0.0.1', queue_size=4):
+		"""Serve the spectrums of the provided model on the provided port and
+		host address (only the local machine by default, use '' to serve the
+		network).  Each client queues at most queue_size frames.
+		"""
+		self.model = model
+		self.queue_size = queue_size
+		self.clients = []
+		self.seq = 0
+		self._lock = threading.Lock()
+		self._levels = np.zeros(model.width, dtype=np.float64)
+		self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self._listener.bind((host, port))
+		self._listener.listen(5)
+		self.port = self._listener.getsockname()[1]
+		self._thread = threading.Thread(target=self._accept)
+		self._thread.daemon = True
+		self._thread.start()
+		model.subscribe(self.publish)
+
+	@property
+	def dropped(self):
+		"""Total number of frames dropped for connected clients."""
+		return sum(client.dropped for client in self.clients)
+
+	def publish(self, freqs):
+		"""Send a spectrum of dB values to every client."""
+		self.seq += 1
+		if not self.clients:
+			return
+		model = self.model
+		min_db, max_db = model.min_intensity, model.max_intensity
+		levels = self._levels
+		np.subtract(freqs, min_db, out=levels)
+		np.multiply(levels, 255.0/max(max_db - min_db, 1e-6), out=levels)
+		np.clip(levels, 0, 255, out=levels)
+		center_freq, span = model.get_display_range()
+		message = encode_frame(OP_BINARY, encode_spectrum(self.seq,
+			center_freq, span, min_db, max_db, levels.astype(np.uint8)))
+		with self._lock:
+			clients = list(self.clients)
+		for client in clients:
+			client.send(message)
+
+	def close(self):
+		"""Stop accepting clients and disconnect the connected ones."""
+		self.model.unsubscribe(self.publish)
+		self._listener.close()
+		with self._lock:
+			clients = list(self.clients)
+		for client in clients:
+			client.close()
+
+	def _remove(self, client):
+		with self._lock:
+			if client in self.clients:
+				self.clients.remove(client)
+
+	def _accept(self):
+		while True:
+			try:
+				sock, address = self._listener.accept()
+			except socket.error:
+				# Listener closed.
+				return
+			thread = threading.Thread(target=self._handshake, args=(sock,))
+			thread.daemon = True
+			thread.start()
+
+	def _handshake(self, sock):
+		try:
+			sock.settimeout(5.0)
+			request = b''
+			while b'\r\n\r\n' not in request:
+				chunk = sock.recv(4096)
+				if not chunk or len(request) > 16384:
+					raise EOFError('Incomplete request')
+				request += chunk
+			headers = {}
+			for line in request.decode('latin-1').split('\r\n')[1:]:
+				if ':' in line:
+					name, value = line.split(':', 1)
+					headers[name.strip().lower()] = value.strip()
+			key = headers.get('sec-websocket-key')
+			if key is None or headers.get('upgrade', '').lower() != 'websocket':
+				sock.sendall(b'HTTP/1.1 400 Bad Request\r\n'
+					b'Content-Length: 0\r\n\r\n')
+				sock.close()
+				return
+			sock.sendall(('HTTP/1.1 101 Switching Protocols\r\n'
+				'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+				'Sec-WebSocket-Accept: {0}\r\n\r\n'.format(accept_key(key))
+				).encode('ascii'))
+			sock.settimeout(None)
+		except (socket.error, EOFError):
+			sock.close()
+			return
+		# Added before its threads start, so a client disconnecting right
+		# away is removed from the list.
+		client = _Client(self, sock, self.queue_size)
+		with self._lock:
+			self.clients.append(client)
+		client.start()
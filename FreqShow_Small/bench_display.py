@@ -0,0 +1,100 @@
+# FreqShow display backend benchmark.
+# Compares the time to get a frame on screen through pygame/SDL with the
+# direct framebuffer backend, for a few kinds of frame changes.
+#
+# Usage: python bench_display.py [--fb PATH] [--size WxH] [--frames N]
+#
+# By default the framebuffer backend writes to a temporary plain file standing
+# in for /dev/fb1, pass --fb /dev/fb1 to measure the real device.  The pygame
+# path uses the SDL_VIDEODRIVER from the environment (dummy if unset).
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import argparse
+import os
+import tempfile
+import time
+
+if 'SDL_VIDEODRIVER' not in os.environ:
+	os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import pygame
+
+import display
+
+
+def draw_full(screen, i):
+	"""Every row changes, like the instant spectrogram."""
+	screen.fill((i % 256, 0, 0))
+
+def draw_scroll(screen, i):
+	"""Scroll by one row and add a new one, like the waterfall."""
+	screen.scroll(0, -1)
+	width, height = screen.get_size()
+	screen.fill((0, i % 256, 255), (0, height-1, width, 1))
+
+def draw_static(screen, i):
+	"""Nothing changes, like a dialog."""
+	pass
+
+SCENES = [('full', draw_full), ('scroll', draw_scroll), ('static', draw_static)]
+
+
+def bench(output, draw, frames):
+	"""Return average milliseconds per frame to draw and update output."""
+	draw(output.screen, 0)
+	output.update()
+	start = time.time()
+	for i in range(1, frames+1):
+		draw(output.screen, i)
+		output.update()
+	return 1000.0*(time.time() - start)/frames
+
+
+def main():
+	parser = argparse.ArgumentParser(description='FreqShow display backend benchmark.')
+	parser.add_argument('--fb', help='framebuffer device (default: temporary file)')
+	parser.add_argument('--size', default='320x240', help='frame size WxH')
+	parser.add_argument('--frames', type=int, default=200)
+	args = parser.parse_args()
+	size = tuple(int(v) for v in args.size.split('x'))
+	pygame.display.init()
+	outputs = [('pygame', display.PygameDisplay(size))]
+	files = []
+	if args.fb:
+		outputs.append(('fbdev', display.FramebufferDisplay(args.fb)))
+	else:
+		for bpp in (16, 32):
+			f = tempfile.NamedTemporaryFile(prefix='fb')
+			f.truncate(size[0]*size[1]*bpp//8)
+			files.append(f)
+			outputs.append(('fbdev {0}bpp'.format(bpp),
+				display.FramebufferDisplay(f.name, size=size, bpp=bpp)))
+	print('{0:<14}'.format('ms/frame') +
+		''.join('{0:>10}'.format(name) for name, draw in SCENES))
+	for name, output in outputs:
+		times = [bench(output, draw, args.frames) for scene, draw in SCENES]
+		print('{0:<14}'.format(name) +
+			''.join('{0:>10.3f}'.format(t) for t in times))
+
+
+if __name__ == '__main__':
+	main()
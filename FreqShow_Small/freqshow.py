@@ -24,13 +24,25 @@
 # SOFTWARE.
 # Enhancements over the original freqshow by Dan Stixrud, WQ7T
 import os
+import threading
 import time
 
+# Time the application started, for the startup timing report.
+START_TIME = time.time()
+
 import pygame
 
 import controller
+import display
+import metrics
 import model
+import multisdr
+import perf
+import profiler
+import scheduler
+import shmring
 import ui
+import wsserver
 
 
 # Application configuration.
@@ -48,9 +60,138 @@ CLICK_DEBOUNCE  = 0.04	# Number of seconds to wait between clicks events. Set
 						# to a few hunded milliseconds to prevent accidental
 						# double clicks from hard screen presses.
 
+# Sample stream configuration.  With SDR_STREAMING the radio is read
+# continuously in the background (see sdrstream.py) so lost samples and USB
+# overruns can be detected, otherwise a block is read on each acquire.  The
+# stream counters are printed every SDR_STATS_INTERVAL seconds (None to
+# disable) and shown on the performance HUD.  Retunes are applied between
+# blocks and the SDR_RETUNE_SETTLE blocks received right after a retune are
+# discarded since they can still hold samples from the old frequency.
+SDR_STREAMING      = True
+SDR_STATS_INTERVAL = 60
+SDR_RETUNE_SETTLE  = 1
+
+# Seconds to wait for the first block of samples from the radio at startup
+# before giving up with an error.
+SDR_START_TIMEOUT = 10
+
+# Radios shown.  None uses the first RTL-SDR found.  A list of device indexes
+# (like [0, 1]) or serial numbers (like ['00000001', '00000002']) runs each
+# radio in its own worker process (see multisdr.py), which publishes its
+# spectra to the shared memory ring SHM_NAME + '_<n>_spectrum' (n counting from
+# 0, 'freqshow' is used if SHM_NAME is None).  With several radios the
+# PANADAPTER button also shows the tiles of all of them, click a tile to show
+# that radio.  The web socket server and metrics follow the first radio.
+SDR_DEVICES = None
+
+# Changes of the center frequency which keep the span shown within the
+# PAN_PASSBAND fraction of the sample rate around the tuner frequency move
+# (pan) the span within the spectrum instead of retuning the tuner, which is
+# instant and keeps the averages and scale.  The edges of the bandwidth are
+# attenuated by the tuner's filters so they aren't used.  Set to 0 to always
+# retune.
+PAN_PASSBAND = 0.8
+
+# Sweep mode (Sweep in the settings) hops the tuner across a range wider than
+# the sample rate.  Each hop is the average of the FFTs of SWEEP_FFT_SIZE
+# sample segments of one block, and keeps the SWEEP_USABLE fraction of the
+# bandwidth in its middle.  The rest overlaps the neighbouring hops.
+SWEEP_FFT_SIZE = 1024
+SWEEP_USABLE   = 0.75
+
+# Frame pacing configuration.  Each stage of the main loop runs at its own
+# target rate (in times per second).  Stages which fall behind skip frames
+# instead of queueing up, and the loop sleeps when every stage is ahead.
+ACQUIRE_RATE   = 30	# Blocks of SDR_SAMPLE_SIZE samples read from the radio.
+SPECTRUM_RATE  = 30	# Spectrums computed from the latest block of samples.
+WATERFALL_RATE = 20	# Rows added to the waterfall.
+DISPLAY_RATE   = 20	# Screen refreshes.
+EVENT_RATE     = 50	# Touchscreen event polls.
+
+# Fraction of the split spectrum + waterfall view used by the spectrum plot.
+SPLIT_RATIO    = 0.5
+
+# Waterfall history configuration.  The history keeps HISTORY_LEVELS time
+# resolutions (each twice as coarse as the one below) in a fixed memory budget
+# of HISTORY_BUDGET bytes.
+HISTORY_BUDGET = 8*1024*1024
+HISTORY_LEVELS = 12
+
+# Waterfall recording configuration.  Waterfall rows are saved to a ring of
+# RECORD_ROWS rows in the RECORD_PATH directory, one row (the maximum) for every
+# RECORD_DECIMATE waterfall rows, and the recording's index is saved every
+# RECORD_INDEX_INTERVAL seconds and on exit.  Recording is disabled with
+# RECORD_PATH None, set it to a directory (like 'history') to enable it.
+RECORD_PATH           = None
+RECORD_ROWS           = 86400
+RECORD_DECIMATE       = WATERFALL_RATE
+RECORD_INDEX_INTERVAL = 60
+
+# Display backend configuration.  Use 'pygame' to display through SDL, 'sdl2'
+# to display through a pygame 2 SDL2 renderer (uploading only what changed in
+# the spectrograms), or 'fbdev' to write frames straight into the FB_DEVICE
+# framebuffer (for systems where SDL's fbcon driver is slow or missing).  With
+# 'fbdev' SDL runs its dummy video driver, which reports no mouse, touch or key
+# events, so the display can't be controlled and only suits view only setups.
+DISPLAY_BACKEND = 'pygame'
+FB_DEVICE       = '/dev/fb1'
+
+# Headless configuration, used when DISPLAY_BACKEND is 'headless' to run without
+# a screen or touchscreen.  Frames of HEADLESS_SIZE are rendered HEADLESS_RATE
+# times per second and saved to HEADLESS_PNG (None to disable, may contain {0}
+# to number the files) and/or streamed as MJPEG over HTTP on HEADLESS_PORT
+# (None to disable) of HEADLESS_HOST.  Use '' as host to serve the network,
+# then browse to http://<pi address>:<port>/.
+HEADLESS_SIZE = (320, 240)
+HEADLESS_RATE = 5
+HEADLESS_PNG  = None
+HEADLESS_PORT = 8080
+HEADLESS_HOST = '127.0.0.1'
+
+# WebSocket spectrum server configuration.  Every spectrum is published as a
+# binary message (see wsserver.py) to clients connected to WS_PORT of WS_HOST,
+# each client buffering at most WS_QUEUE frames.  The server is disabled with
+# WS_PORT None, set it to a port (like 8765, the default of wsclient.py) to
+# enable it.  Use '' as host to serve the network.
+WS_PORT  = None
+WS_HOST  = '127.0.0.1'
+WS_QUEUE = 4
+
+# Shared memory configuration.  Every spectrum is published to a ring of
+# SHM_SLOTS frames named SHM_NAME + '_spectrum', and the IQ samples it was
+# computed from to SHM_NAME + '_iq' if SHM_IQ is True.  Local processes read
+# them with shmring.RingReader.  Publishing is disabled with SHM_NAME None, set
+# it to a name (like 'freqshow') to enable it.
+SHM_NAME  = None
+SHM_SLOTS = 16
+SHM_IQ    = False
+
+# Metrics configuration.  Stage timings, sample stream counters and tuning
+# are served in the Prometheus text format at http://<host>:<port>/metrics on
+# METRICS_PORT of METRICS_HOST, and written to METRICS_FILE (None to disable)
+# every METRICS_INTERVAL seconds.  Serving is disabled with METRICS_PORT None,
+# set it to a port (like 9110) to enable it.
+METRICS_PORT     = None
+METRICS_HOST     = '127.0.0.1'
+METRICS_FILE     = None
+METRICS_INTERVAL = 60
+
+# Runtime profiler configuration.  Sending SIGUSR1 (or clicking the performance
+# HUD) profiles the next PROFILE_FRAMES displayed frames with cProfile, SIGUSR2
+# samples the main loop's stack every PROFILE_INTERVAL seconds instead.  The
+# results are written to the PROFILE_PATH directory.
+PROFILE_PATH     = 'profiles'
+PROFILE_FRAMES   = 100
+PROFILE_INTERVAL = 0.005
+
 # Font size configuration.
 MAIN_FONT = 16
 NUM_FONT  = 22
+HUD_FONT  = 12
+
+# Show the performance HUD (per stage timings, frame rate and counters) at
+# startup.  It can be toggled from the settings too.
+PERF_HUD = False
 
 # Color configuration (RGB tuples, 0 to 255).
 MAIN_BG        = ( 5,   45,  45) # Dark Brown
@@ -82,35 +223,148 @@ ui.Button.border_px    = 2
 
 if __name__ == '__main__':
 	# Initialize pygame and SDL to use the PiTFT display and touchscreen.
-	os.putenv('SDL_VIDEODRIVER', 'fbcon')
-	os.putenv('SDL_FBDEV'      , '/dev/fb1')
-	os.putenv('SDL_MOUSEDRV'   , 'TSLIB')
-	os.putenv('SDL_MOUSEDEV'   , '/dev/input/touchscreen')
+	if DISPLAY_BACKEND in ('fbdev', 'headless'):
+		# Frames are written to the framebuffer directly or encoded, SDL only
+		# composes off-screen.  The dummy driver has no input devices, so no
+		# touchscreen events are received.
+		os.putenv('SDL_VIDEODRIVER', 'dummy')
+	elif DISPLAY_BACKEND == 'pygame':
+		os.putenv('SDL_VIDEODRIVER', 'fbcon')
+		os.putenv('SDL_FBDEV'      , FB_DEVICE)
+	if DISPLAY_BACKEND in ('pygame', 'sdl2'):
+		os.putenv('SDL_MOUSEDRV'   , 'TSLIB')
+		os.putenv('SDL_MOUSEDEV'   , '/dev/input/touchscreen')
+	perf.set_enabled(PERF_HUD)
+	profiler.path = PROFILE_PATH
+	profiler.frames = PROFILE_FRAMES
+	profiler.interval = PROFILE_INTERVAL
+	profiler.install_signals()
+	# Startup phases and the time each one finished, for the timing report.
+	startup = [('imports', time.time())]
+	def startup_phase(name):
+		startup.append((name, time.time()))
 	pygame.display.init()
 	pygame.font.init()
 	pygame.mouse.set_visible(True)
-	# Get size of screen and create main rendering surface.
-	size = (pygame.display.Info().current_w, pygame.display.Info().current_h)
-	screen = pygame.display.set_mode(size, pygame.FULLSCREEN)
+	startup_phase('pygame')
+	# Open the display and get the size of screen and main rendering surface.
+	if DISPLAY_BACKEND == 'fbdev':
+		output = display.FramebufferDisplay(FB_DEVICE)
+	elif DISPLAY_BACKEND == 'sdl2':
+		output = display.Sdl2Display()
+	elif DISPLAY_BACKEND == 'headless':
+		output = display.HeadlessDisplay(HEADLESS_SIZE, HEADLESS_PNG,
+			HEADLESS_PORT, HEADLESS_HOST)
+		DISPLAY_RATE = HEADLESS_RATE
+	else:
+		output = display.PygameDisplay()
+	size = output.size
+	screen = output.screen
+	startup_phase('display')
 	# Display splash screen.
 	splash = pygame.image.load('freqshow_splash.png')
 	screen.fill(MAIN_BG)
 	screen.blit(splash, ui.align(splash.get_rect(), (0, 0, size[0], size[1])))
-	pygame.display.update()
-	splash_start = time.time()
-	# Create model and controller.
-	fsmodel = model.FreqShowModel(size[0], size[1])
-	fscontroller = controller.FreqShowController(fsmodel)
-	time.sleep(2.0)
-	# Main loop to process events and render current view.
-	lastclick = 0
-	while True:
+	output.update()
+	startup_phase('splash')
+	# Create the model, which opens and configures the radio, in the background
+	# while the splash is shown.
+	created = []
+	def create_model():
+		try:
+			if SDR_DEVICES:
+				created.append([multisdr.DeviceModel(size[0], size[1], device,
+					'{0}_{1}'.format(SHM_NAME or 'freqshow', i))
+					for i, device in enumerate(SDR_DEVICES)])
+			else:
+				created.append([model.FreqShowModel(size[0], size[1])])
+		except Exception as e:
+			created.append(e)
+	thread = threading.Thread(target=create_model)
+	thread.daemon = True
+	thread.start()
+	while thread.is_alive():
+		pygame.event.pump()
+		thread.join(0.05)
+	if isinstance(created[0], Exception):
+		raise created[0]
+	models = created[0]
+	fsmodel = models[0]
+	startup_phase('radio')
+	if len(models) > 1:
+		fscontroller = controller.MultiRadioController(models)
+		controllers = fscontroller.controllers
+	else:
+		fscontroller = controller.FreqShowController(fsmodel)
+		controllers = [fscontroller]
+	if WS_PORT is not None:
+		wsserver.SpectrumServer(fsmodel, WS_PORT, WS_HOST, WS_QUEUE)
+	if SHM_NAME is not None and not SDR_DEVICES:
+		# Workers publish the spectra of their radio themselves.
+		shmring.SpectrumPublisher(fsmodel, SHM_NAME, SHM_SLOTS, SHM_IQ,
+			SDR_SAMPLE_SIZE)
+	startup_phase('views')
+	# Keep the splash up until the first frame is ready, then show it.
+	deadline = time.time() + SDR_START_TIMEOUT
+	while not fsmodel.acquire():
+		if time.time() > deadline:
+			raise RuntimeError('No samples received from the radio in {0} '
+				'seconds.'.format(SDR_START_TIMEOUT))
+		pygame.event.pump()
+		time.sleep(0.005)
+	fsmodel.update()
+	controllers[0].waterfall.add_row()
+	output.show(fscontroller.current())
+	startup_phase('first frame')
+	# Report how long each startup phase took.
+	print('Startup times (seconds):')
+	last = START_TIME
+	for name, end in startup:
+		print('  {0:<12} {1:6.3f}'.format(name, end - last))
+		last = end
+	print('  {0:<12} {1:6.3f}'.format('total', last - START_TIME))
+	# Main loop stages.
+	lastclick = [0]
+	def process_events():
 		# Process any events (only mouse events for now).
 		for event in pygame.event.get():
 			if event.type is pygame.MOUSEBUTTONDOWN \
-				and (time.time() - lastclick) >= CLICK_DEBOUNCE:
-				lastclick = time.time()
+				and (time.time() - lastclick[0]) >= CLICK_DEBOUNCE:
+				lastclick[0] = time.time()
 				fscontroller.current().click(pygame.mouse.get_pos())
-		# Update and render the current view.
-		fscontroller.current().render(screen)
-		pygame.display.update()
+	def update_display():
+		# Render the current view.
+		output.show(fscontroller.current())
+		profiler.frame()
+	def acquire():
+		for m in models:
+			m.acquire()
+	def update_spectra():
+		for m in models:
+			m.update()
+	def add_rows():
+		for c in controllers:
+			c.waterfall.add_row()
+	def log_read_stats():
+		for m in models:
+			name = '' if m.device is None else ' {0}'.format(m.device)
+			print(('SDR stream' + name + ': {blocks} blocks, {overruns} overruns, '
+				'{lost_samples} samples lost, {short_reads} short reads, '
+				'{dropped_blocks} blocks dropped, {stale_blocks} stale blocks, '
+				'max latency {max_latency:0.3f} s')
+				.format(**m.get_read_stats()))
+	# Main loop to process events and render current view at a paced rate.
+	loop = scheduler.Scheduler(max_sleep=1.0/EVENT_RATE)
+	loop.add('events',    EVENT_RATE,     process_events)
+	loop.add('acquire',   ACQUIRE_RATE,   acquire)
+	loop.add('spectrum',  SPECTRUM_RATE,  update_spectra)
+	loop.add('waterfall', WATERFALL_RATE, add_rows)
+	loop.add('display',   DISPLAY_RATE,   update_display)
+	if SDR_STATS_INTERVAL:
+		loop.add('sdr stats', 1.0/SDR_STATS_INTERVAL, log_read_stats)
+	if METRICS_PORT is not None or METRICS_FILE is not None:
+		exporter = metrics.MetricsExporter(fsmodel, loop, METRICS_PORT,
+			METRICS_HOST, METRICS_FILE)
+		if METRICS_FILE is not None:
+			loop.add('metrics', 1.0/METRICS_INTERVAL, exporter.write)
+	loop.run_forever()
@@ -0,0 +1,115 @@
+# FreqShow waterfall history.
+# Multi-resolution store of waterfall rows which lets the waterfall zoom out in
+# time from seconds to hours and scroll back through history in constant
+# memory.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import numpy as np
+
+
+class HistoryLevel(object):
+	"""Ring buffer of uint8 rows (and their timestamps) for one level of the
+	history pyramid.
+	"""
+
+	def __init__(self, rows, width):
+		self.data = np.zeros((rows, width), dtype=np.uint8)
+		self.times = np.zeros(rows, dtype=np.float64)
+		self.head = 0	# Index the next row is written to.
+		self.count = 0	# Number of valid rows.
+		# Half of a pair of rows waiting to be reduced into the next level.
+		self.pending = np.zeros(width, dtype=np.uint8)
+		self.has_pending = False
+
+	def append(self, row, timestamp):
+		self.data[self.head] = row
+		self.times[self.head] = timestamp
+		self.head = (self.head + 1) % len(self.data)
+		self.count = min(self.count + 1, len(self.data))
+
+	def clear(self):
+		self.head = 0
+		self.count = 0
+		self.has_pending = False
+
+
+class HistoryPyramid(object):
+	"""Waterfall history kept at several time resolutions.
+
+	Level 0 holds the most recent rows as they arrive.  Each level above holds
+	rows which are the maximum of a pair of rows from the level below, so
+	level n covers 2**n times as much time as level 0 in the same memory.
+	Levels are updated incrementally as rows are added so zooming out never
+	requires recomputing anything.  Rows are stored as uint8 (the quantized
+	waterfall intensities) and the total size is fixed by a memory budget.
+	"""
+
+	def __init__(self, width, budget, levels):
+		"""Create a history for rows of the provided width, using about budget
+		bytes split evenly across the provided number of levels.
+		"""
+		self.width = width
+		# Each row costs width bytes of data plus an 8 byte timestamp.
+		self.rows = max(1, int(budget) // (levels*(width + 8)))
+		self.levels = [HistoryLevel(self.rows, width) for i in range(levels)]
+
+	@property
+	def nbytes(self):
+		"""Return the memory used by the history in bytes."""
+		return sum(l.data.nbytes + l.times.nbytes for l in self.levels)
+
+	def add(self, row, timestamp):
+		"""Add a row of uint8 intensities with the provided timestamp (seconds)
+		and fold it into the coarser levels.
+		"""
+		for i, level in enumerate(self.levels):
+			level.append(row, timestamp)
+			if not level.has_pending:
+				# First row of a pair, wait for its partner.
+				np.copyto(level.pending, row)
+				level.has_pending = True
+				break
+			# Second row of a pair, push the max of both to the next level.
+			np.maximum(level.pending, row, out=level.pending)
+			level.has_pending = False
+			row = level.pending
+
+	def clear(self):
+		"""Forget all history."""
+		for level in self.levels:
+			level.clear()
+
+	def available(self, level):
+		"""Return the number of rows stored at the provided level."""
+		return self.levels[level].count
+
+	def get(self, level, count, offset=0):
+		"""Return a tuple of (rows, timestamps) with up to count rows from the
+		provided level, oldest first.  The offset is the number of the newest
+		rows to skip, i.e. how far to scroll back into the history.
+		"""
+		l = self.levels[level]
+		offset = max(0, min(offset, l.count))
+		count = max(0, min(count, l.count - offset))
+		end = l.head - offset
+		index = np.arange(end - count, end) % len(l.data)
+		return l.data[index], l.times[index]
@@ -23,39 +23,102 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 # Enhancements over the original freqshow by Dan Stixrud, WQ7T
-import numpy as np
-from scipy import signal
-from scipy.fftpack import fft, rfft, fftshift
-
-from rtlsdr import *
+import atexit
+import collections
 
+import dsp
 import freqshow
+import perf
+import sdrstream
+import sweep
+
+
+# Event passed to model listeners (see FreqShowModel.listen) when a setting
+# changes: the name of the setting and its old and new values.
+ChangeEvent = collections.namedtuple('ChangeEvent', ['name', 'old', 'new'])
+
+# Settings the spectrum computation parameters (see get_config) depend on.
+CONFIG_SETTINGS = ('zoom_fac', 'sample_rate', 'lo_offset', 'center_freq',
+	'tuned_center', 'swap_iq', 'filter', 'kaiser_beta')
 
+# Settings which can move the displayed span out of what the tuner captures.
+TUNING_SETTINGS = ('zoom_fac', 'sample_rate', 'lo_offset')
+
+# Settings the sweep plan (see set_sweep) depends on.
+SWEEP_SETTINGS = ('sample_rate', 'swap_iq', 'filter', 'kaiser_beta')
 
 class FreqShowModel(object):
-	def __init__(self, width, height):
+	def __init__(self, width, height, device=None):
 		"""Create main FreqShow application model.  Must provide the width and
-		height of the screen in pixels.
+		height of the screen in pixels.  The radio used is the one with the
+		provided device index or serial number, or the first one found if None.
 		"""
 		# Set properties that will be used by views.
 		self.width = width
 		self.height = height
+		self.device = device
+
+		# Functions called with a ChangeEvent when a setting changes (see
+		# listen).
+		self.listeners = []
+
+		# Parameters of the spectrum computation derived from the settings
+		# (see get_config), None until computed for the current settings.
+		self.config = None
+		self.listen(self._invalidate_config, CONFIG_SETTINGS)
+		# Window taper of the last config and the (filter, kaiser beta) it was
+		# computed with, reused by the next config (like after a pan).
+		self._taper = None
+		self._taper_key = None
+
+		# Center frequency in MHz the tuner was last tuned for, None until the
+		# center frequency is set (see set_center_freq).
+		self.tuned_center = None
+		self.listen(self._tuning_changed, TUNING_SETTINGS)
+
+		# Plan of the sweep across a wide range (see set_sweep), None when
+		# showing the span around the center frequency.
+		self.sweep = None
+		self.sweep_range = None
+		self.listen(self._sweep_changed, SWEEP_SETTINGS)
 
 		# Initialize auto scaling both min and max intensity (Y axis of plots).
 		self.min_auto_scale = True
 		self.max_auto_scale = True
+		self.min_intensity = None
+		self.max_intensity = None
+		self.range = None
 
 		self.set_min_intensity(-6)
 		self.set_max_intensity(54)
 
-		# Initialize RTL-SDR library.
-		self.sdr = RtlSdr()
+		# Latest block of raw samples (the stitched dB row while sweeping) and
+		# the spectrum computed from it.  The sequence numbers let consumers
+		# tell when new data is available.
+		self.samples = None
+		self.samples_seq = 0
+		self.freqs = None
+		self.freqs_seq = 0
+		# Tuning generation (see sdrstream.SampleStream.tune) of the latest
+		# block and spectrum, consumers which keep state across spectra (like
+		# averages) start over when it changes.
+		self.samples_generation = 0
+		self.freqs_generation = 0
+		# Number of FFT bins used for the last spectrum.
+		self.fft_bins = None
+		# Functions called with each new spectrum (see subscribe).
+		self.subscribers = []
+
+		# Open the radio and stream samples from it (see sdrstream.py), the
+		# stream is started once the radio is set up.
+		self.sdr = self.open_radio(device)
+		self.stream = self.open_stream(self.sdr)
 		self.set_swap_iq(True)   
-                self.set_sample_rate(.230)  # in MHz, must be within (.225001 <= sample_rate_mhz <= .300000) OR (.900001 <= sample_rate_mhz <= 3.200000)
-                self.set_zoom_fac(.02)   # equal to the frequency span you want to display on the screen in MHz
+		self.set_sample_rate(.230)  # in MHz, must be within (.225001 <= sample_rate_mhz <= .300000) OR (.900001 <= sample_rate_mhz <= 3.200000)
+		self.set_zoom_fac(.02)   # equal to the frequency span you want to display on the screen in MHz
 		self.set_lo_offset(0.02) # Local Oscillator offset in MHz, slide the DC spike out of the window by this amount.
 		self.set_center_freq(70.451500) # frequency in MHz of my 1st IF
- 		self.set_gain('AUTO')
+		self.set_gain('AUTO')
 		self.set_fft_ave(3)
 		self.set_tune_rate(.001) # in MHz  
 		self.set_freq_correction(0)  # (58ppm for my unenhanced)can run test to determine this value, via regular antenna, not IF frequency! 
@@ -64,26 +127,62 @@ class FreqShowModel(object):
 		self.set_peak(True)   # Set true for peaks, set False for averaging. 	
 		self.set_filter('nuttall') # set default windowing filter.
 
+		self.stream.start()
+		atexit.register(self.close)
+
+
+	def open_radio(self, device):
+		"""Return the RtlSdr of the provided device index or serial number,
+		or of the first radio found if None.
+		"""
+		# Initialize RTL-SDR library.  It is imported here so the model module
+		# can be imported (and the library loaded) while the splash is shown.
+		from rtlsdr import RtlSdr
+		if device is None:
+			return RtlSdr()
+		if isinstance(device, int):
+			return RtlSdr(device_index=device)
+		return RtlSdr(serial_number=device)
+
+	def open_stream(self, sdr):
+		"""Return the sdrstream.SampleStream of the provided radio."""
+		return sdrstream.SampleStream(sdr, freqshow.SDR_SAMPLE_SIZE,
+			freqshow.SDR_STREAMING, settle=freqshow.SDR_RETUNE_SETTLE)
+
+	def _set(self, name, value):
+		# Change a setting and tell the listeners if its value changed.
+		old = getattr(self, name, None)
+		setattr(self, name, value)
+		if old is value or (old is not None and value is not None
+			and old == value):
+			return
+		event = ChangeEvent(name, old, value)
+		for func, names in list(self.listeners):
+			if names is None or name in names:
+				func(event)
+
+	def _invalidate_config(self, event):
+		self.config = None
 
 	def _clear_intensity(self):
-		if self.min_auto_scale:
-			self.min_intensity = None
-		if self.max_auto_scale:
-			self.max_intensity = None
-		self.range = None
+		# Start the auto scaled ends of the intensity range over with the next
+		# spectrum (see scale), the current range stays valid until then.
+		self.intensity_reset = True
+		if self.min_intensity is not None and self.max_intensity is not None:
+			self.range = self.max_intensity - self.min_intensity
 
 	def get_swap_iq(self):
 		return (self.swap_iq)
 
 	def set_swap_iq(self, swap_iq):
-		self.swap_iq = (swap_iq)
+		self._set('swap_iq', swap_iq)
 
 
-        def get_peak(self):
-                return (self.peak)
+	def get_peak(self):
+		return (self.peak)
 
-        def set_peak(self, peak):
-                self.peak = (peak)
+	def set_peak(self, peak):
+		self._set('peak', peak)
 
 
 	def get_freq_correction(self):
@@ -91,29 +190,126 @@ class FreqShowModel(object):
 		return (self.freq_correction)
 
 	def set_freq_correction(self, freq_correction):
-		self.freq_correction = (freq_correction)
+		self._set('freq_correction', freq_correction)
 		self.sdr.set_freq_correction(int(freq_correction + 1))
 
 
-        def get_lo_offset(self):
-                return (self.lo_offset)
+	def get_lo_offset(self):
+		return (self.lo_offset)
 
 
-        def set_lo_offset(self, lo_offset):
-                self.lo_offset = float(lo_offset)
+	def set_lo_offset(self, lo_offset):
+		self._set('lo_offset', float(lo_offset))
 
 
 	def get_center_freq(self):
 		return (self.center_freq)
 
 	def set_center_freq(self, value):
-		self.center_freq  = (value)
-		if ((self.get_sample_rate()/self.get_zoom_fac())/2)>((self.get_lo_offset()/self.get_zoom_fac())-(self.get_zoom_fac()/2)):
-			freq_mhz = self.get_center_freq() + self.get_lo_offset()
-		else:
-			freq_mhz = self.get_center_freq()
-		self.sdr.set_center_freq(freq_mhz*(1000000.0))
+		"""Set the center frequency in megahertz.  While the new span is still
+		within the usable part of the bandwidth the tuner captures, the span
+		shown is only moved within the spectrum (panned) and the tuner is left
+		alone.  Otherwise the tuner is retuned by the sample stream between
+		blocks (see sdrstream.SampleStream.tune), so this returns right away
+		and quick successive changes only retune once.  While sweeping the
+		swept range is moved to be centered on the frequency.
+		"""
+		if self.sweep is not None:
+			half = self.sweep.span()/2.0
+			self.set_sweep(value - half, value + half)
+			return
+		if not self.can_pan(value):
+			if ((self.get_sample_rate()/self.get_zoom_fac())/2)>((self.get_lo_offset()/self.get_zoom_fac())-(self.get_zoom_fac()/2)):
+				freq_mhz = value + self.get_lo_offset()
+			else:
+				freq_mhz = value
+			self._set('tuned_center', value)
+			self.stream.tune(freq_mhz*(1000000.0))
+		self._set('center_freq', value)
+
+	def can_pan(self, center_freq):
+		"""Return True if the span around the provided center frequency (in
+		MHz) can be shown without retuning: the FFT must have room to move the
+		crop that far, the span must stay in the PAN_PASSBAND fraction of the
+		bandwidth and, with an LO offset, keep the DC spike out.
+		"""
+		if self.tuned_center is None or not freqshow.PAN_PASSBAND:
+			return False
+		rate = self.get_sample_rate()
+		bins, span = dsp.fft_size(self.width, rate, self.get_zoom_fac(),
+			freqshow.SDR_SAMPLE_SIZE)
+		shift = dsp.lo_shift(self.get_lo_offset(), rate, bins,
+			self.get_swap_iq()) + dsp.pan_shift(center_freq - self.tuned_center,
+			rate, bins)
+		if abs(shift) >= (bins - self.width)//2:
+			return False
+		# Distance in MHz from the middle of the bandwidth to the span's center.
+		offset = abs(shift)*rate/(bins + 2)
+		if offset + span/2.0 > freqshow.PAN_PASSBAND*rate/2.0:
+			return False
+		return not self.get_lo_offset() or offset >= span/2.0
+
+	def get_pan(self):
+		"""Return how far in MHz the center frequency shown is panned from the
+		one the tuner was tuned for.
+		"""
+		return self.center_freq - self.tuned_center
+
+	def tuning_generation(self):
+		"""Return the generation of the last retune requested (see
+		sdrstream.SampleStream.tune).  It doesn't change when panning.
+		"""
+		return self.stream.generation
+
+	def _tuning_changed(self, event):
+		# Retune if the span no longer fits around the tuner frequency.  A new
+		# LO offset always retunes so the offset is the one asked for.
+		if self.tuned_center is None or self.sweep is not None:
+			return
+		if event.name == 'lo_offset':
+			self._set('tuned_center', None)
+		self.set_center_freq(self.center_freq)
+
+	def get_sweep(self):
+		"""Return the (start, stop) range in MHz swept, or None."""
+		return self.sweep_range
+
+	def set_sweep(self, start, stop):
+		"""Sweep the tuner from start to stop MHz and show the spectrum of the
+		whole range stitched from the hops (see sweep.py) instead of the span
+		around the center frequency.  Stops sweeping, and tunes back to the
+		center frequency, if stop is not above start (or either is None).
+		"""
+		if start is None or stop is None or stop <= start:
+			if self.sweep is None:
+				return
+			self.sweep = None
+			self.stream.sweep(None)
+			self._set('sweep_range', None)
+			self.set_center_freq(self.center_freq)
+			return
+		taper = dsp.window(self.filter, freqshow.SWEEP_FFT_SIZE,
+			self.kaiser_beta)
+		self.sweep = sweep.SweepPlan(start, stop, self.sample_rate, self.width,
+			freqshow.SWEEP_FFT_SIZE, freqshow.SWEEP_USABLE, taper, self.swap_iq)
+		self.stream.sweep(self.sweep.hops())
+		# Consumers start over with the first sweep of the new range.
+		self.samples_generation = self.stream.generation
 		self._clear_intensity()
+		self._set('tuned_center', None)
+		self._set('sweep_range', (self.sweep.start, self.sweep.stop))
+		self._set('center_freq', self.sweep.center())
+
+	def _sweep_changed(self, event):
+		# Plan the sweep again for the new settings.
+		if self.sweep is not None:
+			self.set_sweep(self.sweep.start, self.sweep.stop)
+
+	def get_display_range(self):
+		"""Return the (center, span) in MHz of the spectrum shown."""
+		if self.sweep is not None:
+			return self.sweep.center(), self.sweep.span()
+		return self.center_freq, self.zoom_fac
 
 	def get_lo_freq(self):
 		"""Return center frequency of tuner in megahertz."""
@@ -131,19 +327,20 @@ class FreqShowModel(object):
 
 	def get_sample_rate(self):
 		"""Return sample rate of tuner in megahertz."""
-		return self.sdr.get_sample_rate()/1000000.0
+		return self.sample_rate
 
 	def set_sample_rate(self, sample_rate_mhz):
 		"""Set tuner sample rate to provided frequency in megahertz."""
 		if .225001 <= sample_rate_mhz <= .300000 or .900001 <= sample_rate_mhz <= 3.200000:
- 			try:
+			try:
 				self.sdr.set_sample_rate(sample_rate_mhz*1000000.0)
 			except IOError:
 				# Error setting value, ignore it for now but in the future consider
 				# adding an error message dialog.
 				pass
-		else:
-			self.sample_rate = self.get_sample_rate()			
+		# Keep the rate the tuner actually uses so reading it doesn't need the
+		# driver.
+		self._set('sample_rate', self.sdr.get_sample_rate()/1000000.0)
 
 	def get_gain(self):
 		"""Return gain of tuner.  Can be either the string 'AUTO' or a numeric
@@ -161,11 +358,13 @@ class FreqShowModel(object):
 		if gain_db == 'AUTO':
 			self.sdr.set_manual_gain_enabled(False)
 			self.auto_gain = True
+			self._set('gain', 'AUTO')
 			self._clear_intensity()
 		else:
 			try:
 				self.sdr.set_gain(float(gain_db))
 				self.auto_gain = False
+				self._set('gain', float(gain_db))
 				self._clear_intensity()
 			except IOError:
 				# Error setting value, ignore it for now but in the future consider
@@ -186,10 +385,10 @@ class FreqShowModel(object):
 		spectrograms).  Can also pass 'AUTO' to enable auto scaling of value.
 		"""
 		if intensity == 'AUTO':
-			self.min_auto_scale = True
+			self._set('min_auto_scale', True)
 		else:
-			self.min_auto_scale = False
-			self.min_intensity = float(intensity)
+			self._set('min_auto_scale', False)
+			self._set('min_intensity', float(intensity))
 		self._clear_intensity()
 
 	def get_max_string(self):
@@ -206,12 +405,12 @@ class FreqShowModel(object):
 		spectrograms).  Can also pass 'AUTO' to enable auto scaling of value.
 		"""
 		if intensity == 'AUTO':
-			self.max_auto_scale = True
+			self._set('max_auto_scale', True)
 			#self.max_auto_scale = False
 			#self.max_intensity = self.min_intensity + 60
 		else:
-			self.max_auto_scale = False
-			self.max_intensity = float(intensity)
+			self._set('max_auto_scale', False)
+			self._set('max_intensity', float(intensity))
 		self._clear_intensity()
 
 
@@ -221,7 +420,7 @@ class FreqShowModel(object):
 
 	def set_fft_ave(self, fft_ave):
 		if fft_ave > 1:
-			self.fft_ave = int(fft_ave)
+			self._set('fft_ave', int(fft_ave))
 		else:
 			self.fft_ave = self.get_fft_ave
 
@@ -230,7 +429,7 @@ class FreqShowModel(object):
 
 
 	def set_tune_rate(self, tune_rate):
-		self.tune_rate = float(tune_rate)
+		self._set('tune_rate', float(tune_rate))
 
 
 	def get_zoom_fac(self):
@@ -238,7 +437,7 @@ class FreqShowModel(object):
 
 
 	def set_zoom_fac(self, zoom_fac):
-		self.zoom_fac = float(zoom_fac)
+		self._set('zoom_fac', float(zoom_fac))
 
 
 	def get_sig_strength(self):
@@ -246,7 +445,7 @@ class FreqShowModel(object):
 
 
 	def set_sig_strength(self, sig_strength):
-		self.sig_strength = float(sig_strength)
+		self._set('sig_strength', float(sig_strength))
 
 
 	def get_filter(self):
@@ -254,7 +453,7 @@ class FreqShowModel(object):
 
 
 	def set_filter(self, filter): 
-		self.filter = filter
+		self._set('filter', filter)
 
 
 	def get_kaiser_beta(self):
@@ -262,102 +461,163 @@ class FreqShowModel(object):
 
 
 	def set_kaiser_beta(self, kaiser_beta):
-		self.kaiser_beta = float(kaiser_beta)
+		self._set('kaiser_beta', float(kaiser_beta))
 
 
+	def get_config(self):
+		"""Return the dsp.SpectrumConfig for the current settings.  It is
+		computed once after any of the CONFIG_SETTINGS changes and reused for
+		every spectrum until the next change.
+		"""
+		while self.config is None:
+			key = (self.filter, self.kaiser_beta)
+			taper = self._taper if key == self._taper_key else None
+			self.config = dsp.spectrum_config(self.width, self.sample_rate,
+				self.zoom_fac, freqshow.SDR_SAMPLE_SIZE, self.filter,
+				self.kaiser_beta, self.lo_offset, self.swap_iq, self.get_pan(),
+				taper)
+			self._taper, self._taper_key = self.config.taper, key
+			self.fft_bins = self.config.bins
+			# Spans which can't be shown are replaced by the span shown (which
+			# computes the config again if that changes anything).
+			self._set('zoom_fac', self.config.span)
+		return self.config
+
 	def get_freq_step(self):
-		if self.zoom_fac < (self.sdr.sample_rate/1000000):
-                        zoom = int(self.width*((self.sdr.sample_rate/1000000)/self.zoom_fac))
-                else:
-                        zoom = self.width
-                        self.zoom_fac = self.get_sample_rate()		
-		freq_step = self.sdr.sample_rate/(zoom+2)
-		return freq_step
+		"""Return the frequency step in Hz between FFT bins."""
+		return self.get_config().step*1000000.0
 
 
-	def get_data(self):
-		"""Get spectrogram data from the tuner.  Will return width number of
-		values which are the intensities of each frequency bucket (i.e. FFT of
-		radio samples).
+	def acquire(self):
+		"""Take the newest block of raw samples from the tuner and keep it as
+		the latest block for the next spectrum update.  Returns False if no new
+		block has been received since the last call.  While sweeping the
+		blocks of the hops received are stitched into the sweep, and False is
+		returned until a sweep of the whole range is complete.
 		"""
-		# Get width number of raw samples so the number of frequency bins is
-		# the same as the display width.  Add two because there will be mean/DC
-		# values in the results which are ignored. Increase by 1/self.zoom_fac if needed		
-		
+		if self.sweep is not None:
+			return self._acquire_sweep()
+		samples = self.stream.read()
+		if samples is None:
+			return False
+		self.samples_generation = self.stream.last_generation
+		self.samples = samples
+		self.samples_seq += 1
+		return True
+
+	def _acquire_sweep(self):
+		plan = self.sweep
+		complete = False
+		timer = perf.timer()
+		for index, samples in self.stream.read_hops():
+			if index < len(plan.freqs) and plan.add(index, samples):
+				complete = True
+		timer.lap('sweep')
+		if not complete:
+			return False
+		self.samples = plan.row
+		self.samples_seq += 1
+		return True
+
+	def get_read_stats(self):
+		"""Return a dict of the sample stream counters: blocks and samples
+		received, short reads, overruns, lost samples, dropped blocks, read
+		latency (last and max, in seconds) and the sample rate.
+		"""
+		return self.stream.stats()
 
-		if self.zoom_fac < (self.sdr.sample_rate/1000000):
-			zoom = int(self.width*((self.sdr.sample_rate/1000000)/self.zoom_fac))
-		else:
-			zoom = self.width
-			self.zoom_fac = self.get_sample_rate()
+	def close(self):
+		"""Stop streaming samples from the tuner."""
+		self.stream.stop()
 
-		if zoom < freqshow.SDR_SAMPLE_SIZE:		
-			freqbins = self.sdr.read_samples(freqshow.SDR_SAMPLE_SIZE)[0:zoom+2]
-		else:
-			zoom = self.width
-			self.zoom_fac = self.get_sample_rate()
-			freqbins = self.sdr.read_samples(freqshow.SDR_SAMPLE_SIZE)[0:zoom+2]
+	def subscribe(self, func):
+		"""Register a function to be called with every new spectrum computed
+		by update.  Subscribers get the spectrum whether or not the view they
+		belong to is shown, so they should only do cheap bookkeeping and leave
+		drawing to render.
+		"""
+		if func not in self.subscribers:
+			self.subscribers.append(func)
+
+	def unsubscribe(self, func):
+		"""Stop calling a function previously registered with subscribe."""
+		if func in self.subscribers:
+			self.subscribers.remove(func)
+
+	def listen(self, func, names=None):
+		"""Register a function to be called with a ChangeEvent whenever one
+		of the named settings (or any setting if names is None) changes.
+		Listeners are called from the thread which changed the setting, right
+		after the change, so they should only invalidate what depends on it.
+		"""
+		self.listeners.append((func, None if names is None else frozenset(names)))
 
+	def unlisten(self, func):
+		"""Stop calling a function previously registered with listen."""
+		self.listeners = [l for l in self.listeners if l[0] != func]
 
-		# Apply a window function to the sample to remove power in sample sidebands before the fft.
-	
-		if self.filter == 'kaiser':
-			window = signal.kaiser(freqshow.SDR_SAMPLE_SIZE, self.kaiser_beta, False,)[0:zoom+2]  # for every bin there is a window the same exact size as the read samples.
-		elif self.filter == 'boxcar':
-			window = signal.boxcar(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'hann':
-                        window = signal.hann(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]	
-                elif self.filter == 'hamming':
-                        window = signal.hamming(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'blackman':
-                        window = signal.blackman(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'blackmanharris':
-                        window = signal.blackmanharris(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'bartlett':
-                        window = signal.bartlett(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'barthann':
-                        window = signal.barthann(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
-                elif self.filter == 'nuttall':
-                        window = signal.nuttall(freqshow.SDR_SAMPLE_SIZE, False,)[0:zoom+2]
+	def is_auto_scale(self, event):
+		"""Return True if the provided ChangeEvent is the intensity range
+		following the signal while auto scaling, rather than a change of the
+		scale settings.
+		"""
+		if event.new is None:
+			return False
+		return (event.name == 'min_intensity' and self.min_auto_scale) or \
+			(event.name == 'max_intensity' and self.max_auto_scale)
+
+	def update(self):
+		"""Compute the spectrum of the latest acquired block of samples, keep
+		it in freqs and publish it to all subscribers.  Does nothing and returns
+		False when no new block has been acquired since the last update.
+		"""
+		if self.samples is None or self.samples_seq == self.freqs_seq:
+			return False
+		if self.samples_generation != self.freqs_generation:
+			# First spectrum at a new frequency, the intensity range follows.
+			self._clear_intensity()
+		if self.sweep is not None:
+			self.freqs = self.scale(self.samples.copy())
 		else:
-			window = 1
-
-		samples = freqbins * window
-
-		# Run an FFT and take the absolute value to get frequency magnitudes.		
-		freqs = np.absolute(fft(samples))
-
-		# Ignore the mean/DC values at the ends.
-		freqs = freqs[1:-1] 
-
-                # Reverse the order of the freqs array if swaping I and Q
-		if self.swap_iq == True:
-                	freqs = freqs[::-1]
-
-		# Shift FFT result positions to put center frequency in center.
-		freqs = np.fft.fftshift(freqs)
-
-               	# Truncate the freqs array to the width of the screen if neccesary.
-                if freqs.size > self.width:
+			self.freqs = self.get_data(self.samples)
+		self.freqs_seq = self.samples_seq
+		self.freqs_generation = self.samples_generation
+		for func in self.subscribers:
+			func(self.freqs)
+		return True
+
+	def get_data(self, samples=None):
+		"""Get spectrogram data from the tuner.  Will return width number of
+		values which are the intensities of each frequency bucket (i.e. FFT of
+		radio samples).  Can provide an optional block of previously acquired
+		samples to use instead of reading a new block from the tuner.
+		"""
+		# Get width number of raw samples so the number of frequency bins is
+		# the same as the display width.  Add two because there will be mean/DC
+		# values in the results which are ignored. Increase by 1/self.zoom_fac if needed
+		config = self.get_config()
 
-                	freq_step = self.get_freq_step()   # Get the frequency step in Hz between pixels.
-                	shiftsweep = int(self.get_lo_offset()*1000000/freq_step) # LO offset in pixels.
-                	extra_samples = int((freqs.size - self.width)/2)  # The excess samples either side of the display width in pixels.
+		timer = perf.timer()
+		if samples is None:
+			samples = self.sdr.read_samples(freqshow.SDR_SAMPLE_SIZE)
+		timer.lap('read')
 
-                	if extra_samples > abs(shiftsweep): # check if there is room to shift the array by the LO offset.
+		# Apply a window function to the sample to remove power in sample sidebands before the fft.
+		samples = samples[0:config.bins+2]*config.taper
+		timer.lap('window')
 
-                        	if self.get_swap_iq() == True:
-                                	lextra = extra_samples + shiftsweep
-                        	elif self.get_swap_iq() == False:
-                                	lextra = extra_samples - shiftsweep
-                	else:
-                        	lextra = extra_samples
+		# Run an FFT and take the absolute value to get frequency magnitudes.
+		freqs = dsp.magnitudes(samples, config.bins, swap_iq=config.swap_iq)
+		timer.lap('fft')
 
-			rextra = freqs.size - (lextra + self.width)
-			freqs = freqs[lextra:-rextra]
+		# Keep the width bins around the center frequency, shifted by the LO
+		# offset.
+		freqs = dsp.crop(freqs, self.width, config.shift)
+		timer.lap('crop')
 
 		# Convert to decibels.
-		freqs = 20.0*np.log10(freqs)
+		freqs = dsp.to_db(freqs)
+		timer.lap('log')
 
 		# Get signal strength of the center frequency.
 
@@ -365,17 +625,29 @@ class FreqShowModel(object):
 #			self.sig_strength = (self.get_sig_strength() + freqs[((zoom+2)/2)+i-5])
 #		self.sig_strength = self.get_sig_strength()/10
 
-		# Update model's min and max intensities when auto scaling each value.
-		if self.min_auto_scale:
-			min_intensity = np.min(freqs)
-			self.min_intensity = min_intensity if self.min_intensity is None \
-				else min(min_intensity, self.min_intensity)
-		if self.max_auto_scale:
-			max_intensity = np.max(freqs)
-			self.max_intensity = max_intensity if self.max_intensity is None \
-				else max(max_intensity, self.max_intensity)
+		return self.scale(freqs)
+
+	def scale(self, freqs):
+		"""Update the min and max intensities from the provided spectrum
+		(in dB) when auto scaling and return it.
+		"""
+		timer = perf.timer()
+		# Update model's min and max intensities when auto scaling each value,
+		# from this spectrum alone after the range was reset.
+		min_db, max_db = self.min_intensity, self.max_intensity
+		if self.intensity_reset:
+			self.intensity_reset = False
+			if self.min_auto_scale:
+				min_db = None
+			if self.max_auto_scale:
+				max_db = None
+		min_db, max_db = dsp.auto_scale(freqs, min_db, max_db,
+			self.min_auto_scale, self.max_auto_scale)
+		self._set('min_intensity', min_db)
+		self._set('max_intensity', max_db)
 		# Update intensity range (length between min and max intensity).
 		self.range = self.max_intensity - self.min_intensity
+		timer.lap('scale')
 
 		# Return frequency intensities.
 		return freqs
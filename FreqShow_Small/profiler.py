@@ -0,0 +1,167 @@
+# FreqShow runtime profiler.
+# Captures where the main loop spends its time for a number of frames, on
+# demand while running (SIGUSR1, SIGUSR2 or clicking the performance HUD), and
+# writes the results to disk for later inspection.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import cProfile
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+
+# Directory profiles are written to, number of frames each capture lasts and
+# the interval between stack samples in seconds (sampling mode).
+path = 'profiles'
+frames = 100
+interval = 0.005
+
+# Mode of the capture requested for the next frame ('profile' or 'sample'),
+# or None.  Set from signal handlers and clicks so it is only a plain store.
+pending = None
+# Number of frames left in the running capture, 0 when not capturing.
+remaining = 0
+_capture = None
+
+
+class StackSampler(object):
+	"""Samples the stack of a thread from a timer thread every interval
+	seconds and counts how often each stack is seen.  Much less overhead than
+	cProfile, at the cost of only seeing where time is spent statistically.
+	"""
+
+	def __init__(self, thread_id, interval):
+		self.thread_id = thread_id
+		self.interval = interval
+		self.stacks = {}
+		self.samples = 0
+		self._running = True
+		self._thread = threading.Thread(target=self._run)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def _run(self):
+		while self._running:
+			time.sleep(self.interval)
+			frame = sys._current_frames().get(self.thread_id)
+			stack = []
+			while frame is not None:
+				code = frame.f_code
+				stack.append('{0} ({1}:{2})'.format(code.co_name,
+					os.path.basename(code.co_filename), code.co_firstlineno))
+				frame = frame.f_back
+			key = ';'.join(reversed(stack))
+			self.stacks[key] = self.stacks.get(key, 0) + 1
+			self.samples += 1
+
+	def stop(self):
+		self._running = False
+		self._thread.join()
+
+	def write(self, name):
+		"""Write the stacks in the collapsed format of flame graph tools (one
+		'outer;...;inner count' line per stack) to name + '.folded' and the
+		functions seen most often at the top of the stack to name + '.txt'.
+		"""
+		with open(name + '.folded', 'w') as f:
+			for stack, count in sorted(self.stacks.items()):
+				f.write('{0} {1}\n'.format(stack, count))
+		top = {}
+		for stack, count in self.stacks.items():
+			leaf = stack.rsplit(';', 1)[-1]
+			top[leaf] = top.get(leaf, 0) + count
+		with open(name + '.txt', 'w') as f:
+			f.write('{0} samples every {1} s\n'.format(self.samples, self.interval))
+			for leaf, count in sorted(top.items(), key=lambda i: -i[1])[:40]:
+				f.write('{0:6.1f}%  {1}\n'.format(100.0*count/max(1, self.samples),
+					leaf))
+
+
+def request(mode='profile'):
+	"""Capture the next frames with cProfile ('profile') or the stack sampler
+	('sample').  Ignored while a capture is running.
+	"""
+	global pending
+	if not remaining:
+		pending = mode
+
+def install_signals():
+	"""Request a cProfile capture on SIGUSR1 and a sampling capture on SIGUSR2
+	(where the platform has them).  Must be called from the main thread.
+	"""
+	if hasattr(signal, 'SIGUSR1'):
+		signal.signal(signal.SIGUSR1, lambda signum, frame: request('profile'))
+	if hasattr(signal, 'SIGUSR2'):
+		signal.signal(signal.SIGUSR2, lambda signum, frame: request('sample'))
+
+def frame():
+	"""Mark the end of a frame of the main loop.  Starts a requested capture,
+	or stops the running one and writes it once it has lasted enough frames.
+	"""
+	global pending, remaining, _capture
+	if remaining:
+		remaining -= 1
+		if not remaining:
+			_finish()
+		return
+	if pending is None:
+		return
+	mode = pending
+	pending = None
+	if mode == 'sample':
+		_capture = StackSampler(threading.current_thread().ident, interval)
+	else:
+		_capture = cProfile.Profile()
+		_capture.enable()
+	remaining = frames
+
+def _finish():
+	global _capture
+	capture = _capture
+	_capture = None
+	if not os.path.isdir(path):
+		os.makedirs(path)
+	name = os.path.join(path, time.strftime('profile-%Y%m%d-%H%M%S'))
+	if isinstance(capture, StackSampler):
+		capture.stop()
+		capture.write(name)
+		print('Stack samples of {0} frames written to {1}.folded'.format(frames,
+			name))
+		return
+	capture.disable()
+	capture.dump_stats(name + '.prof')
+	# Also write a readable summary, sorted by cumulative time.
+	text = StringIO()
+	stats = pstats.Stats(capture, stream=text)
+	stats.sort_stats('cumulative').print_stats(40)
+	with open(name + '.txt', 'w') as f:
+		f.write(text.getvalue())
+	print('Profile of {0} frames written to {1}.prof'.format(frames, name))
@@ -0,0 +1,157 @@
+# FreqShow frame pacing scheduler.
+# Runs the acquisition, spectrum, waterfall and display work of the main loop
+# at independent target rates instead of as fast as the radio returns data.
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import time
+
+import perf
+
+
+class Task(object):
+	"""A piece of periodic work run by the scheduler at a target rate."""
+
+	def __init__(self, name, rate, func):
+		"""Create a task with the provided name, target rate in calls per
+		second and function to call.  A rate of None runs the task on every
+		pass of the scheduler.
+		"""
+		self.name = name
+		self.func = func
+		self.set_rate(rate)
+		self.next_time = None
+		self.runs = 0
+		self.skipped = 0
+		self.last_duration = 0.0
+		# Recent durations, total time and total CPU time (if the platform can
+		# measure it) spent in the task, in seconds.
+		self.durations = perf.RollingStats()
+		self.total_time = 0.0
+		self.cpu_time = 0.0
+
+	def set_rate(self, rate):
+		"""Change the target rate (calls per second) of the task."""
+		self.rate = rate
+		self.period = 1.0/rate if rate else 0.0
+
+
+class Scheduler(object):
+	"""Cooperative scheduler which runs each task at its own target rate.
+
+	Tasks run in the order they were added so data can flow from one stage to
+	the next within a single pass.  When a task falls behind by more than one
+	period the missed calls are skipped (and counted) rather than run back to
+	back, and when every task is ahead of schedule the scheduler sleeps until
+	the next one is due instead of spinning the CPU.
+	"""
+
+	def __init__(self, max_sleep=0.05,
+		clock=getattr(time, 'monotonic', time.time), sleep=time.sleep,
+		cpu_clock=getattr(time, 'thread_time', None)):
+		"""Create a scheduler.  The max_sleep value (in seconds) bounds how long
+		a single idle sleep can be so tasks with no rate (like input handling)
+		are still serviced regularly.  Tasks are paced with clock (a monotonic
+		clock when available, so the wall clock being set doesn't stall them)
+		and their CPU time is measured with cpu_clock (the thread CPU time when
+		available).
+		"""
+		self.max_sleep = max_sleep
+		self.clock = clock
+		self.sleep = sleep
+		self.cpu_clock = cpu_clock
+		self.tasks = []
+		self.idle_time = 0.0
+
+	def add(self, name, rate, func):
+		"""Add a task with the provided name, rate (calls per second, or None
+		to run on every pass) and function.  Returns the created task.
+		"""
+		task = Task(name, rate, func)
+		self.tasks.append(task)
+		return task
+
+	def get(self, name):
+		"""Return the task with the provided name."""
+		for task in self.tasks:
+			if task.name == name:
+				return task
+		raise KeyError(name)
+
+	def set_rate(self, name, rate):
+		"""Change the target rate of the named task."""
+		self.get(name).set_rate(rate)
+
+	def run_pending(self):
+		"""Run every task which is due.  Returns the number of tasks run."""
+		count = 0
+		for task in self.tasks:
+			now = self.clock()
+			if task.next_time is None:
+				task.next_time = now
+			if now < task.next_time:
+				continue
+			cpu = self.cpu_clock() if self.cpu_clock else 0.0
+			task.func()
+			end = self.clock()
+			if self.cpu_clock:
+				task.cpu_time += self.cpu_clock() - cpu
+			task.runs += 1
+			task.last_duration = end - now
+			task.durations.add(task.last_duration)
+			task.total_time += task.last_duration
+			count += 1
+			if not task.period:
+				task.next_time = end
+				continue
+			# Schedule the next call on the fixed period grid.  If the task is
+			# behind by one or more whole periods skip those frames instead of
+			# trying to catch up.
+			task.next_time += task.period
+			if task.next_time <= end:
+				missed = int((end - task.next_time)/task.period) + 1
+				task.skipped += missed
+				task.next_time += missed*task.period
+		return count
+
+	def wait(self):
+		"""Sleep until the next rate limited task is due (bounded by max_sleep).
+		Returns the time slept in seconds.
+		"""
+		due = [t.next_time for t in self.tasks if t.period and t.next_time is not None]
+		delay = self.max_sleep
+		if due:
+			delay = min(delay, min(due) - self.clock())
+		if delay <= 0:
+			return 0.0
+		self.sleep(delay)
+		self.idle_time += delay
+		return delay
+
+	def step(self):
+		"""Run any due tasks then idle until the next one is due."""
+		self.run_pending()
+		self.wait()
+
+	def run_forever(self):
+		"""Run the scheduler loop forever."""
+		while True:
+			self.step()
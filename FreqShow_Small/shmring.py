@@ -0,0 +1,303 @@
+# FreqShow shared memory spectrum rings.
+# Publishes the latest spectrums (and optionally raw IQ blocks) in shared
+# memory so any number of local processes can read them without sockets or
+# serialization.  Writer and reader classes live here so consumer scripts
+# only need this module and numpy.  For example, from another process:
+#
+#   ring = shmring.RingReader('freqshow_spectrum')
+#   meta, dbs = ring.latest()        # Newest spectrum and its metadata.
+#   for meta, dbs in ring.poll():    # Every spectrum since the last poll.
+#       ...
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import atexit
+import mmap
+import os
+import time
+
+import numpy as np
+
+try:
+	from multiprocessing import shared_memory
+except ImportError:
+	# Python before 3.8, use a file in the /dev/shm tmpfs instead.
+	shared_memory = None
+
+
+# Layout of a ring: a header then slots frames, each a slot header followed by
+# room for capacity values of the ring's dtype.  The header's head is the number
+# of frames written so far, frame n lives in slot n % slots.
+MAGIC = b'FQSRING1'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('slots', '<u4'),
+	('capacity', '<u4'), ('dtype', 'S8'), ('head', '<u8')])
+SLOT_DTYPE = np.dtype([('seq', '<u8'), ('frame', '<u8'), ('time', '<f8'),
+	('center_freq', '<f8'), ('span', '<f8'), ('min_db', '<f4'),
+	('max_db', '<f4'), ('length', '<u4'), ('pad', '<u4')])
+# Slot header fields returned as frame metadata.
+META_FIELDS = ('frame', 'time', 'center_freq', 'span', 'min_db', 'max_db')
+SHM_DIR = '/dev/shm'
+
+
+def _slot_size(capacity, dtype):
+	# Keep every slot 8 byte aligned.
+	size = SLOT_DTYPE.itemsize + capacity*np.dtype(dtype).itemsize
+	return (size + 7)//8*8
+
+def _open(name, size=None, untrack=True):
+	"""Return a tuple of (buffer, close function) of the named shared memory,
+	created with the provided size or attached to if size is None.  Attached
+	memory is untracked (see RingReader) if untrack is True.
+	"""
+	if shared_memory is not None:
+		if size is None:
+			shm = shared_memory.SharedMemory(name)
+			# Readers must not unlink the memory when they exit.
+			try:
+				from multiprocessing import resource_tracker
+				if untrack:
+					resource_tracker.unregister(shm._name, 'shared_memory')
+			except (ImportError, AttributeError):
+				pass
+			return shm.buf, shm.close
+		try:
+			shared_memory.SharedMemory(name).unlink()
+		except FileNotFoundError:
+			pass
+		shm = shared_memory.SharedMemory(name, create=True, size=size)
+		def close():
+			shm.close()
+			shm.unlink()
+		return shm.buf, close
+	path = os.path.join(SHM_DIR, name)
+	owner = size is not None
+	if owner:
+		fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+		os.ftruncate(fd, size)
+	else:
+		fd = os.open(path, os.O_RDWR)
+		size = os.fstat(fd).st_size
+	buf = mmap.mmap(fd, size)
+	os.close(fd)
+	def close():
+		buf.close()
+		if owner:
+			os.unlink(path)
+	return buf, close
+
+
+class _Ring(object):
+
+	def _map(self, buf):
+		self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buf)
+		self.slots = int(self.header['slots'])
+		self.capacity = int(self.header['capacity'])
+		self.dtype = np.dtype(self.header['dtype'].item().decode('ascii'))
+		size = _slot_size(self.capacity, self.dtype)
+		self.slot_headers = []
+		self.slot_data = []
+		for i in range(self.slots):
+			offset = HEADER_DTYPE.itemsize + i*size
+			self.slot_headers.append(np.ndarray((), dtype=SLOT_DTYPE,
+				buffer=buf, offset=offset))
+			self.slot_data.append(np.ndarray(self.capacity, dtype=self.dtype,
+				buffer=buf, offset=offset + SLOT_DTYPE.itemsize))
+
+
+class RingWriter(_Ring):
+	"""Single writer of a shared memory ring of frames.
+
+	Every slot is guarded by a sequence lock: its seq is made odd while the
+	frame is written and even once it is complete, so readers never need a
+	lock and can detect (and retry) a frame overwritten while they copied it.
+	"""
+
+	def __init__(self, name, slots, capacity, dtype):
+		"""Create the named ring of slots frames of up to capacity values of
+		the provided numpy dtype, replacing any ring with the same name.
+		"""
+		self.name = name
+		dtype = np.dtype(dtype)
+		size = HEADER_DTYPE.itemsize + slots*_slot_size(capacity, dtype)
+		self._buf, self._close = _open(name, size)
+		header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._buf)
+		header['magic'] = MAGIC
+		header['slots'] = slots
+		header['capacity'] = capacity
+		header['dtype'] = dtype.str.encode('ascii')
+		header['head'] = 0
+		self._map(self._buf)
+
+	def write(self, data, center_freq=0.0, span=0.0, min_db=0.0, max_db=0.0,
+		timestamp=None):
+		"""Write a frame of values (up to capacity) with its metadata."""
+		head = int(self.header['head'])
+		slot = self.slot_headers[head % self.slots]
+		length = min(len(data), self.capacity)
+		seq = int(slot['seq'])
+		slot['seq'] = seq + 1
+		self.slot_data[head % self.slots][:length] = data[:length]
+		slot['frame'] = head
+		slot['time'] = time.time() if timestamp is None else timestamp
+		slot['center_freq'] = center_freq
+		slot['span'] = span
+		slot['min_db'] = min_db
+		slot['max_db'] = max_db
+		slot['length'] = length
+		slot['seq'] = seq + 2
+		self.header['head'] = head + 1
+
+	def close(self):
+		"""Remove the ring.  Attached readers keep their mapping."""
+		self.header = self.slot_headers = self.slot_data = None
+		self._close()
+
+
+class RingReader(_Ring):
+	"""Reader of a shared memory ring created by a RingWriter, in this or any
+	other process.
+	"""
+
+	def __init__(self, name, untrack=True):
+		"""Attach to the named ring.  Unless untrack is False the ring is
+		removed from the resource tracker of this process, so the ring isn't
+		removed when this process exits.  That has to be skipped when the
+		writer shares the tracker, as a child process (see multisdr.py) or the
+		parent this process was forked from (see bench_shm.py), or the
+		writer's own entry would be removed.
+		"""
+		self.name = name
+		self._buf, self._close = _open(name, untrack=untrack)
+		header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._buf)
+		if header['magic'] != MAGIC:
+			raise ValueError('{0} is not a FreqShow ring'.format(name))
+		self._map(self._buf)
+		# Next frame returned by poll and counts of frames missed by poll and
+		# copies retried because the writer overwrote the slot.
+		self.next_frame = int(self.header['head'])
+		self.missed = 0
+		self.retries = 0
+
+	@property
+	def head(self):
+		"""Number of frames written so far."""
+		return int(self.header['head'])
+
+	def read(self, frame, out=None):
+		"""Copy the provided frame number into out (or a new array) and return
+		a tuple of (metadata dict, values), or None if the frame has been
+		overwritten or not written yet.
+		"""
+		slot = self.slot_headers[frame % self.slots]
+		data = self.slot_data[frame % self.slots]
+		while True:
+			fields = slot.item()
+			seq = fields[0]
+			if seq & 1:
+				# Being written right now.
+				self.retries += 1
+				continue
+			if fields[1] != frame or seq == 0:
+				return None
+			length = fields[7]
+			if out is None:
+				values = data[:length].copy()
+			else:
+				values = out[:length]
+				values[:] = data[:length]
+			if slot['seq'] == seq:
+				return dict(zip(META_FIELDS, fields[1:7])), values
+			self.retries += 1
+
+	def latest(self, out=None):
+		"""Return the newest complete frame like read, or None if nothing has
+		been written yet.
+		"""
+		while True:
+			head = self.head
+			if head == 0:
+				return None
+			result = self.read(head - 1, out)
+			if result is not None:
+				return result
+
+	def poll(self):
+		"""Return a list of the frames (like read) written since the last call,
+		oldest first.  Frames overwritten before they could be read are
+		counted in missed.
+		"""
+		head = self.head
+		first = max(self.next_frame, head - self.slots)
+		self.missed += first - self.next_frame
+		frames = []
+		for frame in range(first, head):
+			result = self.read(frame)
+			if result is None:
+				self.missed += 1
+			else:
+				frames.append(result)
+		self.next_frame = head
+		return frames
+
+	def close(self):
+		"""Detach from the ring."""
+		self.header = self.slot_headers = self.slot_data = None
+		self._close()
+
+
+class SpectrumPublisher(object):
+	"""Publishes each spectrum of the model to the '<name>_spectrum' ring of
+	float32 dB values, and optionally the block of IQ samples it was computed
+	from to the '<name>_iq' ring of complex64 values.  No IQ samples are
+	published while sweeping, the spectrum is stitched from the blocks of
+	several hops then.
+	"""
+
+	def __init__(self, model, name, slots, iq=False, iq_size=None):
+		"""Create the rings for the provided model and subscribe to it."""
+		self.model = model
+		self.spectrum = RingWriter(name + '_spectrum', slots, model.width,
+			np.float32)
+		self.iq = None
+		if iq:
+			self.iq = RingWriter(name + '_iq', slots, iq_size, np.complex64)
+		model.subscribe(self.publish)
+		atexit.register(self.close)
+
+	def publish(self, freqs):
+		model = self.model
+		center_freq, span = model.get_display_range()
+		params = (center_freq, span, model.min_intensity, model.max_intensity)
+		timestamp = time.time()
+		self.spectrum.write(freqs, *params, timestamp=timestamp)
+		if self.iq is not None and model.samples is not None \
+			and model.sweep is None:
+			self.iq.write(model.samples, *params, timestamp=timestamp)
+
+	def close(self):
+		"""Stop publishing and remove the rings."""
+		if self.spectrum.header is None:
+			return
+		self.model.unsubscribe(self.publish)
+		self.spectrum.close()
+		if self.iq is not None:
+			self.iq.close()
@@ -0,0 +1,156 @@
+# FreqShow allocation regression tests.
+# Runs frames of the spectrum pipeline with a fake radio and an off-screen
+# surface and checks the memory each frame allocates with tracemalloc, so hot
+# paths which are allocation free (or close to it) stay that way.
+#
+# Usage: python -m unittest test_allocations   (or pytest)
+#
+# tracemalloc needs Python 3.4 or later, the tests are skipped on Python 2.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import os
+import unittest
+
+if 'SDL_VIDEODRIVER' not in os.environ:
+	os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+import numpy as np
+import pygame
+
+import bench_pipeline
+import freqshow
+
+
+# Frames run before measuring, so caches and lazily created buffers exist.
+WARMUP = 5
+# Frames measured.
+FRAMES = 20
+
+
+def frame_allocations(func, frames=FRAMES, warmup=WARMUP):
+	"""Return a tuple of (peak, retained) bytes: the most memory any single
+	call of func allocated at once (its temporary arrays and objects), and the
+	memory still held after all the calls (growth that would become a leak).
+	"""
+	for i in range(warmup):
+		func()
+	peak = 0
+	tracemalloc.start()
+	try:
+		start = tracemalloc.get_traced_memory()[0]
+		for i in range(frames):
+			tracemalloc.stop()
+			tracemalloc.start()
+			func()
+			peak = max(peak, tracemalloc.get_traced_memory()[1])
+		tracemalloc.stop()
+		tracemalloc.start()
+		for i in range(frames):
+			func()
+		retained = tracemalloc.get_traced_memory()[0] - start
+	finally:
+		tracemalloc.stop()
+	return peak, retained
+
+
+@unittest.skipIf(tracemalloc is None, 'tracemalloc needs Python 3.4 or later')
+class AllocationTest(unittest.TestCase):
+	"""Per frame allocation budgets of each stage.  Budgets are in units of
+	the arrays the stage works with, so they hold for any screen size, and
+	leave a little room over what each stage allocates today.  Lower them
+	when a stage gets leaner.
+	"""
+
+	@classmethod
+	def setUpClass(cls):
+		bench_pipeline.install_fake_sdr()
+		freqshow.RECORD_PATH = None
+		freqshow.SDR_STREAMING = False
+		pygame.display.init()
+		pygame.font.init()
+		import controller
+		import model
+		cls.size = freqshow.HEADLESS_SIZE
+		cls.model = model.FreqShowModel(cls.size[0], cls.size[1])
+		cls.controller = controller.FreqShowController(cls.model)
+		cls.samples = cls.model.sdr.read_samples(freqshow.SDR_SAMPLE_SIZE)
+		cls.freqs = cls.model.get_data(cls.samples)
+		cls.screen = pygame.Surface(cls.size, 0, 32)
+		cls.spect = cls.screen.subsurface(cls.controller.instant.spect_rect())
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.model.close()
+
+	# Bytes of the arrays stages work with.
+	def block_bytes(self):
+		"""A block of complex samples."""
+		return self.samples.nbytes
+
+	def row_bytes(self):
+		"""A row of float64 intensities, one per pixel column."""
+		return self.size[0]*np.dtype(np.float64).itemsize
+
+	def assertBudget(self, func, peak_budget, retained_budget=16*1024):
+		peak, retained = frame_allocations(func)
+		self.assertLessEqual(peak, peak_budget,
+			'allocated {0} bytes in a frame, budget is {1}'.format(peak,
+			int(peak_budget)))
+		self.assertLessEqual(retained, retained_budget,
+			'kept {0} bytes after {1} frames, budget is {2}'.format(retained,
+			FRAMES, retained_budget))
+		return peak
+
+	def test_get_data(self):
+		# The windowed block and its FFT.
+		self.assertBudget(lambda: self.model.get_data(self.samples),
+			3*self.block_bytes())
+
+	def test_instant(self):
+		instant = self.controller.instant
+		def frame():
+			instant.spectrum_ready(self.freqs)
+			instant.render_spectrogram(self.spect)
+		self.assertBudget(frame, 6*self.row_bytes())
+
+	def test_waterfall(self):
+		waterfall = self.controller.waterfall
+		def frame():
+			waterfall.spectrum_ready(self.freqs)
+			waterfall.add_row()
+			waterfall.render_spectrogram(self.spect)
+		self.assertBudget(frame, 6*self.row_bytes())
+
+	def test_render(self):
+		for view in (self.controller.instant, self.controller.waterfall):
+			self.assertBudget(lambda: view.render(self.screen),
+				8*self.row_bytes())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,262 @@
+# FreqShow golden spectrum tests.
+# Feeds synthetic IQ samples of known tones through FreqShowModel.get_data for
+# combinations of swap_iq, lo_offset, zoom_fac, sample_rate and window, checks
+# the tones land on the right pixels and compares the spectra with stored
+# reference spectra, so faster spectrum engines can be checked against the
+# current one.
+#
+# Usage: python -m unittest test_golden   (or pytest)
+#        python test_golden.py --update   to store new reference spectra
+#
+# Only store new references for changes meant to alter the output, and say so
+# in the commit.
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import os
+import sys
+import unittest
+
+import numpy as np
+
+import bench_pipeline
+import dsp
+import freqshow
+
+
+# Reference spectra, by case name.
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+	'golden_spectra.npz')
+
+# Displayed center frequency of every case in MHz.
+CENTER_FREQ = 70.4515
+
+# Tones of each case as (offset from the center as a fraction of the span,
+# amplitude).  The weak tone is 40 dB down and on the other side of the
+# center, where a mirrored (wrongly swapped) spectrum would put the strong
+# one.
+TONES = [(0.3, 1.0), (-0.2, 0.01)]
+NOISE = 1e-3
+
+# Cases as (sample rate MHz, zoom (span) MHz, LO offset MHz, swap IQ, window).
+# Every window is checked at the default tuning, and every tuning with the
+# default window.
+CASES = [(rate, zoom, lo, swap, 'nuttall')
+	for rate in (0.230, 2.4)
+	for zoom in (0.01, 0.05, 0.2)
+	for lo in (0.0, 0.03)
+	for swap in (False, True)] + \
+	[(0.230, 0.05, 0.03, True, window) for window in dsp.WINDOWS
+		if window != 'nuttall']
+
+# Pixels a tone may land away from where it belongs.  Reversing the spectrum
+# for swap_iq currently puts tones up to two bins low.
+PIXEL_TOLERANCE = 2
+
+# Spectra match when every bin within DYNAMIC_RANGE dB of the peak is within
+# TOLERANCE dB of the reference.  Bins further down are noise floor and only
+# have to stay there.
+TOLERANCE = 0.05
+DYNAMIC_RANGE = 80.0
+
+
+def case_name(case):
+	return 'rate{0}_zoom{1}_lo{2}_swap{3}_{4}'.format(*case)
+
+
+def tune(fsmodel, case):
+	"""Set up the model for the provided case."""
+	rate, zoom, lo, swap, window = case
+	fsmodel.set_sample_rate(rate)
+	fsmodel.set_zoom_fac(zoom)
+	fsmodel.set_lo_offset(lo)
+	fsmodel.set_swap_iq(swap)
+	fsmodel.set_filter(window)
+	fsmodel.set_center_freq(CENTER_FREQ)
+	# Retunes are applied by the sample stream between blocks.
+	fsmodel.acquire()
+
+
+def fft_size(fsmodel):
+	"""Return a tuple of (bins, span MHz) get_data will use with the current
+	settings.
+	"""
+	return dsp.fft_size(fsmodel.width, fsmodel.get_sample_rate(),
+		fsmodel.get_zoom_fac(), freqshow.SDR_SAMPLE_SIZE)
+
+def displayed_span(fsmodel):
+	"""Return the span in MHz get_data will show with the current settings."""
+	return fft_size(fsmodel)[1]
+
+
+def synthetic_samples(fsmodel):
+	"""Return a block of the IQ samples the radio would deliver with the TONES
+	around the displayed center frequency.  With swap_iq the radio sees an
+	inverted spectrum (a tone above the center arrives below it).
+	"""
+	rate = fsmodel.get_sample_rate()
+	span = displayed_span(fsmodel)
+	tuned = fsmodel.sdr.get_center_freq()/1e6
+	n = freqshow.SDR_SAMPLE_SIZE
+	t = np.arange(n)/(rate*1e6)
+	rand = np.random.RandomState(1)
+	samples = NOISE*(rand.randn(n) + 1j*rand.randn(n))
+	for fraction, amplitude in TONES:
+		freq = CENTER_FREQ + fraction*span
+		if fsmodel.get_swap_iq():
+			freq = 2*CENTER_FREQ - freq
+		samples += amplitude*np.exp(2j*np.pi*(freq - tuned)*1e6*t)
+	return samples
+
+
+def expected_pixel(fsmodel, fraction):
+	"""Return the pixel column a tone fraction of the span above the center
+	should land on.  When the FFT has less than the LO offset worth of bins to
+	spare either side of the displayed ones (like when the whole bandwidth is
+	shown) the crop can't be moved by the LO offset, so the spectrum is
+	centered on the tuner frequency instead of the displayed center.
+	"""
+	width = fsmodel.width
+	bins, span = fft_size(fsmodel)
+	shift = dsp.lo_shift(fsmodel.get_lo_offset(), fsmodel.get_sample_rate(),
+		bins, fsmodel.get_swap_iq())
+	offset = fraction*span
+	if (bins - width)//2 <= abs(shift):
+		lo = fsmodel.sdr.get_center_freq()/1e6 - CENTER_FREQ
+		offset += lo if fsmodel.get_swap_iq() else -lo
+	return width/2.0 + offset/span*width
+
+
+def compare_spectra(actual, reference, tolerance=TOLERANCE,
+	dynamic_range=DYNAMIC_RANGE):
+	"""Return a description of how the actual spectrum (dB) differs from the
+	reference, or None if they match.
+	"""
+	actual = np.asarray(actual, dtype=np.float64)
+	reference = np.asarray(reference, dtype=np.float64)
+	if actual.shape != reference.shape:
+		return 'shape {0} instead of {1}'.format(actual.shape, reference.shape)
+	floor = reference.max() - dynamic_range
+	signal = reference > floor
+	error = np.abs(actual - reference)
+	if np.any(error[signal] > tolerance):
+		worst = np.argmax(np.where(signal, error, 0))
+		return 'bin {0} is {1:0.3f} dB, reference {2:0.3f} dB'.format(worst,
+			actual[worst], reference[worst])
+	if np.any(actual[~signal] > floor + tolerance):
+		worst = np.argmax(np.where(signal, -np.inf, actual))
+		return 'noise floor bin {0} rose to {1:0.3f} dB'.format(worst,
+			actual[worst])
+	return None
+
+
+def create_model():
+	"""Return a model with a fake radio and the size of the headless display."""
+	bench_pipeline.install_fake_sdr()
+	freqshow.RECORD_PATH = None
+	freqshow.SDR_STREAMING = False
+	import model
+	return model.FreqShowModel(*freqshow.HEADLESS_SIZE)
+
+
+def spectra(fsmodel):
+	"""Return a dict of the spectrum of every case, by case name."""
+	result = {}
+	for case in CASES:
+		tune(fsmodel, case)
+		result[case_name(case)] = fsmodel.get_data(synthetic_samples(fsmodel))
+	return result
+
+
+class GoldenSpectrumTest(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.model = create_model()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.model.close()
+
+	def test_tone_pixels(self):
+		errors = []
+		for case in CASES:
+			tune(self.model, case)
+			freqs = self.model.get_data(synthetic_samples(self.model))
+			for fraction, amplitude in TONES:
+				expected = expected_pixel(self.model, fraction)
+				# The tone's peak near where it belongs.
+				lo = max(0, int(expected) - 2*PIXEL_TOLERANCE)
+				pixel = lo + np.argmax(freqs[lo:int(expected) + 2*PIXEL_TOLERANCE + 1])
+				if abs(pixel - expected) > PIXEL_TOLERANCE:
+					errors.append('{0}: tone at {1} of the span on pixel {2}, '
+						'expected {3:0.1f}'.format(case_name(case), fraction,
+						pixel, expected))
+		self.assertFalse(errors, '\n'.join(errors))
+
+	def test_pan(self):
+		# Small tuning steps move the span within the captured bandwidth
+		# without retuning, and tones stay on the frequency they belong to.
+		tune(self.model, (0.230, 0.05, 0.03, False, 'nuttall'))
+		generation = self.model.tuning_generation()
+		samples = synthetic_samples(self.model)
+		span = displayed_span(self.model)
+		width = self.model.width
+		for pan in (-0.004, 0.003):
+			self.model.set_center_freq(CENTER_FREQ + pan)
+			self.assertEqual(self.model.tuning_generation(), generation)
+			freqs = self.model.get_data(samples)
+			expected = width/2.0 + (TONES[0][0]*span - pan)/span*width
+			self.assertLessEqual(abs(np.argmax(freqs) - expected), PIXEL_TOLERANCE)
+		self.model.set_center_freq(CENTER_FREQ + 0.1)
+		self.assertNotEqual(self.model.tuning_generation(), generation)
+
+	def test_golden_spectra(self):
+		if not os.path.exists(GOLDEN_PATH):
+			self.skipTest('no reference spectra, run test_golden.py --update')
+		golden = np.load(GOLDEN_PATH)
+		errors = []
+		for name, freqs in sorted(spectra(self.model).items()):
+			if name not in golden.files:
+				errors.append('{0}: no reference spectrum'.format(name))
+				continue
+			error = compare_spectra(freqs, golden[name])
+			if error is not None:
+				errors.append('{0}: {1}'.format(name, error))
+		self.assertFalse(errors, '\n'.join(errors))
+
+
+def update():
+	"""Store the spectra of the current code as the reference spectra."""
+	fsmodel = create_model()
+	result = spectra(fsmodel)
+	fsmodel.close()
+	np.savez_compressed(GOLDEN_PATH, **dict((name, freqs.astype(np.float32))
+		for name, freqs in result.items()))
+	print('Stored {0} reference spectra in {1}'.format(len(result), GOLDEN_PATH))
+
+
+if __name__ == '__main__':
+	if '--update' in sys.argv:
+		update()
+	else:
+		unittest.main()
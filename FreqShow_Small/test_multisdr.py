@@ -0,0 +1,123 @@
+# FreqShow multiple radio tests.
+# Runs two radio workers (see multisdr.py) with the fake radio of the pipeline
+# benchmark and checks the spectra they return through shared memory match the
+# spectra computed in this process with the same settings.
+#
+# Usage: python -m unittest test_multisdr   (or pytest)
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import os
+import time
+import unittest
+
+import numpy as np
+
+import bench_pipeline
+import freqshow
+
+
+# Settings of each radio as (center frequency MHz, swap IQ).
+RADIOS = [(70.4515, True), (144.2, False)]
+
+# Seconds to wait for a spectrum from a worker.
+TIMEOUT = 10.0
+
+# dB a worker's spectrum may differ by (it is returned as float32).
+TOLERANCE = 1e-3
+
+
+def setup():
+	"""Use the fake radio and read it on each acquire, in this process and
+	the workers.
+	"""
+	bench_pipeline.install_fake_sdr()
+	freqshow.RECORD_PATH = None
+	freqshow.SDR_STREAMING = False
+
+
+def wait_spectrum(fsmodel):
+	"""Return the next spectrum of the provided model, or None if none is
+	published within TIMEOUT.
+	"""
+	end = time.time() + TIMEOUT
+	while time.time() < end:
+		if fsmodel.acquire():
+			fsmodel.update()
+			return fsmodel.freqs
+		time.sleep(0.01)
+	return None
+
+
+class MultiRadioTest(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		setup()
+		import model
+		import multisdr
+		width, height = freqshow.HEADLESS_SIZE
+		cls.models = [multisdr.DeviceModel(width, height, i,
+			'freqshow_test{0}_{1}'.format(os.getpid(), i), setup)
+			for i in range(len(RADIOS))]
+		# Computes the expected spectra in this process.
+		cls.local = model.FreqShowModel(width, height)
+
+	@classmethod
+	def tearDownClass(cls):
+		for fsmodel in cls.models:
+			fsmodel.close()
+		cls.local.close()
+
+	def expected(self, fsmodel):
+		"""Return the spectrum the local model computes with the settings of
+		the provided model.
+		"""
+		self.local.set_swap_iq(fsmodel.get_swap_iq())
+		self.local.set_center_freq(fsmodel.get_center_freq())
+		self.local.acquire()
+		return self.local.get_data(self.local.samples)
+
+	def test_spectra(self):
+		for fsmodel, (center_freq, swap_iq) in zip(self.models, RADIOS):
+			fsmodel.set_swap_iq(swap_iq)
+			fsmodel.set_center_freq(center_freq)
+		for fsmodel in self.models:
+			freqs = wait_spectrum(fsmodel)
+			self.assertIsNotNone(freqs, 'no spectrum from radio {0}'.format(
+				fsmodel.device))
+			self.assertLess(np.max(np.abs(freqs - self.expected(fsmodel))),
+				TOLERANCE)
+
+	def test_retune(self):
+		# Spectra of the settings before a change aren't used.
+		fsmodel = self.models[0]
+		self.assertIsNotNone(wait_spectrum(fsmodel))
+		generation = fsmodel.tuning_generation()
+		fsmodel.set_center_freq(fsmodel.get_center_freq() + 1.0)
+		self.assertNotEqual(fsmodel.tuning_generation(), generation)
+		self.assertIsNotNone(wait_spectrum(fsmodel))
+		self.assertEqual(fsmodel.samples_generation, fsmodel.tuning_generation())
+
+	def test_stats(self):
+		stats = self.models[1].get_read_stats()
+		self.assertIn('blocks', stats)
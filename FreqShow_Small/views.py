@@ -26,11 +26,17 @@
 # Enhancements over the original freqshow by Dan Stixrud, WQ7T
 import math
 import sys
+import time
 
 import numpy as np
 import pygame
 
+import dsp
 import freqshow
+import history
+import perf
+import profiler
+import recorder
 import ui
 
 
@@ -78,6 +84,15 @@ def clamp(x, x0, x1):
 		return x
 
 
+# Color key marking the transparent parts of overlay textures drawn over the
+# spectrogram by the SDL2 display backend.
+TRANSPARENT = (255, 0, 255)
+
+# Model settings shown by the spectrogram overlay labels.
+OVERLAY_SETTINGS = ('center_freq', 'zoom_fac', 'min_intensity', 'max_intensity',
+	'fft_ave', 'peak', 'filter', 'kaiser_beta', 'sweep_range')
+
+
 class ViewBase(object):
 	"""Base class for simple UI view which represents all the elements drawn
 	on the screen.  Subclasses should override the render, and click functions.
@@ -250,163 +265,163 @@ class NumberDialog(ViewBase):
 
 
 class FilterDialog(ViewBase):
-        """Dialog which asks the user to enter a filter value."""
-
-        def __init__(self, model, label_text, unit_text, initial='0', accept=None, cancel=None):
-                """Create a dialog for provided model and with given label and unit
-                text.  Can provide an optional initial value (default to True), an accept
-                callback function which is called when the user accepts the dialog (and
-                the chosen value will be sent as a single parameter), a cancel callback
-                which is called when the user cancels.
-                """
-                self.value = str(initial)
-                self.unit_text = unit_text
-                self.model = model
-                self.accept = accept
-                self.cancel = cancel
-                # Initialize button grid.
-                self.buttons = ui.ButtonGrid(model.width, model.height, 4, 5)
-                self.buttons.add(0, 1, 'boxcar', font_size=freqshow.MAIN_FONT,  click=self.boxcar_click)
-                self.buttons.add(1, 1, 'hann', font_size=freqshow.MAIN_FONT, click=self.hann_click)
-                self.buttons.add(2, 1, 'hamming', font_size=freqshow.MAIN_FONT, click=self.hamming_click)
-                self.buttons.add(0, 2, 'blackman', font_size=freqshow.MAIN_FONT, click=self.blackman_click)
-                self.buttons.add(1, 2, 'bharris', font_size=freqshow.MAIN_FONT, click=self.blackmanharris_click)
-                self.buttons.add(2, 2, 'bartlett', font_size=freqshow.MAIN_FONT, click=self.bartlett_click)
-                self.buttons.add(0, 3, 'barthann', font_size=freqshow.MAIN_FONT, click=self.barthann_click)
-                self.buttons.add(1, 3, 'nuttall', font_size=freqshow.MAIN_FONT, click=self.nuttall_click)
-                self.buttons.add(2, 3, 'kaiser', font_size=freqshow.MAIN_FONT, click=self.kaiser_click)
-                self.buttons.add(3, 3, 'CANCEL', click=self.cancel_click,
-                        bg_color=freqshow.CANCEL_BG)
-                self.buttons.add(3, 4, 'ACCEPT', click=self.accept_click,
-                        bg_color=freqshow.ACCEPT_BG)
-                # Build label text for faster rendering.
-                self.input_rect = (0, 0, self.model.width, self.buttons.row_size)
-                self.label = ui.render_text(label_text, size=freqshow.MAIN_FONT,
-                        fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
-                self.label_pos = ui.align(self.label.get_rect(), self.input_rect,
-                        horizontal=ui.ALIGN_LEFT, hpad=9)
-
-        def render(self, screen):
-                # Clear view and draw background.
-                screen.fill(freqshow.MAIN_BG)
-                # Draw input background at top of screen.
-                screen.fill(freqshow.INPUT_BG, self.input_rect)
-                # Render label and value text.
-                screen.blit(self.label, self.label_pos)
-                value_label = ui.render_text('{0} {1}'.format(self.value, self.unit_text),
-                        size=freqshow.NUM_FONT, fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
-                screen.blit(value_label, ui.align(value_label.get_rect(), self.input_rect,
-                        horizontal=ui.ALIGN_RIGHT, hpad=-9))
-                # Render buttons.
-                self.buttons.render(screen)
-
-        def click(self, location):
-                self.buttons.click(location)
-
-        # Button click handlers follow below.
-
-        def boxcar_click(self, button):
-                self.value = 'boxcar'
-
-        def hann_click(self, button):
-                self.value = 'hann'
-
-        def hamming_click(self, button):
-                self.value = 'hamming'
-
-        def blackman_click(self, button):
-                self.value = 'blackman'
-
-        def blackmanharris_click(self, button):
-                self.value = 'blackmanharris'
-
-        def bartlett_click(self, button):
-                self.value = 'bartlett'
-
-        def barthann_click(self, button):
-                self.value = 'barthann'
-
-        def nuttall_click(self, button):
-                self.value = 'nuttall'
-
-        def kaiser_click(self, button):
-                self.value = 'kaiser'
-
-       	def cancel_click(self, button):
-                if self.cancel is not None:
-                        self.cancel()
-
-        def accept_click(self, button):
-                if self.accept is not None:
-                        self.accept(self.value)
+	"""Dialog which asks the user to enter a filter value."""
+
+	def __init__(self, model, label_text, unit_text, initial='0', accept=None, cancel=None):
+		"""Create a dialog for provided model and with given label and unit
+		text.  Can provide an optional initial value (default to True), an accept
+		callback function which is called when the user accepts the dialog (and
+		the chosen value will be sent as a single parameter), a cancel callback
+		which is called when the user cancels.
+		"""
+		self.value = str(initial)
+		self.unit_text = unit_text
+		self.model = model
+		self.accept = accept
+		self.cancel = cancel
+		# Initialize button grid.
+		self.buttons = ui.ButtonGrid(model.width, model.height, 4, 5)
+		self.buttons.add(0, 1, 'boxcar', font_size=freqshow.MAIN_FONT,  click=self.boxcar_click)
+		self.buttons.add(1, 1, 'hann', font_size=freqshow.MAIN_FONT, click=self.hann_click)
+		self.buttons.add(2, 1, 'hamming', font_size=freqshow.MAIN_FONT, click=self.hamming_click)
+		self.buttons.add(0, 2, 'blackman', font_size=freqshow.MAIN_FONT, click=self.blackman_click)
+		self.buttons.add(1, 2, 'bharris', font_size=freqshow.MAIN_FONT, click=self.blackmanharris_click)
+		self.buttons.add(2, 2, 'bartlett', font_size=freqshow.MAIN_FONT, click=self.bartlett_click)
+		self.buttons.add(0, 3, 'barthann', font_size=freqshow.MAIN_FONT, click=self.barthann_click)
+		self.buttons.add(1, 3, 'nuttall', font_size=freqshow.MAIN_FONT, click=self.nuttall_click)
+		self.buttons.add(2, 3, 'kaiser', font_size=freqshow.MAIN_FONT, click=self.kaiser_click)
+		self.buttons.add(3, 3, 'CANCEL', click=self.cancel_click,
+			bg_color=freqshow.CANCEL_BG)
+		self.buttons.add(3, 4, 'ACCEPT', click=self.accept_click,
+			bg_color=freqshow.ACCEPT_BG)
+		# Build label text for faster rendering.
+		self.input_rect = (0, 0, self.model.width, self.buttons.row_size)
+		self.label = ui.render_text(label_text, size=freqshow.MAIN_FONT,
+			fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
+		self.label_pos = ui.align(self.label.get_rect(), self.input_rect,
+			horizontal=ui.ALIGN_LEFT, hpad=9)
+
+	def render(self, screen):
+		# Clear view and draw background.
+		screen.fill(freqshow.MAIN_BG)
+		# Draw input background at top of screen.
+		screen.fill(freqshow.INPUT_BG, self.input_rect)
+		# Render label and value text.
+		screen.blit(self.label, self.label_pos)
+		value_label = ui.render_text('{0} {1}'.format(self.value, self.unit_text),
+			size=freqshow.NUM_FONT, fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
+		screen.blit(value_label, ui.align(value_label.get_rect(), self.input_rect,
+			horizontal=ui.ALIGN_RIGHT, hpad=-9))
+		# Render buttons.
+		self.buttons.render(screen)
+
+	def click(self, location):
+		self.buttons.click(location)
+
+	# Button click handlers follow below.
+
+	def boxcar_click(self, button):
+		self.value = 'boxcar'
+
+	def hann_click(self, button):
+		self.value = 'hann'
+
+	def hamming_click(self, button):
+		self.value = 'hamming'
+
+	def blackman_click(self, button):
+		self.value = 'blackman'
+
+	def blackmanharris_click(self, button):
+		self.value = 'blackmanharris'
+
+	def bartlett_click(self, button):
+		self.value = 'bartlett'
+
+	def barthann_click(self, button):
+		self.value = 'barthann'
+
+	def nuttall_click(self, button):
+		self.value = 'nuttall'
+
+	def kaiser_click(self, button):
+		self.value = 'kaiser'
+
+	def cancel_click(self, button):
+		if self.cancel is not None:
+			self.cancel()
+
+	def accept_click(self, button):
+		if self.accept is not None:
+			self.accept(self.value)
 
 
 
 
 class BooleanDialog(ViewBase):
-        """Dialog which asks the user to enter a boolean value."""
-
-        def __init__(self, model, label_text, unit_text, initial='0', accept=None, cancel=None):
-                """Create boolean dialog for provided model and with given label and unit
-                text.  Can provide an optional initial value (default to True), an accept
-                callback function which is called when the user accepts the dialog (and
-                the chosen value will be sent as a single parameter), a cancel callback
-                which is called when the user cancels.
-                """
-                self.value = str(initial)
+	"""Dialog which asks the user to enter a boolean value."""
+
+	def __init__(self, model, label_text, unit_text, initial='0', accept=None, cancel=None):
+		"""Create boolean dialog for provided model and with given label and unit
+		text.  Can provide an optional initial value (default to True), an accept
+		callback function which is called when the user accepts the dialog (and
+		the chosen value will be sent as a single parameter), a cancel callback
+		which is called when the user cancels.
+		"""
+		self.value = str(initial)
 		self.unit_text = unit_text
-                self.model = model
-                self.accept = accept
-                self.cancel = cancel
-                # Initialize button grid.
-                self.buttons = ui.ButtonGrid(model.width, model.height, 4, 5)
-                self.buttons.add(0, 1, 'False', font_size=freqshow.NUM_FONT, click=self.false_click)
-                self.buttons.add(1, 1, 'True', font_size=freqshow.NUM_FONT, click=self.true_click)
-                self.buttons.add(3, 3, 'CANCEL', click=self.cancel_click,
-                        bg_color=freqshow.CANCEL_BG)
-                self.buttons.add(3, 4, 'ACCEPT', click=self.accept_click,
-                        bg_color=freqshow.ACCEPT_BG)
-                # Build label text for faster rendering.
-                self.input_rect = (0, 0, self.model.width, self.buttons.row_size)
-                self.label = ui.render_text(label_text, size=freqshow.MAIN_FONT,
-                        fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
-                self.label_pos = ui.align(self.label.get_rect(), self.input_rect,
-                        horizontal=ui.ALIGN_LEFT, hpad=2)
-
-        def render(self, screen):
-                # Clear view and draw background.
-                screen.fill(freqshow.MAIN_BG)
-                # Draw input background at top of screen.
-                screen.fill(freqshow.INPUT_BG, self.input_rect)
-                # Render label and value text.
-                screen.blit(self.label, self.label_pos)
-                value_label = ui.render_text('{0} {1}'.format(self.value, self.unit_text),
-                        size=freqshow.NUM_FONT, fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
-                screen.blit(value_label, ui.align(value_label.get_rect(), self.input_rect,
-                        horizontal=ui.ALIGN_RIGHT, hpad=-2))
-                # Render buttons.
-                self.buttons.render(screen)
-
-
-        def click(self, location):
-                self.buttons.click(location)
-
-        # Button click handlers follow below.
-
-        def false_click(self, button):
-                self.value = False
+		self.model = model
+		self.accept = accept
+		self.cancel = cancel
+		# Initialize button grid.
+		self.buttons = ui.ButtonGrid(model.width, model.height, 4, 5)
+		self.buttons.add(0, 1, 'False', font_size=freqshow.NUM_FONT, click=self.false_click)
+		self.buttons.add(1, 1, 'True', font_size=freqshow.NUM_FONT, click=self.true_click)
+		self.buttons.add(3, 3, 'CANCEL', click=self.cancel_click,
+			bg_color=freqshow.CANCEL_BG)
+		self.buttons.add(3, 4, 'ACCEPT', click=self.accept_click,
+			bg_color=freqshow.ACCEPT_BG)
+		# Build label text for faster rendering.
+		self.input_rect = (0, 0, self.model.width, self.buttons.row_size)
+		self.label = ui.render_text(label_text, size=freqshow.MAIN_FONT,
+			fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
+		self.label_pos = ui.align(self.label.get_rect(), self.input_rect,
+			horizontal=ui.ALIGN_LEFT, hpad=2)
+
+	def render(self, screen):
+		# Clear view and draw background.
+		screen.fill(freqshow.MAIN_BG)
+		# Draw input background at top of screen.
+		screen.fill(freqshow.INPUT_BG, self.input_rect)
+		# Render label and value text.
+		screen.blit(self.label, self.label_pos)
+		value_label = ui.render_text('{0} {1}'.format(self.value, self.unit_text),
+			size=freqshow.NUM_FONT, fg=freqshow.INPUT_FG, bg=freqshow.INPUT_BG)
+		screen.blit(value_label, ui.align(value_label.get_rect(), self.input_rect,
+			horizontal=ui.ALIGN_RIGHT, hpad=-2))
+		# Render buttons.
+		self.buttons.render(screen)
+
+
+	def click(self, location):
+		self.buttons.click(location)
+
+	# Button click handlers follow below.
+
+	def false_click(self, button):
+		self.value = False
 
 	def true_click(self, button):
 		self.value = True
 
 
-        def cancel_click(self, button):
-                if self.cancel is not None:
-                        self.cancel()
+	def cancel_click(self, button):
+		if self.cancel is not None:
+			self.cancel()
 
-        def accept_click(self, button):
-                if self.accept is not None:
-                        self.accept(self.value)
+	def accept_click(self, button):
+		if self.accept is not None:
+			self.accept(self.value)
 
 
 class SettingsList(ViewBase):
@@ -429,7 +444,8 @@ class SettingsList(ViewBase):
 		filter_text = '{0}'.format(model.get_filter())
 		kaiser_beta_text = 'beta:{0:0.1f}'.format(model.get_kaiser_beta())
 		swap_iq_text = 'Swap IQ: {0}'.format(model.get_swap_iq())
-               	peak_text = 'Peak: {0}'.format(model.get_peak())
+		peak_text = 'Peak: {0}'.format(model.get_peak())
+		sweep_text = 'Sweep: {0}'.format('On' if model.get_sweep() else 'Off')
 
 		# Create buttons.
 		self.buttons = ui.ButtonGrid(model.width, model.height, 4, 6)
@@ -444,11 +460,15 @@ class SettingsList(ViewBase):
 		self.buttons.add(1, 4, max_text,        colspan=1, click=self.max_click)
 		self.buttons.add(3, 5, 'BACK', 		colspan=1, click=self.controller.change_to_main)
 		self.buttons.add(1, 2, lo_offset_text, colspan=2, click=self.lo_offset_click)		
+		self.buttons.add(3, 2, sweep_text,  colspan=1, click=self.sweep_click)
 		self.buttons.add(2, 3, filter_text, colspan=1, click=self.filter_click)
 		if self.model.get_filter() == 'kaiser':
 			self.buttons.add(3, 3, kaiser_beta_text, colspan=1, click=self.kaiser_beta_click)
 		self.buttons.add(0, 5, swap_iq_text,    colspan=1, click=self.swap_iq_click)
-                self.buttons.add(1, 5, peak_text,    colspan=1, click=self.peak_click)
+		if self.controller.waterfall.recorder is not None:
+			self.buttons.add(2, 5, 'History', colspan=1, click=self.history_click)
+		self.buttons.add(1, 5, peak_text,    colspan=1, click=self.peak_click)
+		self.buttons.add(3, 4, 'Perf: {0}'.format(perf.enabled), colspan=1, click=self.perf_click)
 
 	def render(self, screen):
 		# Clear view and render buttons.
@@ -478,7 +498,6 @@ class SettingsList(ViewBase):
 
 	def sample_accept(self, value):
 		self.model.set_sample_rate(float(value))
-		self.controller.waterfall.clear_waterfall()
 		self.controller.change_to_settings()
 
 	def fft_ave_click(self, button):
@@ -496,8 +515,8 @@ class SettingsList(ViewBase):
 			accept=self.tune_rate_accept)
 
 	def tune_rate_accept(self, value):
-                self.model.set_tune_rate(value)
-                self.controller.change_to_settings()
+		self.model.set_tune_rate(value)
+		self.controller.change_to_settings()
 
 	def lo_offset_click(self, button):
 		self.controller.number_dialog('LO OFFSET:', 'MHz',
@@ -536,7 +555,6 @@ class SettingsList(ViewBase):
 
 	def gain_accept(self, value):
 		self.model.set_gain(value)
-		self.controller.waterfall.clear_waterfall()
 		self.controller.change_to_settings()
 
 	def min_click(self, button):
@@ -546,7 +564,6 @@ class SettingsList(ViewBase):
 
 	def min_accept(self, value):
 		self.model.set_min_intensity(value)  
-		self.controller.waterfall.clear_waterfall()
 		self.controller.change_to_settings()
 
 	def max_click(self, button):
@@ -556,26 +573,25 @@ class SettingsList(ViewBase):
 
 	def max_accept(self, value):
 		self.model.set_max_intensity(value)
-		self.controller.waterfall.clear_waterfall()
 		self.controller.change_to_settings()
 
 
-        def filter_click(self, button):
-                self.controller.filter_dialog('Windowing filter:', ' ',
-                        initial=self.model.get_filter(),
-                        accept=self.filter_accept)
+	def filter_click(self, button):
+		self.controller.filter_dialog('Windowing filter:', ' ',
+			initial=self.model.get_filter(),
+			accept=self.filter_accept)
 
 
-        def filter_accept(self, value):
-                self.model.set_filter(value)
-                self.controller.change_to_settings()
+	def filter_accept(self, value):
+		self.model.set_filter(value)
+		self.controller.change_to_settings()
 
 
 
 	def kaiser_beta_click(self, button):
 		self.controller.number_dialog('kaiser beta:', ' ',
-                        initial='{0:0.1f}'.format(self.model.get_kaiser_beta()),
-                        accept=self.kaiser_beta_accept)
+			initial='{0:0.1f}'.format(self.model.get_kaiser_beta()),
+			accept=self.kaiser_beta_accept)
 
 
 	def kaiser_beta_accept(self, value):
@@ -592,14 +608,49 @@ class SettingsList(ViewBase):
 		self.model.set_swap_iq(value)
 		self.controller.change_to_settings()
 
-        def peak_click(self, button):
-                self.controller.boolean_dialog('Peak', ' ',
-                        initial=self.model.get_peak(),
-                        accept=self.peak_accept)
+	def peak_click(self, button):
+		self.controller.boolean_dialog('Peak', ' ',
+			initial=self.model.get_peak(),
+			accept=self.peak_accept)
+
+	def peak_accept(self, value):
+		self.model.set_peak(value)
+		self.controller.change_to_settings()
+
+	def perf_click(self, button):
+		self.controller.boolean_dialog('Perf HUD', ' ',
+			initial=perf.enabled,
+			accept=self.perf_accept)
+
+	def perf_accept(self, value):
+		# The value is still the initial string if no button was clicked.
+		perf.set_enabled(value in (True, 'True'))
+		self.controller.invalidate_settings()
+		self.controller.change_to_settings()
+
+	def sweep_click(self, button):
+		start, stop = self.model.get_sweep() or (0.0, 0.0)
+		self.controller.number_dialog('SWEEP START:', 'MHz',
+			initial='{0:0.3f}'.format(start), accept=self.sweep_start_accept)
+
+	def sweep_start_accept(self, value):
+		self.sweep_start = float(value)
+		start, stop = self.model.get_sweep() or (0.0, 0.0)
+		self.controller.number_dialog('SWEEP STOP:', 'MHz',
+			initial='{0:0.3f}'.format(stop), accept=self.sweep_stop_accept)
+
+	def sweep_stop_accept(self, value):
+		# A stop frequency not above the start turns the sweep off.
+		self.model.set_sweep(self.sweep_start, float(value))
+		self.controller.change_to_settings()
+
+	def history_click(self, button):
+		self.controller.number_dialog('HISTORY:', 'hours ago',
+			initial='1', accept=self.history_accept)
 
-        def peak_accept(self, value):
-                self.model.set_peak(value)
-                self.controller.change_to_settings()
+	def history_accept(self, value):
+		self.controller.waterfall.seek_recording(float(value))
+		self.controller.change_to_waterfall()
 
 class SpectrogramBase(ViewBase):
 	"""Base class for a spectrogram view."""
@@ -617,6 +668,17 @@ class SpectrogramBase(ViewBase):
 		self.buttons.add(4, 0, 'Quit', click=self.quit_click,
 			bg_color=freqshow.MAIN_BG)
 		self.overlay_enabled = True
+		# Rendered overlay labels and their positions, rebuilt only after a
+		# setting they show changes (see overlay_changed).
+		self._labels = None
+		self.overlay_version = 0
+		self.model.listen(self.overlay_changed, OVERLAY_SETTINGS)
+		# Textures used by render_textures.
+		self._overlay = None
+		self._spect = None
+		# Where the performance HUD was last drawn, clicking it starts a
+		# profile capture (see profiler.py).
+		self._hud_rect = None
 
 	def scale_up(self, button):
 		if self.model.get_min_string() == 'AUTO' or self.model.get_max_string() == 'AUTO':
@@ -626,19 +688,17 @@ class SpectrogramBase(ViewBase):
 			maxv = float(self.model.get_max_string()) + 5
 			self.model.set_min_intensity(minv)
 			self.model.set_max_intensity(maxv)
-			self.controller.waterfall.clear_waterfall()
 			self.controller.change_to_main()
 
-        def scale_dn(self, button):
-                if self.model.get_min_string() == 'AUTO' or self.model.get_max_string() == 'AUTO':
-                        return
-                else:
-                        minv = float(self.model.get_min_string()) - 5
-                        maxv = float(self.model.get_max_string()) - 5
-                        self.model.set_min_intensity(minv)
-                        self.model.set_max_intensity(maxv)
-                        self.controller.waterfall.clear_waterfall()
-                        self.controller.change_to_main()
+	def scale_dn(self, button):
+		if self.model.get_min_string() == 'AUTO' or self.model.get_max_string() == 'AUTO':
+			return
+		else:
+			minv = float(self.model.get_min_string()) - 5
+			maxv = float(self.model.get_max_string()) - 5
+			self.model.set_min_intensity(minv)
+			self.model.set_max_intensity(maxv)
+			self.controller.change_to_main()
 
 	def up_center_freq(self, button):
 		freq_mhz     = self.model.get_center_freq() + self.model.get_tune_rate()
@@ -672,107 +732,253 @@ class SpectrogramBase(ViewBase):
 		pygame.draw.lines(screen, freqshow.SYMBOL_FG, False,
 			[(x, y), (x-size, y-size), (x+size, y-size), (x, y), (x, y-2*size)])
 
+	def spect_rect(self):
+		"""Return the rect of the spectrogram between the button rows."""
+		return (0, self.buttons.row_size, self.model.width,
+			self.model.height-2*self.buttons.row_size)
+
 	def render(self, screen):
+		timer = perf.timer()
 		# Clear screen.
 		screen.fill(freqshow.MAIN_BG)
 		if self.overlay_enabled:
 			# Draw shrunken spectrogram with overlaid buttons and axes values.
-			spect_rect = (0, self.buttons.row_size, self.model.width,
-				self.model.height-2*self.buttons.row_size)
+			spect_rect = self.spect_rect()
 			self.render_spectrogram(screen.subsurface(spect_rect))
+			timer.lap('draw')
+			self.render_overlay(screen, spect_rect)
+			timer.lap('overlay')
+		else:
+			# Draw fullscreen spectrogram.
+			spect_rect = screen.get_rect()
+			self.render_spectrogram(screen)
+			timer.lap('draw')
+		if perf.enabled:
+			perf.tick('fps')
+			hud = self.render_hud()
+			self._hud_rect = pygame.Rect(self.hud_position(spect_rect),
+				hud.get_size())
+			screen.blit(hud, self._hud_rect)
+
+	def render_textures(self, output):
+		"""Draw the view with the renderer of the provided display (see
+		display.Sdl2Display).  The overlay lives in its own texture which is
+		only redrawn when the values it shows change, and the spectrogram only
+		uploads what is new.
+		"""
+		timer = perf.timer()
+		if not self.overlay_enabled:
+			spect_rect = (0, 0, self.model.width, self.model.height)
+			self.render_spectrogram_textures(output, spect_rect)
+			timer.lap('draw')
+		else:
+			spect_rect = self.spect_rect()
+			self.render_spectrogram_textures(output, spect_rect)
+			timer.lap('draw')
+			key = self.overlay_key()
+			if self._overlay is None or self._overlay[0] != key \
+				or self._overlay[1] is not output:
+				overlay = pygame.Surface((self.model.width, self.model.height))
+				overlay.fill(freqshow.MAIN_BG)
+				overlay.fill(TRANSPARENT, spect_rect)
+				overlay.set_colorkey(TRANSPARENT)
+				self.render_overlay(overlay, spect_rect)
+				self._overlay = (key, output, output.texture(overlay))
+			self._overlay[2].draw()
+			timer.lap('overlay')
+		if perf.enabled:
+			perf.tick('fps')
+			hud = self.render_hud()
+			self._hud_rect = pygame.Rect(self.hud_position(spect_rect),
+				hud.get_size())
+			output.texture(hud).draw(dstrect=self._hud_rect)
+
+	def render_hud(self):
+		"""Return a surface with the performance HUD: frame rate, mean (and
+		95th percentile) milliseconds of each stage and event counters.
+		"""
+		lines = []
+		if profiler.remaining:
+			lines.append('profiling, {0} frames left'.format(profiler.remaining))
+		if 'fps' in perf.rates:
+			lines.append('{0:0.1f} fps'.format(perf.rates['fps'].rate()))
+		for name, mean, p95 in perf.summary():
+			lines.append('{0} {1:0.2f} ms ({2:0.2f})'.format(name, mean, p95))
+		for name, value in sorted(perf.counters.items()):
+			lines.append('{0} {1}'.format(name, value))
+		labels = [ui.render_text(line, size=freqshow.HUD_FONT,
+			fg=freqshow.INPUT_FG, bg=freqshow.GRID_BG) for line in lines]
+		hud = pygame.Surface((max([l.get_width() for l in labels] + [1]),
+			max(1, sum(l.get_height() for l in labels))))
+		hud.fill(freqshow.GRID_BG)
+		y = 0
+		for label in labels:
+			hud.blit(label, (0, y))
+			y += label.get_height()
+		return hud
+
+	def hud_clicked(self, location):
+		"""Return True if the provided location is on the performance HUD."""
+		return perf.enabled and self._hud_rect is not None \
+			and self._hud_rect.collidepoint(location)
+
+	def hud_position(self, spect_rect):
+		"""Return the top left position of the HUD, at the left of the
+		spectrogram below the max intensity label.
+		"""
+		return (spect_rect[0] + 2,
+			spect_rect[1] + ui.get_font(freqshow.MAIN_FONT).get_linesize())
 
-			# Draw hash marks.
-			self.render_hash(screen, 0)
-			self.render_hash(screen, self.model.width/2)
-			self.render_hash(screen, self.model.width-1)	
+	def render_spectrogram_textures(self, output, rect):
+		"""Draw the spectrogram in the provided rect with the renderer of the
+		provided display.  By default the spectrogram is rendered to a surface
+		which is uploaded, subclasses can override this to upload less.
+		"""
+		x, y, width, height = rect
+		if self._spect is None or self._spect[0].get_size() != (width, height) \
+			or self._spect[1].renderer is not output.renderer:
+			surface = pygame.Surface((width, height), 0, 32)
+			self._spect = (surface, output.texture(surface))
+		surface, texture = self._spect
+		self.render_spectrogram(surface)
+		texture.update(surface)
+		texture.draw(dstrect=rect)
+
+	def overlay_changed(self, event):
+		"""Model listener, forget the overlay labels when a setting they show
+		changes.
+		"""
+		if self.model.is_auto_scale(event) and event.old is not None \
+			and round(event.old) == round(event.new):
+			# Auto scaling moved the range by less than the labels show.
+			return
+		self.overlay_version += 1
+		self._labels = None
 
-			# Draw frequencies in bottom row.
-			bottom_row  = (0, self.model.height-self.buttons.row_size,
-				self.model.width, self.buttons.row_size)
+	def overlay_key(self):
+		"""Return a key of the values shown by the overlay, the overlay
+		texture is redrawn whenever it changes.
+		"""
+		return (self.overlay_version,)
 
-			freq        = self.model.get_center_freq()
-			bandwidth   = self.model.get_zoom_fac()
-			sig         = (self.model.get_sig_strength()/6)		
-			offset      = self.model.get_lo_offset()
-			beta        = self.model.get_kaiser_beta()
-		
-			# Render minimum frequency on left.
-			label = ui.render_text('- {0:0.3f} Mhz'.format(bandwidth/2.0),
-				size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
-			screen.blit(label, ui.align(label.get_rect(), bottom_row,
-				horizontal=ui.ALIGN_LEFT))
-
-			# Render center frequency in center.
-			label = ui.render_text('{0:0.4f}'.format(freq),
-				size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
-			screen.blit(label, ui.align(label.get_rect(), bottom_row,
-				horizontal=ui.ALIGN_CENTER))
-
-			# Render maximum frequency on right.
-			label = ui.render_text('+ {0:0.3f} Mhz'.format(bandwidth/2.0),
-				size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
-			screen.blit(label, ui.align(label.get_rect(), bottom_row,
-				horizontal=ui.ALIGN_RIGHT))
+	def render_overlay(self, screen, spect_rect):
+		"""Draw the buttons, hash marks and axes values around and on top of
+		the spectrogram drawn in spect_rect.
+		"""
+		# Draw hash marks.
+		self.render_hash(screen, 0)
+		self.render_hash(screen, self.model.width/2)
+		self.render_hash(screen, self.model.width-1)	
+
+		# Draw the axes values and settings labels.
+		if self._labels is None or self._labels[0] != spect_rect:
+			self._labels = (spect_rect, self.overlay_labels(spect_rect))
+		for label, position in self._labels[1]:
+			screen.blit(label, position)
+
+		# Draw the buttons.
+		self.buttons.render(screen)
 
+	def overlay_labels(self, spect_rect):
+		"""Return a list of (surface, position) of the rendered labels of the
+		axes values and settings drawn by render_overlay.
+		"""
+		labels = []
+
+		# Draw frequencies in bottom row.
+		bottom_row  = (0, self.model.height-self.buttons.row_size,
+			self.model.width, self.buttons.row_size)
+
+		freq, bandwidth = self.model.get_display_range()
+		sig         = (self.model.get_sig_strength()/6)		
+		offset      = self.model.get_lo_offset()
+		beta        = self.model.get_kaiser_beta()
+
+		# Render minimum frequency on left.
+		label = ui.render_text('- {0:0.3f} Mhz'.format(bandwidth/2.0),
+			size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
+		labels.append((label, ui.align(label.get_rect(), bottom_row,
+			horizontal=ui.ALIGN_LEFT)))
+
+		# Render center frequency in center.
+		label = ui.render_text('{0:0.4f}'.format(freq),
+			size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
+		labels.append((label, ui.align(label.get_rect(), bottom_row,
+			horizontal=ui.ALIGN_CENTER)))
+
+		# Render maximum frequency on right.
+		label = ui.render_text('+ {0:0.3f} Mhz'.format(bandwidth/2.0),
+			size=freqshow.MAIN_FONT, bg=freqshow.MAIN_BG)
+		labels.append((label, ui.align(label.get_rect(), bottom_row,
+			horizontal=ui.ALIGN_RIGHT)))
+
+		# The intensity range is unknown until the first spectrum.
+		if self.model.range is not None:
 			# Render min intensity in bottom left.
 			label = ui.render_text('{0:0.0f} dB'.format(self.model.min_intensity),
 				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-			screen.blit(label, ui.align(label.get_rect(), spect_rect,
-				horizontal=ui.ALIGN_LEFT, vertical=ui.ALIGN_BOTTOM))
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_LEFT, vertical=ui.ALIGN_BOTTOM)))
 
 			# Render max intensity in top left.
 			label = ui.render_text('{0:0.0f} dB'.format(self.model.max_intensity),
 				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-			screen.blit(label, ui.align(label.get_rect(), spect_rect,
-				horizontal=ui.ALIGN_LEFT, vertical=ui.ALIGN_TOP))
-
-			# Render FFT average in bottom right.
-			if self.model.get_peak() == True:
-				label = ui.render_text('fft pks = {0}'.format(self.model.fft_ave),
-					size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-                                screen.blit(label, ui.align(label.get_rect(), spect_rect,
-                                        horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_BOTTOM))
-			elif self.model.get_peak() == False:
-                                label = ui.render_text('fft ave = {0}'.format(self.model.fft_ave),
-                                        size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-				screen.blit(label, ui.align(label.get_rect(), spect_rect,
-					horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_BOTTOM))
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_LEFT, vertical=ui.ALIGN_TOP)))
 
+		# Render FFT average in bottom right.
+		if self.model.get_peak() == True:
+			label = ui.render_text('fft pks = {0}'.format(self.model.fft_ave),
+				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_BOTTOM)))
+		elif self.model.get_peak() == False:
+			label = ui.render_text('fft ave = {0}'.format(self.model.fft_ave),
+				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_BOTTOM)))
+
+		if self.model.range is not None:
 			# Render Grid scale factor in upper right.
 			label = ui.render_text('scale = {0:0.1f} dB' .format((self.model.max_intensity-self.model.min_intensity)/10),
 				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-			screen.blit(label, ui.align(label.get_rect(), spect_rect,
-				horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_TOP)) 
-
-			# Render Signal plus to Noise of Ceneter Frequency in center top.
-#			label = ui.render_text('S units = {0:0.1f}' .format(sig),
-#				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-#			screen.blit(label, ui.align(label.get_rect(), spect_rect,
-#				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP))
-
-                        # Render windowing filter setting in center top.
-			if self.model.filter == 'kaiser':
-                       		label = ui.render_text('Kaiser beta = {0:0.1f}' .format(beta),
-                               		size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-                       		screen.blit(label, ui.align(label.get_rect(), spect_rect,
-                               		horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP))
-			else:
-				label = ui.render_text('{0}' .format(self.model.filter),
-                                        size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
-                                screen.blit(label, ui.align(label.get_rect(), spect_rect,
-                                        horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP))
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_RIGHT, vertical=ui.ALIGN_TOP)))
+
+		# Render Signal plus to Noise of Ceneter Frequency in center top.
+#		label = ui.render_text('S units = {0:0.1f}' .format(sig),
+#			size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+#		labels.append((label, ui.align(label.get_rect(), spect_rect,
+#			horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP)))
+
+		# Render windowing filter setting in center top.
+		if self.model.filter == 'kaiser':
+			label = ui.render_text('Kaiser beta = {0:0.1f}' .format(beta),
+				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP)))
+		else:
+			label = ui.render_text('{0}' .format(self.model.filter),
+				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_TOP)))
 
+		# Render the radio shown in center bottom when there are several.
+		if self.controller.radios is not None:
+			label = ui.render_text('Radio {0}'.format(self.model.device),
+				size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_BOTTOM)))
 
+		return labels
 
-			# Draw the buttons.
-			self.buttons.render(screen)
-		else:
-			# Draw fullscreen spectrogram.
-			self.render_spectrogram(screen)
 
 	def click(self, location):
 		mx, my = location
-		if my > self.buttons.row_size and my < 4*self.buttons.row_size:
+		if self.hud_clicked(location):
+			# Hidden button: profile the next frames.
+			profiler.request()
+		elif my > self.buttons.row_size and my < 4*self.buttons.row_size:
 			# Handle click on spectrogram.
 			self.overlay_enabled = not self.overlay_enabled
 		else:
@@ -794,71 +1000,356 @@ class WaterfallSpectrogram(SpectrogramBase):
 		super(WaterfallSpectrogram, self).__init__(model, controller)
 		self.color_func = gradient_func(freqshow.WATERFALL_GRAD)
 		self.waterfall = pygame.Surface((model.width, model.height))
+		# Single row surface and lookup table of the gradient colors mapped to
+		# the waterfall's pixel format, so a new row is built with one array
+		# operation instead of a set_at call per pixel.
+		self.row = pygame.Surface((model.width, 1), 0, self.waterfall)
+		self.color_lut = np.array([self.waterfall.map_rgb(
+			tuple(int(c) for c in self.color_func(i/255.0))) for i in range(256)])
+		self.pending = None
+		# Multi-resolution history of quantized rows for zooming out in time
+		# and scrolling back.  Time level 0 with no offset is the live view.
+		self.history = history.HistoryPyramid(model.width,
+			freqshow.HISTORY_BUDGET, freqshow.HISTORY_LEVELS)
+		self.time_level = 0
+		self.time_offset = 0
+		self.history_surface = None
+		# Optional recording of the waterfall to disk.  When browsing the
+		# recording disk_row is the number of the newest recorded row shown.
+		self.recorder = None
+		if freqshow.RECORD_PATH is not None:
+			self.recorder = recorder.HistoryRecorder(freqshow.RECORD_PATH,
+				model.width, freqshow.RECORD_ROWS, decimate=freqshow.RECORD_DECIMATE,
+				index_interval=freqshow.RECORD_INDEX_INTERVAL)
+		self.disk_row = None
+		# Count of rows added and clears, used to upload only new rows to the
+		# ring texture drawn by render_spectrogram_textures.
+		self.rows_added = 0
+		self.clears = 0
+		self._ring = None
+		# Keep adding rows while other views are shown so the history stays
+		# continuous.
+		self.model.subscribe(self.spectrum_ready)
+		# Rows drawn with a different sample rate, gain or intensity scale
+		# can't be compared with new ones.
+		self.stale = False
+		self.model.listen(self.settings_changed, ('sample_rate', 'gain',
+			'min_intensity', 'max_intensity', 'min_auto_scale',
+			'max_auto_scale', 'sweep_range'))
+
+	def settings_changed(self, event):
+		"""Model listener, clear the waterfall before the next row when the
+		rows already drawn no longer match new ones.  Resets and auto scaling
+		of the intensity range are ignored, and the several settings changed
+		by one user action only clear the waterfall once.
+		"""
+		if event.new is None or self.model.is_auto_scale(event):
+			return
+		self.stale = True
 
 	def clear_waterfall(self):
 		self.waterfall.fill(freqshow.MAIN_BG)
-
-	def render_spectrogram(self, screen):
-		# Grab spectrogram data.
-		freqs = self.model.get_data()
+		self.clears += 1
+		self.history.clear()
+		self.time_offset = 0
+		self.stale = False
+
+	def spectrum_ready(self, freqs):
+		"""Model subscriber, remember the newest spectrum for the next row."""
+		self.pending = freqs
+
+	def add_row(self):
+		"""Add the newest spectrum published by the model as a new row at the
+		bottom of the waterfall.  Does nothing if no new spectrum is available.
+		Only the off-screen waterfall surface is touched, so this is cheap
+		enough to run while the waterfall isn't shown.
+		"""
+		if self.stale:
+			self.clear_waterfall()
+		if self.pending is None or self.model.range is None:
+			return
+		timer = perf.timer()
+		freqs = self.pending
+		self.pending = None
 		# Scroll up the waterfall display.
 		self.waterfall.scroll(0, -1)
-		# Scale the FFT values to the range 0 to 1.
-		freqs = (freqs-self.model.min_intensity)/self.model.range
-		# Convert scaled values to pixels drawn at the bottom of the display.
+		# Scale the FFT values to the range 0 to 255.
+		freqs = (freqs-self.model.min_intensity)*(255.0/self.model.range)
+		levels = np.clip(freqs, 0.0, 255.0).astype(np.uint8)
+		# Draw FFT values mapped through the gradient to a color at the bottom
+		# of the display.
+		wx, wy, wwidth, wheight = self.waterfall.get_rect()
+		pygame.surfarray.blit_array(self.row,
+			self.color_lut[levels[:wwidth]].reshape(wwidth, 1))
+		self.waterfall.blit(self.row, (0, wheight-1))
+		self.rows_added += 1
+		shown = self.history.levels[self.time_level]
+		head = shown.head
+		now = time.time()
+		self.history.add(levels[:wwidth], now)
+		if self.recorder is not None:
+			freq, bandwidth = self.model.get_display_range()
+			self.recorder.add(levels[:wwidth], now, freq, bandwidth,
+				self.model.min_intensity, self.model.max_intensity)
+		# Keep the same rows on screen while scrolled back in history.
+		if self.time_offset > 0 and shown.head != head:
+			self.time_offset += 1
+		timer.lap('waterfall')
+
+	def render_spectrogram(self, screen):
 		x, y, width, height = screen.get_rect()
+		if self.disk_row is not None:
+			self.render_recording(screen)
+			return
+		if self.time_level > 0 or self.time_offset > 0:
+			self.render_history(screen)
+			return
+		# Rows are added by add_row at the waterfall rate, only draw them here.
 		wx, wy, wwidth, wheight = self.waterfall.get_rect()
 		offset = wheight - height
-		# Draw FFT values mapped through the gradient function to a color.
-		self.waterfall.lock()
-
-		for i in range(width):
-			power = clamp(freqs[i], 0.0, 1.0)
-			self.waterfall.set_at((i, wheight-1), self.color_func(power))
-		self.waterfall.unlock()
 		screen.blit(self.waterfall, (0, 0), area=(0, offset, width, height))
 
-class InstantSpectrogram(SpectrogramBase):
-	"""Instantaneous point in time line plot of the spectrogram."""
+	def render_spectrogram_textures(self, output, rect):
+		# Browsing history redraws everything, use the surface path.
+		if self.disk_row is not None or self.time_level > 0 or self.time_offset > 0:
+			super(WaterfallSpectrogram, self).render_spectrogram_textures(output, rect)
+			return
+		# The waterfall lives in a ring texture.  New rows overwrite the oldest
+		# ones and scrolling is done by drawing the ring in two parts, so only
+		# the new rows are uploaded.
+		x, y, width, height = rect
+		wx, wy, wwidth, wheight = self.waterfall.get_rect()
+		new_rows = self.rows_added - (self._ring[2] if self._ring else 0)
+		if self._ring is None or self._ring[0].renderer is not output.renderer \
+			or self._ring[0].height != height or self._ring[3] != self.clears \
+			or new_rows >= height:
+			texture = output.texture(self.waterfall.subsurface(
+				(0, wheight-height, width, height)))
+			self._ring = [texture, 0, self.rows_added, self.clears]
+			new_rows = 0
+		texture, head = self._ring[0], self._ring[1]
+		while new_rows > 0:
+			# Upload the oldest new rows first, up to the end of the ring.
+			count = min(new_rows, height-head)
+			texture.update(self.waterfall.subsurface(
+				(0, wheight-new_rows, width, count)), (0, head, width, count))
+			head = (head + count) % height
+			new_rows -= count
+		self._ring[1] = head
+		self._ring[2] = self.rows_added
+		# The oldest row is at head, draw from there to the end of the ring at
+		# the top then the start of the ring below it.
+		texture.draw(srcrect=(0, head, width, height-head),
+			dstrect=(x, y, width, height-head))
+		if head > 0:
+			texture.draw(srcrect=(0, 0, width, head),
+				dstrect=(x, y+height-head, width, head))
+
+	def overlay_key(self):
+		key = super(WaterfallSpectrogram, self).overlay_key()
+		if self.disk_row is not None or self.time_level > 0 or self.time_offset > 0:
+			key += (self.history_text(),)
+		return key
+
+	def render_history(self, screen):
+		"""Draw the waterfall from the history at the current time level and
+		offset.
+		"""
+		x, y, width, height = screen.get_rect()
+		rows, times = self.history.get(self.time_level, height, self.time_offset)
+		self.blit_rows(screen, rows)
 
-	def __init__(self, model, controller):	
-                super(InstantSpectrogram, self).__init__(model, controller)
-                self.checkfirst = self.model.fft_ave +1
-                self.freqsfirst = self.model.get_data()
-                self.freqsinit = np.tile(self.freqsfirst,(self.checkfirst,1))
-               	self.freqgrabs = self.freqsinit.copy()
+	def render_recording(self, screen):
+		"""Draw the waterfall from the rows recorded on disk ending with the
+		row being browsed.
+		"""
+		x, y, width, height = screen.get_rect()
+		rows, times = self.recorder.read(self.disk_row, height)
+		self.blit_rows(screen, rows)
 
-		
+	def blit_rows(self, screen, rows):
+		"""Draw rows of waterfall levels (oldest first) at the bottom of the
+		provided surface.
+		"""
+		x, y, width, height = screen.get_rect()
+		if self.history_surface is None or self.history_surface.get_size() != (width, height):
+			self.history_surface = pygame.Surface((width, height), 0, self.waterfall)
+		rows = rows[-height:]
+		pixels = np.empty((width, height), dtype=self.color_lut.dtype)
+		pixels.fill(self.waterfall.map_rgb(freqshow.MAIN_BG))
+		if len(rows):
+			pixels[:, height-len(rows):] = self.color_lut[rows[:, :width]].T
+		pygame.surfarray.blit_array(self.history_surface, pixels)
+		screen.blit(self.history_surface, (0, 0))
+
+	def history_text(self):
+		"""Return the time zoom and age of the newest row shown as text, or
+		the time and frequency of the newest recorded row when browsing the
+		recording.
+		"""
+		if self.disk_row is not None:
+			rows, times = self.recorder.read(self.disk_row, 1)
+			segment = self.recorder.segment(self.disk_row)
+			if not len(times) or segment is None:
+				return 'no recording'
+			return '{0} {1:0.6f}'.format(time.strftime('%m-%d %H:%M:%S',
+				time.localtime(times[-1])), segment[2])
+		rows, times = self.history.get(self.time_level, 1, self.time_offset)
+		age = int(time.time() - times[-1]) if len(times) else 0
+		return 'x{0} -{1}:{2:02d}:{3:02d}'.format(2**self.time_level,
+			age // 3600, (age // 60) % 60, age % 60)
+
+	def seek_recording(self, hours):
+		"""Browse the recording starting at the provided number of hours ago.
+		The row shown is found by a binary search of the recorded times.
+		"""
+		if self.recorder is None:
+			return
+		self.disk_row = self.recorder.find(time.time() - hours*3600.0)
 
-	def render_spectrogram(self, screen):
+	def time_zoom(self, step):
+		"""Zoom out (positive step) or in (negative step) in time, keeping
+		the newest row shown at about the same moment.  Leaves the recording
+		if it was being browsed.
+		"""
+		self.disk_row = None
+		level = int(clamp(self.time_level + step, 0, len(self.history.levels)-1))
+		self.time_offset = int(self.time_offset * 2**self.time_level / 2**level)
+		self.time_level = level
+
+	def time_scroll(self, step):
+		"""Scroll back (positive step) or forward (negative step) through the
+		history by the provided number of screens.
+		"""
+		rows = self.model.height - 2*self.buttons.row_size
+		if self.disk_row is not None:
+			self.disk_row -= step*rows//2
+			if self.disk_row >= self.recorder.total:
+				# Scrolled past the end of the recording, back to live.
+				self.disk_row = None
+			else:
+				self.disk_row = min(self.recorder.total - 1, max(self.disk_row,
+					self.recorder.first_row + rows - 1))
+			return
+		newest = max(0, self.history.available(self.time_level) - rows)
+		self.time_offset = int(clamp(self.time_offset + step*rows//2, 0, newest))
+
+	def overlay_labels(self, spect_rect):
+		labels = super(WaterfallSpectrogram, self).overlay_labels(spect_rect)
+		# Add the history controls along the edges of the waterfall.
+		for text, horizontal, vertical in (('Time x2', ui.ALIGN_LEFT, 0.3),
+			('Time /2', ui.ALIGN_LEFT, 0.7), ('Older', ui.ALIGN_RIGHT, 0.3),
+			('Newer', ui.ALIGN_RIGHT, 0.7)):
+			label = ui.render_text(text, size=freqshow.MAIN_FONT, bg=freqshow.GRID_BG)
+			labels.append((label, ui.align(label.get_rect(), spect_rect,
+				horizontal=horizontal, vertical=vertical)))
+		return labels
+
+	def render_overlay(self, screen, spect_rect):
+		super(WaterfallSpectrogram, self).render_overlay(screen, spect_rect)
+		# Draw the time zoom and age when not showing the live waterfall.
+		if self.time_level > 0 or self.time_offset > 0 or self.disk_row is not None:
+			label = ui.render_text(self.history_text(), size=freqshow.MAIN_FONT,
+				bg=freqshow.GRID_BG)
+			screen.blit(label, ui.align(label.get_rect(), spect_rect,
+				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_BOTTOM))
 
-		# Grab fft data and plot it.
-		freqslast = self.model.get_data()		
+	def click(self, location):
+		mx, my = location
+		if self.hud_clicked(location):
+			profiler.request()
+		elif self.overlay_enabled and my > self.buttons.row_size \
+			and my < 4*self.buttons.row_size \
+			and (mx < self.buttons.col_size or mx > self.model.width - self.buttons.col_size):
+			# Handle click on the history controls at the edges.
+			upper = my < self.model.height/2
+			if mx < self.buttons.col_size:
+				self.time_zoom(1 if upper else -1)
+			else:
+				self.time_scroll(1 if upper else -1)
+		else:
+			super(WaterfallSpectrogram, self).click(location)
 
-		if (self.freqsfirst.size != freqslast.size) or (self.checkfirst != (self.model.fft_ave+1)): 
-                        self.checkfirst = self.model.fft_ave +1
-	                self.freqsfirst = self.model.get_data()
-                	self.freqsinit = np.tile(self.freqsfirst,(self.checkfirst,1))
-                	self.freqgrabs = self.freqsinit.copy()
+class InstantSpectrogram(SpectrogramBase):
+	"""Instantaneous point in time line plot of the spectrogram."""
 
- 
+	def __init__(self, model, controller):	
+		super(InstantSpectrogram, self).__init__(model, controller)
+		self.checkfirst = self.model.fft_ave +1
+		# The averaging history is created from the first spectrum published
+		# by the model, so creating the view never waits on the radio.
+		self.freqsfirst = None
+		self.freqgrabs = None
+		# Grid drawn by render_grid for the last plot size, it doesn't depend
+		# on any setting so it is only drawn again when the size changes.
+		# Tuning generation of the spectra in the averaging history, spectra
+		# from before a retune aren't averaged with new ones, and are moved
+		# along when the span is panned.
+		self.generation = None
+		self.model.listen(self.center_freq_changed, ('center_freq',))
+		self._grid = None
+		# Keep the averaging history up to date while other views are shown.
+		self.model.subscribe(self.spectrum_ready)
+
+	def spectrum_ready(self, freqslast):
+		"""Model subscriber, add a new spectrum to the averaging history."""
+		if (self.freqsfirst is None) or (self.freqsfirst.size != freqslast.size) or (self.checkfirst != (self.model.fft_ave+1)) \
+			or (self.generation != self.model.freqs_generation):
+			self.generation = self.model.freqs_generation
+			self.checkfirst = self.model.fft_ave +1
+			self.freqsfirst = freqslast
+			self.freqsinit = np.tile(self.freqsfirst,(self.checkfirst,1))
+			self.freqgrabs = self.freqsinit.copy()
 
 		for i in range(1,self.model.fft_ave+1):
 			np.copyto(self.freqgrabs[i-1],self.freqgrabs[i])		
 		np.copyto(self.freqgrabs[self.model.fft_ave],freqslast)
 
-
-		if self.model.get_peak() == True:
-			freqs = np.max(self.freqgrabs, axis=0)
-		elif self.model.get_peak() == False:
-			freqs = np.average(self.freqgrabs, axis=0)
+	def center_freq_changed(self, event):
+		"""Model listener, move the spectra in the averaging history with the
+		span when the model pans it without retuning, so they stay aligned
+		with new spectra.
+		"""
+		if self.freqgrabs is None or event.old is None \
+			or self.generation != self.model.tuning_generation():
+			# A retune is pending, the history starts over with its spectra.
+			return
+		history = self.freqgrabs
+		width = history.shape[1]
+		pixels = int(round((event.new - event.old)/self.model.get_zoom_fac()*width))
+		if abs(pixels) >= width:
+			history[:] = history[:, :1]
+		elif pixels > 0:
+			# Higher frequencies come in from the right, repeat the last column
+			# until new spectra fill them in.
+			history[:, :-pixels] = history[:, pixels:].copy()
+			history[:, -pixels:] = history[:, -pixels-1:-pixels]
+		elif pixels < 0:
+			history[:, -pixels:] = history[:, :pixels].copy()
+			history[:, :-pixels] = history[:, -pixels:-pixels+1]
+
+	def trace(self, height):
+		"""Return the y positions of the plot of the peak or average of the fft
+		data history scaled to the provided plot height, or None until the
+		first spectrum and intensity range are published.
+		"""
+		# Plot the peak or average of the fft data history.
+		if self.freqgrabs is None or self.model.range is None:
+			return None
+		freqs = dsp.average(self.freqgrabs, self.model.get_peak())
 
 
 		# Scale frequency values to fit on the screen based on the min and max intensity values.
-		x, y, width, height = screen.get_rect()
 		freqs = height-np.floor(((freqs-self.model.min_intensity)/self.model.range)*height)
+		return freqs
 
-		# Render frequency graph.
+	def reference_y(self, height):
+		"""Return the y position of the 0 dB reference line."""
+		return abs(self.model.max_intensity)/(self.model.max_intensity-self.model.min_intensity)*height
+
+	def render_grid(self, screen):
+		"""Draw the background and grid lines of the plot."""
+		x, y, width, height = screen.get_rect()
 		screen.fill(freqshow.GRID_BG)
 		# Draw grid lines for spectrum background
 		pygame.draw.line(screen, freqshow.GRID_LINE, (0, height/2), (width, height/2)) 
@@ -883,8 +1374,20 @@ class InstantSpectrogram(SpectrogramBase):
 		pygame.draw.line(screen, freqshow.GRID_LINE, (width-1, 0), (width-1, height-1))
 		pygame.draw.line(screen, freqshow.GRID_LINE, (0, 0), (width-1, 0))
 		pygame.draw.line(screen, freqshow.GRID_LINE, (0, height-1), (width-1, height-1))
+
+	def render_spectrogram(self, screen):
+		x, y, width, height = screen.get_rect()
+		freqs = self.trace(height)
+
+		# Render frequency graph.
+		if self._grid is None or self._grid.get_size() != (width, height):
+			self._grid = pygame.Surface((width, height), 0, screen)
+			self.render_grid(self._grid)
+		screen.blit(self._grid, (0, 0))
+		if freqs is None:
+			return
 		# Draw 0 DB reference line across screen.
-		pygame.draw.line(screen, freqshow.CENTER_LINE, (0, (abs(self.model.max_intensity)/(self.model.max_intensity-self.model.min_intensity)*height)), (width-1, (abs(self.model.max_intensity)/(self.model.max_intensity-self.model.min_intensity)*height)))
+		pygame.draw.line(screen, freqshow.CENTER_LINE, (0, self.reference_y(height)), (width-1, self.reference_y(height)))
 
 		# Draw line segments to join each FFT result bin.
 
@@ -892,7 +1395,130 @@ class InstantSpectrogram(SpectrogramBase):
 		for i in range(1, width):
 			y=freqs[i-1]
 			pygame.draw.line(screen, freqshow.INSTANT_LINE, (i-1, ylast), (i, y))
-	       	        pygame.draw.line(screen, freqshow.GRID_LINE, (i, y), (i, height))
-	                ylast = y
+			pygame.draw.line(screen, freqshow.GRID_LINE, (i, y), (i, height))
+			ylast = y
 	                       		
 		# End of plot
+
+	def render_spectrogram_textures(self, output, rect):
+		# The grid is a static texture, the plot is drawn with renderer lines
+		# so nothing is uploaded per frame.
+		x, y, width, height = rect
+		if self._spect is None or self._spect[0] != (width, height) \
+			or self._spect[1].renderer is not output.renderer:
+			grid = pygame.Surface((width, height))
+			self.render_grid(grid)
+			self._spect = ((width, height), output.texture(grid))
+		self._spect[1].draw(dstrect=rect)
+		freqs = self.trace(height)
+		if freqs is None:
+			return
+		freqs += y
+		renderer = output.renderer
+		renderer.draw_color = freqshow.CENTER_LINE + (255,)
+		ref = y + int(self.reference_y(height))
+		renderer.draw_line((x, ref), (x+width-1, ref))
+		bottom = y + height
+		renderer.draw_color = freqshow.GRID_LINE + (255,)
+		for i in range(1, width):
+			top = int(freqs[i-1])
+			if top < bottom:
+				renderer.draw_line((x+i, top), (x+i, bottom))
+		renderer.draw_color = freqshow.INSTANT_LINE + (255,)
+		ylast = int(freqs[0])
+		for i in range(1, width):
+			yi = int(freqs[i-1])
+			renderer.draw_line((x+i-1, ylast), (x+i, yi))
+			ylast = yi
+
+
+class SplitSpectrogram(SpectrogramBase):
+	"""Instantaneous line plot on top of a scrolling waterfall.  Both halves
+	are drawn from the same spectrum the model computes once per frame.
+	"""
+
+	def __init__(self, model, controller, split=None):
+		"""Create a split view.  The split value is the fraction (0 to 1) of
+		the spectrogram area given to the instantaneous plot, the rest shows
+		the waterfall.  Defaults to the SPLIT_RATIO configuration value.
+		"""
+		super(SplitSpectrogram, self).__init__(model, controller)
+		self.split = split if split is not None else freqshow.SPLIT_RATIO
+
+	def render_spectrogram(self, screen):
+		# Reuse the instant and waterfall views of the controller so the
+		# averaging history and waterfall rows are shared with them.
+		x, y, width, height = screen.get_rect()
+		split = int(clamp(self.split, 0.0, 1.0)*height)
+		if split > 0:
+			self.controller.instant.render_spectrogram(
+				screen.subsurface((0, 0, width, split)))
+		if split < height:
+			self.controller.waterfall.render_spectrogram(
+				screen.subsurface((0, split, width, height-split)))
+
+	def render_spectrogram_textures(self, output, rect):
+		x, y, width, height = rect
+		split = int(clamp(self.split, 0.0, 1.0)*height)
+		if split > 0:
+			self.controller.instant.render_spectrogram_textures(output,
+				(x, y, width, split))
+		if split < height:
+			self.controller.waterfall.render_spectrogram_textures(output,
+				(x, y+split, width, height-split))
+
+
+class TiledSpectrogram(SpectrogramBase):
+	"""Instantaneous spectrograms of all radios stacked in tiles, for
+	stations with several radios (see multisdr.py).  The buttons and axes are
+	those of the controller's radio, whose tile is outlined.  Clicking a tile
+	shows that radio.
+	"""
+
+	def __init__(self, model, controller):
+		super(TiledSpectrogram, self).__init__(model, controller)
+		# Rendered label of each tile and its text, rendered again only when
+		# the text changes.
+		self._tile_labels = {}
+
+	def tile_rects(self, height):
+		"""Return a list of the (top, height) of the tile of each radio in a
+		spectrogram of the provided height.
+		"""
+		count = len(self.controller.radios.controllers)
+		tops = [i*height//count for i in range(count + 1)]
+		return [(tops[i], tops[i+1] - tops[i]) for i in range(count)]
+
+	def tile_label(self, index, model):
+		text = 'Radio {0}: {1:0.6f} MHz'.format(model.device,
+			model.get_display_range()[0])
+		cached = self._tile_labels.get(index)
+		if cached is None or cached[0] != text:
+			cached = (text, ui.render_text(text, size=freqshow.HUD_FONT,
+				bg=freqshow.GRID_BG))
+			self._tile_labels[index] = cached
+		return cached[1]
+
+	def render_spectrogram(self, screen):
+		x, y, width, height = screen.get_rect()
+		controllers = self.controller.radios.controllers
+		for i, (top, size) in enumerate(self.tile_rects(height)):
+			controller = controllers[i]
+			tile = screen.subsurface((0, top, width, size))
+			controller.instant.render_spectrogram(tile)
+			label = self.tile_label(i, controller.model)
+			tile.blit(label, ui.align(label.get_rect(), (0, 0, width, size),
+				horizontal=ui.ALIGN_CENTER, vertical=ui.ALIGN_CENTER))
+			if controller is self.controller:
+				pygame.draw.rect(tile, freqshow.SYMBOL_FG, (0, 0, width, size), 1)
+
+	def click(self, location):
+		mx, my = location
+		top = self.buttons.row_size
+		if self.hud_clicked(location) or not top < my < 4*top:
+			super(TiledSpectrogram, self).click(location)
+			return
+		# Show the radio of the tile clicked.
+		for i, (tile_top, size) in enumerate(self.tile_rects(self.spect_rect()[3])):
+			if tile_top <= my - top < tile_top + size:
+				self.controller.radios.select(i)
@@ -0,0 +1,106 @@
+# FreqShow WebSocket spectrum client.
+# Minimal client for the spectrum server (see wsserver.py) which connects,
+# reads frames and prints their headers, to check the server from the Pi or
+# as a starting point for tools consuming the spectrum.
+#
+# Usage: python wsclient.py [--host HOST] [--port PORT] [--frames N]
+#
+#
+# The MIT License (MIT)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Enhancements over the original Freqshow by Dan Stixrud, WQ7T
+import argparse
+import base64
+import os
+import socket
+import time
+
+import wsserver
+
+
+def connect(host, port, timeout=5.0):
+	"""Open a WebSocket connection to the spectrum server and return the
+	connected socket.
+	"""
+	sock = socket.create_connection((host, port), timeout)
+	key = base64.b64encode(os.urandom(16)).decode('ascii')
+	sock.sendall(('GET / HTTP/1.1\r\nHost: {0}:{1}\r\nUpgrade: websocket\r\n'
+		'Connection: Upgrade\r\nSec-WebSocket-Key: {2}\r\n'
+		'Sec-WebSocket-Version: 13\r\n\r\n'.format(host, port, key)
+		).encode('ascii'))
+	response = b''
+	while b'\r\n\r\n' not in response:
+		chunk = sock.recv(4096)
+		if not chunk:
+			raise IOError('Connection closed during handshake')
+		response += chunk
+	response = response.decode('latin-1')
+	if ' 101 ' not in response.split('\r\n')[0] \
+		or wsserver.accept_key(key) not in response:
+		raise IOError('Handshake failed: ' + response.split('\r\n')[0])
+	return sock
+
+def frames(sock):
+	"""Yield tuples of (header dict, uint8 levels) for each spectrum received."""
+	while True:
+		opcode, payload = wsserver.read_frame(sock)
+		if opcode == wsserver.OP_CLOSE:
+			return
+		if opcode == wsserver.OP_BINARY:
+			yield wsserver.decode_spectrum(payload)
+
+def close(sock):
+	"""Send a close frame and close the socket."""
+	try:
+		sock.sendall(wsserver.encode_frame(wsserver.OP_CLOSE, b'\x03\xe8',
+			mask=os.urandom(4)))
+	finally:
+		sock.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description='FreqShow spectrum client.')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8765)
+	parser.add_argument('--frames', type=int, default=50)
+	args = parser.parse_args()
+	sock = connect(args.host, args.port)
+	start = time.time()
+	count = 0
+	last = None
+	for header, levels in frames(sock):
+		count += 1
+		if last is not None and header['seq'] != last + 1:
+			print('skipped {0} frames'.format(header['seq'] - last - 1))
+		last = header['seq']
+		print('#{0} {1:0.6f} MHz span {2:0.4f} MHz {3:0.0f} to {4:0.0f} dB, '
+			'{5} bins, peak level {6}'.format(header['seq'],
+			header['center_freq'], header['span'], header['min_db'],
+			header['max_db'], len(levels), levels.max()))
+		if count >= args.frames:
+			break
+	close(sock)
+	elapsed = time.time() - start
+	print('{0} frames in {1:0.2f} s ({2:0.1f} frames/s)'.format(count, elapsed,
+		count/elapsed if elapsed else 0.0))
+
+
+if __name__ == '__main__':
+	main()